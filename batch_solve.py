@@ -0,0 +1,146 @@
+# batch_solve.py
+# -*- coding: utf-8 -*-
+"""
+Solves many ciphertexts without the GUI.
+
+    python batch_solve.py messages/ -o results.jsonl
+    python batch_solve.py messages.jsonl -o results.jsonl --time-limit 3 --workers 8
+
+The input is a directory (every *.txt file is one ciphertext) or a JSONL file with one
+{"id": ..., "ciphertext": ...} object per line. Each ciphertext is loaded into a DecryptionLogic and
+solved with AutoSolver; one JSON line (id, key, score, plaintext, seconds) is written as soon as
+each job finishes, so the output follows completion order, not input order.
+Every worker process reads the language model and word lists once, in its initializer.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import main
+import vector_engine as ve
+from logic import DecryptionLogic
+from solver import AutoSolver
+from stream_text import MappedTextFile
+from substitution_key import SubstitutionKey
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__)) # Word lists and model are looked up next to this file
+
+_worker = {} # Per-process state filled by _init_worker
+
+
+def load_resources(model=main.LANGUAGE_MODEL_FILE):
+    """DecryptionLogic keyword arguments (language tables, word lists read once, scoring engine) shared by many texts."""
+    resources = main.language_resources(os.path.join(DATA_DIR, model))
+    resources['word_sets'] = DecryptionLogic.load_word_sets(
+        {name: os.path.join(DATA_DIR, path) for name, path in main.WORD_LIST_FILES.items()})
+    resources['word_list_files'] = main.WORD_LIST_FILES # Not read again: word_sets is given
+    resources['scoring_engine'] = 'numpy' if ve.numpy_available() else 'python'
+    return resources
+
+
+def _init_worker(options):
+    _worker['resources'] = load_resources(options['model'])
+    _worker['options'] = options
+
+
+def iter_jobs(source):
+    """Yields (job id, ('path', file path) or ('text', ciphertext)) for a directory or a JSONL file."""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.endswith('.txt') and os.path.isfile(path): yield name, ('path', path)
+        return
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line: continue
+            try:
+                record = json.loads(line)
+                yield record.get('id', line_number), ('text', record['ciphertext'])
+            except (ValueError, KeyError, AttributeError) as e:
+                print(f"跳过第 {line_number} 行: 无法读取密文 ({e})", file=sys.stderr)
+
+
+def solve_job(job_id, job_source):
+    """Solves one ciphertext in a worker; returns the JSON-ready result (or the error) of the job."""
+    start = time.perf_counter()
+    options = _worker['options']
+    try:
+        kind, value = job_source
+        if kind == 'path':
+            with MappedTextFile(value) as mapped_file: ciphertext = mapped_file.read_text(errors='replace')
+        else: ciphertext = value
+        if not any('a' <= ch <= 'z' for ch in ciphertext.lower()): raise ValueError("密文中没有字母")
+        # The solver only needs the key fitness: no suggestions are computed
+        decryption_logic = DecryptionLogic(ciphertext, defer_suggestions=True, **_worker['resources'])
+        best_key, best_score, iterations = None, -float('inf'), 0
+        for restart in range(options['restarts']): # Independent searches, the best key is kept
+            seed = None if options['seed'] is None else options['seed'] + restart
+            solver = AutoSolver(decryption_logic, method=options['method'],
+                                time_limit=options['time_limit'] / options['restarts'], seed=seed)
+            key_map, score = solver.solve()
+            iterations += solver.iterations
+            if score > best_score: best_key, best_score = key_map, score
+        return {'id': job_id, 'key': ''.join(best_key[chr(97 + i)] for i in range(26)), 'score': best_score,
+                'plaintext': ciphertext.translate(SubstitutionKey(best_key).translation_table()), 'iterations': iterations,
+                'seconds': round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        return {'id': job_id, 'error': f"{type(e).__name__}: {e}", 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def run_batch(source, output, workers=None, method='annealing', time_limit=5.0, restarts=1, seed=None,
+              model=main.LANGUAGE_MODEL_FILE, progress=True):
+    """Solves every job of source in a process pool and appends one JSON line per job to the output file object."""
+    options = {'method': method, 'time_limit': time_limit, 'restarts': max(1, restarts), 'seed': seed, 'model': model}
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4 # Jobs read from the input but not finished yet
+    done_jobs = failed_jobs = 0
+
+    def write_results(futures):
+        nonlocal done_jobs, failed_jobs
+        for future in futures:
+            result = future.result()
+            output.write(json.dumps(result, ensure_ascii=False) + '\n'); output.flush()
+            done_jobs += 1; failed_jobs += 'error' in result
+        if progress: print(f"\r已完成 {done_jobs} 条密文 (失败 {failed_jobs})...", end='', file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as pool:
+        pending = set()
+        for job_id, job_source in iter_jobs(source):
+            pending.add(pool.submit(solve_job, job_id, job_source))
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write_results(finished)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write_results(finished)
+    if progress: print(f"\r已完成 {done_jobs} 条密文 (失败 {failed_jobs})。", file=sys.stderr)
+    return done_jobs, failed_jobs
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="无界面批量破解单表替换密文")
+    parser.add_argument('source', help="密文目录 (每个 .txt 文件一条密文) 或 JSONL 文件 (每行 {\"id\":..., \"ciphertext\":...})")
+    parser.add_argument('-o', '--output', default='results.jsonl', help="输出的 JSONL 结果文件")
+    parser.add_argument('--workers', type=int, default=None, help="进程数 (默认: CPU核数)")
+    parser.add_argument('--method', choices=('annealing', 'hill_climbing'), default='annealing', help="搜索方法")
+    parser.add_argument('--time-limit', type=float, default=5.0, help="每条密文的搜索时间 (秒)")
+    parser.add_argument('--restarts', type=int, default=1, help="每条密文独立搜索的次数, 取得分最高的替换表")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子 (便于复现)")
+    parser.add_argument('--model', default=main.LANGUAGE_MODEL_FILE, help="n-gram语言模型文件")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print(f"错误: 输入未找到 '{args.source}'", file=sys.stderr); return 1
+    with open(args.output, 'w', encoding='utf-8') as output:
+        run_batch(args.source, output, workers=args.workers, method=args.method, time_limit=args.time_limit,
+                  restarts=args.restarts, seed=args.seed, model=args.model)
+    print(f"结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,206 @@
+# benchmark.py
+# -*- coding: utf-8 -*-
+"""
+Latency benchmark of the interactive hot paths of DecryptionLogic.
+
+    python benchmark.py -o bench.json                       # run and write the results
+    python benchmark.py --baseline benchmark_baseline.json  # run and compare, exit code 1 on a regression
+    python benchmark.py --sizes 1000 100000 --save-baseline benchmark_baseline.json
+
+For every text size a plaintext is generated from the bundled word lists with a fixed seed and encrypted
+with cipher.cipher (also seeded), so every run measures the same ciphertexts. Each operation is timed
+repeat times with the garbage collector paused, like timeit (median and p95 in milliseconds), and once
+more under tracemalloc for its peak memory.
+Baselines are machine specific: compare runs made on the same machine with the same options. A baseline
+records the machine and the command that made it; regenerate it there with that command (--save-baseline).
+A median only counts as a regression beyond the relative tolerance plus noise_factor times the baseline's
+p95 - median spread, so ordinary run-to-run jitter of the short operations does not fail the gate.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cipher as ci
+import main
+import vector_engine as ve
+from batch_solve import load_resources
+from logic import DecryptionLogic
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+OPERATIONS = ('init', 'perform_decryption', 'suggest_best_swaps', 'apply_key_changes', 'undo_last_change')
+
+
+def generate_plaintext(size, seed):
+    """About size characters of English-like sentences drawn, Zipf-weighted, from the word lists and plaintext.txt."""
+    words = set()
+    for file_name in list(main.WORD_LIST_FILES.values()) + ['plaintext.txt']:
+        with open(os.path.join(DATA_DIR, file_name), 'r', encoding='utf-8') as f:
+            words.update(re.findall(r"[a-z]+", f.read().lower()))
+    rnd = random.Random(seed)
+    vocabulary = sorted(words); rnd.shuffle(vocabulary)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    pieces = []; length = 0
+    while length < size:
+        sentence = rnd.choices(vocabulary, weights, k=rnd.randint(4, 16))
+        if rnd.random() < 0.1: sentence[-1] += rnd.choice(("'s", "'t", "'d"))
+        text = ' '.join(sentence) + rnd.choice(('. ', '. ', ', ', '? ', '.\n'))
+        pieces.append(text[0].upper() + text[1:]); length += len(text)
+    return ''.join(pieces)[:size]
+
+
+def generate_ciphertext(size, seed):
+    """(ciphertext, true SubstitutionKey {cipher_char: plain_char}) of a seeded plaintext of size characters."""
+    encryption = ci.cipher(generate_plaintext(size, seed))
+    random.seed(seed) # cipher.cipher shuffles with the global generator
+    with contextlib.redirect_stdout(io.StringIO()): encryption.cipher() # It prints the key
+    return encryption.ciphered, encryption.decryption_key()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _time_calls(function, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None: setup()
+        gc.collect(); gc_enabled = gc.isenabled(); gc.disable() # Collections of earlier garbage are not timed
+        try:
+            start = time.perf_counter(); function(); timings.append((time.perf_counter() - start) * 1000.0)
+        finally:
+            if gc_enabled: gc.enable()
+    return timings
+
+
+def _peak_bytes(function, setup=None):
+    if setup is not None: setup()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_size(size, engine, repeat, seed=824):
+    """{operation: {'median_ms', 'p95_ms', 'runs', 'peak_kb'}} for one text size."""
+    ciphertext, true_key = generate_ciphertext(size, seed)
+    resources = dict(load_resources(), scoring_engine=engine)
+    make_logic = lambda: DecryptionLogic(ciphertext, **resources)
+    init_repeat = repeat if size < 1000000 else max(3, repeat // 5) # The largest texts take seconds per build
+    results = {}
+
+    def record(operation, function, runs, setup=None):
+        timings = _time_calls(function, runs, setup)
+        results[operation] = {'median_ms': round(statistics.median(timings), 3), 'p95_ms': round(percentile(timings, 0.95), 3),
+                              'runs': runs, 'peak_kb': round(_peak_bytes(function, setup) / 1024.0, 1)}
+
+    record('init', make_logic, init_repeat)
+    logic = make_logic()
+    record('perform_decryption', logic._perform_decryption, repeat)
+
+    def clear_caches(): logic.score_cache = {}; logic.partial_word_cache = {} # Every candidate is scored again
+    record('suggest_best_swaps', logic.suggest_best_swaps, repeat, setup=clear_caches)
+
+    # One correct mapping of the most frequent cipher letter, applied and undone alternately
+    cipher_char = logic.most_frequent_cipher_char or 'a'
+    change = {cipher_char: true_key[cipher_char] if true_key[cipher_char] != cipher_char else 'e'}
+    undo_if_applied = lambda: logic.undo_last_change() if logic.can_undo() else None
+    record('apply_key_changes', lambda: logic.apply_key_changes(change), repeat, setup=undo_if_applied)
+    apply_if_undone = lambda: None if logic.can_undo() else logic.apply_key_changes(change)
+    record('undo_last_change', logic.undo_last_change, repeat, setup=apply_if_undone)
+    return results
+
+
+def machine_info():
+    """The machine a report was measured on; baselines are only comparable on the same one."""
+    return {'node': platform.node(), 'machine': platform.machine(), 'processor': platform.processor() or None,
+            'cpu_count': os.cpu_count()}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, engine=None, repeat=15, progress=True, command=None):
+    engine = engine or ('numpy' if ve.numpy_available() else 'python')
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'engine': engine,
+                       'numpy': ve.np.__version__ if ve.numpy_available() else None, 'repeat': repeat,
+                       'machine': machine_info(), 'command': command,
+                       'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': {}}
+    for size in sizes:
+        if progress: print(f"测试 {size} 字符...", file=sys.stderr)
+        report['results'][str(size)] = benchmark_size(size, engine, repeat)
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25, noise_factor=3.0, min_delta_ms=2.0, min_delta_kb=256.0):
+    """
+    Lists the regressions of report against baseline: a median slower than the baseline's by more than
+    tolerance plus noise_factor times the baseline's p95 - median spread (and min_delta_ms), or a peak memory
+    larger by more than tolerance (and min_delta_kb). Sizes and operations missing from either report are skipped.
+    """
+    regressions = []
+    for size, operations in report['results'].items():
+        for operation, current in operations.items():
+            reference = baseline.get('results', {}).get(size, {}).get(operation)
+            if reference is None: continue
+            for field, min_delta, unit in (('median_ms', min_delta_ms, 'ms'), ('peak_kb', min_delta_kb, 'KB')):
+                old, new = reference.get(field), current.get(field)
+                if old is None or new is None: continue
+                noise = 0.0
+                if field == 'median_ms' and reference.get('p95_ms') is not None:
+                    noise = noise_factor * max(0.0, reference['p95_ms'] - old)
+                if new > old * (1.0 + tolerance) + noise and new - old > min_delta:
+                    regressions.append(f"{size} 字符 {operation} {field}: {old:.1f} -> {new:.1f} {unit} (+{(new / old - 1.0) * 100.0 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="DecryptionLogic 交互操作耗时与内存基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="密文长度 (字符数)")
+    parser.add_argument('--engine', choices=('python', 'numpy'), default=None, help="评分引擎 (默认: 有NumPy时为numpy)")
+    parser.add_argument('--repeat', type=int, default=15, help="每项操作的计时次数 (比较中位数)")
+    parser.add_argument('-o', '--output', default=None, help="写出JSON结果的文件 (默认: 标准输出)")
+    parser.add_argument('--baseline', default=None, help="与之比较的基准JSON文件")
+    parser.add_argument('--save-baseline', default=None, help="把本次结果保存为基准JSON文件")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允许的相对退化 (0.25 即 25%%)")
+    parser.add_argument('--noise-factor', type=float, default=3.0, help="另外允许基准 p95-中位数 波动的倍数")
+    args = parser.parse_args(argv)
+
+    command = ' '.join(['python', 'benchmark.py'] + list(sys.argv[1:] if argv is None else argv))
+    report = run_benchmarks(args.sizes, args.engine, max(1, args.repeat), command=command)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(output + '\n')
+    else: print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f: f.write(output + '\n')
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f: baseline = json.load(f)
+        meta = baseline.get('meta', {})
+        if meta.get('engine') != report['meta']['engine']:
+            print(f"警告: 基准使用的评分引擎为 {meta.get('engine')}, 本次为 {report['meta']['engine']}", file=sys.stderr)
+        if meta.get('machine') != report['meta']['machine']:
+            print(f"警告: 基准测量于 {meta.get('machine')}, 本机为 {report['meta']['machine']}; "
+                  f"请在本机用 {meta.get('command') or 'python benchmark.py --save-baseline ...'} 重新生成基准", file=sys.stderr)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.noise_factor)
+        for line in regressions: print(f"性能退化: {line}", file=sys.stderr)
+        if regressions: return 1
+        print("与基准相比没有性能退化。", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
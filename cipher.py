@@ -1,6 +1,8 @@
 # cipher.py
 import random
 from collections import Counter
+from compact_text import CompactText
+from substitution_key import SubstitutionKey
 
 # --- cipher class (for generating test ciphertext - not used in decryption tool) ---
 class cipher:
@@ -13,11 +15,12 @@ class cipher:
         # random.seed(824) # Fixed seed for consistent testing if needed
         random.shuffle(self.table)
         print(f"Encryption Key (a->{chr(ord('a')+self.table[0])}, b->...): {self.table}") # Show the key used
-        for c in self.plain:
-            if 'a' <= c <= 'z':
-                self.ciphered += chr(ord('a') + self.table[ord(c) - ord('a')])
-            else:
-                self.ciphered += c # Keep non-alphabetic characters
+        # One translate pass (non-alphabetic characters are kept): linear even for texts of many MB
+        self.ciphered += self.plain.translate({ord('a') + i: ord('a') + self.table[i] for i in range(26)})
+
+    def decryption_key(self):
+        # SubstitutionKey {cipher letter: plain letter} undoing this encryption (the inverse of self.table)
+        return SubstitutionKey.from_encryption_table(self.table)
 
 # --- decipher class (Original - We will implement decryption differently in window.py) ---
 # class decipher:
@@ -40,20 +43,69 @@ class cipher:
 
 # --- stat class (Used for frequency analysis) ---
 class stat:
-    def __init__(self, text):
+    def __init__(self, text, compact_text=None):
         self.text = text.lower() # Analyze lowercase
         self.letter_counts = Counter()
         self.letter_freq = {}
         self.total_letters = 0
         self.sorted_freq = [] # List of (letter, frequency) tuples, sorted desc
+        self.compact_text = compact_text # compact_text.CompactText of the same text, if the caller already has one
+        self._ngram_stats = None # Multi-order counts, computed together on first use
         self.cal_freq()
 
     def cal_freq(self):
-        for c in self.text:
-            if 'a' <= c <= 'z':
-                self.letter_counts[c] += 1
-                self.total_letters += 1
+        # Counted in C: the text is encoded to one byte per character and each letter is a bytes.count()
+        compact = self.compact_text or CompactText(self.text, index_positions=False)
+        for i, count in enumerate(compact.letter_counts()):
+            if count:
+                self.letter_counts[chr(ord('a') + i)] += count
+                self.total_letters += count
+        self._update_freq()
+
+    def _count_ngrams(self):
+        # Bigrams, trigrams, words and apostrophe contexts from one encoding of the text, cached on the object
+        if self._ngram_stats is None:
+            compact = self.compact_text or CompactText(self.text, index_positions=False)
+            token_counts, attached_token_counts = compact.token_counts()
+            token_length_counts = Counter()
+            for token, count in token_counts.items(): token_length_counts[len(token)] += count
+            self._ngram_stats = {
+                'bigram_counts': compact.bigram_counts(), # Flat 26*26 list, index a*26+b
+                'trigram_counts': compact.trigram_counts(), # Flat 26**3 list, index (a*26+b)*26+c
+                'token_counts': token_counts, # Counter of the a-z words
+                'attached_token_counts': attached_token_counts, # Occurrences touching non a-z letters
+                'token_length_counts': token_length_counts, # Counter {word length: occurrences}
+                'apostrophe_counts': compact.apostrophe_counts() # Per letter, after "'" at a word end
+            }
+        return self._ngram_stats
+
+    @property
+    def bigram_counts(self): return self._count_ngrams()['bigram_counts']
+    @property
+    def trigram_counts(self): return self._count_ngrams()['trigram_counts']
+    @property
+    def token_counts(self): return self._count_ngrams()['token_counts']
+    @property
+    def attached_token_counts(self): return self._count_ngrams()['attached_token_counts']
+    @property
+    def token_length_counts(self): return self._count_ngrams()['token_length_counts']
+    @property
+    def apostrophe_counts(self): return self._count_ngrams()['apostrophe_counts']
 
+    def update_counts(self, count_deltas, text):
+        # Applies {letter: change in count} for a text that differs from the counted one only in those letters,
+        # so the frequencies are recomputed from 26 counts instead of rescanning the text
+        self.text = text.lower()
+        self.compact_text = None; self._ngram_stats = None # Recounted from the new text if asked for
+        for c, delta in count_deltas.items():
+            if 'a' <= c <= 'z' and delta:
+                self.letter_counts[c] += delta
+                self.total_letters += delta
+        self._update_freq()
+
+    def _update_freq(self):
+        self.letter_freq = {}
+        self.sorted_freq = []
         if self.total_letters == 0:
             return # Avoid division by zero
 
@@ -0,0 +1,152 @@
+# compact_text.py
+# -*- coding: utf-8 -*-
+import re
+import sys
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError: # Optional: only speeds up trigram counting
+    np = None
+
+# Character classes of the encoded text (0-25 are the letters a-z, either case)
+CODE_APOSTROPHE = 26
+CODE_OTHER_ALPHA = 27 # Non-ASCII letters, still count as "alpha" for the apostrophe and standalone checks
+CODE_OTHER = 28
+
+_CODE_TABLE = bytes(code - 97 if 97 <= code <= 122 else code - 65 if 65 <= code <= 90 else
+                    CODE_APOSTROPHE if code == 39 else CODE_OTHER for code in range(256))
+_UPPER_FLAG_TABLE = bytes(49 if 65 <= code <= 90 else 48 for code in range(256)) # b'1' / b'0'
+# Token view of the codes: letters as a-z, other letters as '#', everything else as a space
+_TOKEN_TABLE = bytes(97 + code if code < 26 else 35 if code == CODE_OTHER_ALPHA else 32 for code in range(256))
+_NON_ASCII = re.compile('[^\x00-\x7f]')
+_TOKEN = re.compile(rb'[a-z]+')
+_OTHER_ALPHA_SEPARATOR = re.compile(rb'(?:^|(?<=[a-z]))#+(?=[a-z]|$)') # Separators made only of other letters
+
+
+def _pack_flags(flags):
+    # b'0'/b'1' per character -> bitmask, bit i % 8 of byte i // 8 (parsed as one base-2 number, in linear time)
+    if not flags: return b''
+    return int(flags[::-1], 2).to_bytes((len(flags) + 7) // 8, 'little')
+
+
+class CompactText:
+    """
+    Array-backed form of a (possibly very large) ciphertext, one byte per character:
+      codes       bytearray, 0-25 for a-z/A-Z, CODE_APOSTROPHE, CODE_OTHER_ALPHA or CODE_OTHER
+      upper_mask  bytearray bitmask of the upper-case letters
+      positions   26 array('I') of the sorted offsets of each letter
+    Offsets are character offsets into the original string. Costs about 1.1 bytes per character plus
+    4 bytes per letter, against ~36 bytes per letter for lists of Python ints.
+    The text is encoded in chunks, so no per-character Python object is ever created; building needs
+    the finished arrays plus about 3 bytes per character of one chunk (token_counts() briefly adds one
+    byte per character). With DecryptionLogic on top (decrypted text, its byte buffer, frequency
+    tables) a 2 MB English ciphertext measured ~12 bytes per input byte resident and ~23 at peak.
+    """
+    def __init__(self, text, chunk_chars=1 << 20, index_positions=True):
+        self.length = len(text)
+        self.codes = bytearray()
+        self.upper_mask = bytearray()
+        chunk_chars -= chunk_chars % 8 # Keeps the case bits of every chunk byte-aligned
+        for start in range(0, len(text), chunk_chars):
+            chunk = text[start:start + chunk_chars]
+            ascii_chunk = chunk.encode('ascii', errors='replace') # One byte per character, non-ASCII -> '?'
+            codes = bytearray(ascii_chunk.translate(_CODE_TABLE))
+            upper_flags = bytearray(ascii_chunk.translate(_UPPER_FLAG_TABLE))
+            if not chunk.isascii():
+                for match in _NON_ASCII.finditer(chunk):
+                    offset = match.start(); char = match.group(); char_lower = char.lower()
+                    if len(char_lower) == 1 and 'a' <= char_lower <= 'z': # e.g. the Kelvin sign decrypts as k
+                        codes[offset] = ord(char_lower) - 97; upper_flags[offset] = 49 if char.isupper() else 48
+                    elif char.isalpha(): codes[offset] = CODE_OTHER_ALPHA
+            self.codes += codes
+            self.upper_mask += _pack_flags(upper_flags)
+        self.positions = self._build_positions() if index_positions else None # Not needed for counting only
+
+    def _build_positions(self):
+        positions = []
+        codes = self.codes
+        for code in range(26):
+            offsets = array('I'); append = offsets.append
+            offset = codes.find(code)
+            while offset != -1:
+                append(offset); offset = codes.find(code, offset + 1)
+            positions.append(offsets)
+        return positions
+
+    def __len__(self): return self.length
+
+    def is_upper(self, offset):
+        return self.upper_mask[offset >> 3] >> (offset & 7) & 1
+
+    def letter_counts(self):
+        """Occurrences of each letter a-z (both cases)."""
+        if self.positions is None: return [self.codes.count(code) for code in range(26)]
+        return [len(offsets) for offsets in self.positions]
+
+    def bigram_counts(self):
+        """Flat 26x26 counts (a*26+b) of adjacent letter pairs; pairs never span a non-letter."""
+        # Even and odd offsets read as 16-bit values give every adjacent pair once, counted without Python tuples
+        pair_counts = Counter()
+        with memoryview(self.codes) as view:
+            for start in (0, 1):
+                end = start + (len(view) - start) // 2 * 2
+                if end > start: pair_counts.update(view[start:end].cast('H'))
+        counts = [0] * 676
+        for value, count in pair_counts.items():
+            left, right = (value & 255, value >> 8) if sys.byteorder == 'little' else (value >> 8, value & 255)
+            if left < 26 and right < 26: counts[left * 26 + right] += count
+        return counts
+
+    def trigram_counts(self, chunk_chars=1 << 20):
+        """Flat 26x26x26 counts ((a*26+b)*26+c) of letter triples; triples never span a non-letter."""
+        if np is None:
+            counts = [0] * (26 ** 3)
+            codes = self.codes
+            for (first, second, third), count in Counter(zip(codes, codes[1:], codes[2:])).items():
+                if first < 26 and second < 26 and third < 26: counts[(first * 26 + second) * 26 + third] = count
+            return counts
+        codes = np.frombuffer(self.codes, dtype=np.uint8)
+        counts = np.zeros(26 ** 3, dtype=np.int64)
+        for start in range(0, max(0, len(codes) - 2), chunk_chars): # Windows keep the temporary arrays small
+            window = codes[start:start + chunk_chars + 2].astype(np.int32)
+            first, second, third = window[:-2], window[1:-1], window[2:]
+            letters = (first < 26) & (second < 26) & (third < 26)
+            counts += np.bincount(((first * 26 + second) * 26 + third)[letters], minlength=26 ** 3)
+        return counts.tolist()
+
+    def apostrophe_counts(self):
+        """Per letter, occurrences right after an apostrophe and not followed by another letter (as in "it's")."""
+        counts = [0] * 26
+        codes = self.codes; size = len(codes)
+        offset = codes.find(CODE_APOSTROPHE)
+        while offset != -1:
+            if offset + 1 < size and codes[offset + 1] < 26:
+                following = codes[offset + 2] if offset + 2 < size else CODE_OTHER
+                if following >= 26 and following != CODE_OTHER_ALPHA: counts[codes[offset + 1]] += 1
+            offset = codes.find(CODE_APOSTROPHE, offset + 1)
+        return counts
+
+    def token_counts(self):
+        """
+        Returns (Counter of the a-z letter runs, Counter of their occurrences that are not standalone).
+        A run is not standalone when the separator on either side consists only of other letters (e.g. 'na' and 've'
+        in 'naïve'), the same rule as splitting the text on a-z runs and testing the neighbouring tokens with isalpha().
+        """
+        token_text = bytes(self.codes.translate(_TOKEN_TABLE))
+        counts = Counter(match.group().decode('ascii') for match in _TOKEN.finditer(token_text))
+        attached = Counter(); attached_starts = set()
+        for match in _OTHER_ALPHA_SEPARATOR.finditer(token_text):
+            if match.end() < len(token_text): attached_starts.add(match.end()) # The run after the separator
+            if match.start() > 0: # The run before it
+                start = match.start()
+                while start > 0 and 97 <= token_text[start - 1] <= 122: start -= 1
+                attached_starts.add(start)
+        for start in attached_starts:
+            attached[_TOKEN.match(token_text, start).group().decode('ascii')] += 1
+        return counts, attached
+
+    def nbytes(self):
+        """Memory held by the arrays (not counting the Python object headers)."""
+        return len(self.codes) + len(self.upper_mask) + sum(offsets.itemsize * len(offsets) for offsets in self.positions)
@@ -0,0 +1,44 @@
+# conftest.py
+# -*- coding: utf-8 -*-
+"""Shared pytest fixtures: the language resources of main.py and seeded sample ciphertexts."""
+import os
+import random
+import re
+import string
+
+import pytest
+
+import main
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='session')
+def resources():
+    """DecryptionLogic keyword arguments with main.py's language tables and word lists."""
+    resources = main.language_resources(os.path.join(DATA_DIR, main.LANGUAGE_MODEL_FILE))
+    resources['word_list_files'] = {name: os.path.join(DATA_DIR, path) for name, path in main.WORD_LIST_FILES.items()}
+    return resources
+
+
+def _sample_ciphertext(size, seed, words=None):
+    rnd = random.Random(seed)
+    if words is None:
+        with open(os.path.join(DATA_DIR, 'plaintext.txt'), 'r', encoding='utf-8') as f:
+            words = re.findall(r"[a-z]+(?:'[a-z]+)?", f.read().lower())
+    words = sorted(set(words))
+    pieces = []; length = 0
+    while length < size:
+        text = ' '.join(rnd.choices(words, k=rnd.randint(4, 16))) + rnd.choice(('. ', ', ', '? ', '.\n'))
+        pieces.append(text[0].upper() + text[1:]); length += len(text)
+    shuffled = list(string.ascii_lowercase); rnd.shuffle(shuffled)
+    encryption = dict(zip(string.ascii_lowercase, shuffled)) # plain_char -> cipher_char
+    table = str.maketrans(string.ascii_lowercase + string.ascii_uppercase, ''.join(shuffled) + ''.join(shuffled).upper())
+    return ''.join(pieces)[:size].translate(table), {c: p for p, c in encryption.items()}
+
+
+@pytest.fixture(scope='session')
+def sample_ciphertext():
+    """Function (size, seed, words=None) -> (ciphertext, true key {cipher_char: plain_char}) of size characters
+    of seeded sentences of the given words (default: those of plaintext.txt), encrypted with a seeded random key."""
+    return _sample_ciphertext
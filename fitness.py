@@ -0,0 +1,83 @@
+# fitness.py
+# -*- coding: utf-8 -*-
+import string
+from collections import Counter
+
+
+class BigramFitness:
+    """
+    Key-level fitness computed from the ciphertext's 26x26 bigram matrix and 26-letter unigram vector.
+    The text is counted once; score() then costs 26x26 operations and swap_delta() O(26),
+    the same for a 1 KB message and a 10 MB one.
+
+    Keys are lists plain_of[cipher index] = plain index. All tables are flat lists (bigrams row-major, a*26+b).
+    """
+    def __init__(self, unigram_counts, bigram_counts, mono_log_probs, digram_log_probs):
+        self.unigram_counts = list(unigram_counts)
+        self.bigram_counts = list(bigram_counts)
+        self.mono_log_probs = list(mono_log_probs)
+        self.digram_log_probs = list(digram_log_probs)
+        self.total_letters = sum(self.unigram_counts)
+        self.total_bigrams = sum(self.bigram_counts)
+        # Non-zero bigram cells only, so score() skips letter pairs that never occur in the ciphertext
+        self._bigram_cells = [(idx // 26, idx % 26, count) for idx, count in enumerate(self.bigram_counts) if count]
+
+    @staticmethod
+    def count_text(text):
+        """Returns (unigram_counts, bigram_counts) of the a-z letters of text; bigrams never span non-letters."""
+        text_lower = text.lower()
+        letter_counts = Counter(text_lower)
+        pair_counts = Counter(zip(text_lower, text_lower[1:]))
+        unigram_counts = [letter_counts.get(char, 0) for char in string.ascii_lowercase]
+        bigram_counts = [pair_counts.get((a, b), 0) for a in string.ascii_lowercase for b in string.ascii_lowercase]
+        return unigram_counts, bigram_counts
+
+    @classmethod
+    def from_logic(cls, logic):
+        source = logic.text_statistics # Whole-file counts in streaming mode
+        if source is not None: unigram_counts, bigram_counts = source.letter_counts, source.bigram_counts
+        else: unigram_counts, bigram_counts = logic.compact_text.letter_counts(), logic.ciphertext_analyzer.bigram_counts
+        model = logic.language_model
+        return cls(unigram_counts, bigram_counts, model.unigrams, model.digrams)
+
+    def score(self, plain_of):
+        """Log-likelihood of the text decrypted with plain_of (unigram plus bigram terms)."""
+        mono = self.mono_log_probs; digram = self.digram_log_probs
+        total = 0.0
+        for cipher_idx, count in enumerate(self.unigram_counts):
+            if count: total += count * mono[plain_of[cipher_idx]]
+        for a, b, count in self._bigram_cells:
+            total += count * digram[plain_of[a] * 26 + plain_of[b]]
+        return total
+
+    def _terms_touching(self, plain_of, i, j):
+        # Sum of the terms in rows i, j and columns i, j of the bigram matrix, plus unigrams i and j
+        counts = self.bigram_counts; digram = self.digram_log_probs
+        plain_i = plain_of[i]; plain_j = plain_of[j]
+        row_i = i * 26; row_j = j * 26
+        total = (self.unigram_counts[i] * self.mono_log_probs[plain_i] +
+                 self.unigram_counts[j] * self.mono_log_probs[plain_j])
+        for k in range(26):
+            plain_k = plain_of[k]
+            total += counts[row_i + k] * digram[plain_i * 26 + plain_k] + counts[row_j + k] * digram[plain_j * 26 + plain_k]
+            if k != i and k != j: # Cells (i, i), (i, j), (j, i), (j, j) are already counted in the rows
+                row_k = k * 26
+                total += counts[row_k + i] * digram[plain_k * 26 + plain_i] + counts[row_k + j] * digram[plain_k * 26 + plain_j]
+        return total
+
+    def swap_delta(self, plain_of, i, j):
+        """Score change from swapping the plain letters of cipher letters i and j, in O(26). plain_of is left unchanged."""
+        if i == j: return 0.0
+        before = self._terms_touching(plain_of, i, j)
+        plain_of[i], plain_of[j] = plain_of[j], plain_of[i]
+        after = self._terms_touching(plain_of, i, j)
+        plain_of[i], plain_of[j] = plain_of[j], plain_of[i]
+        return after - before
+
+    def score_key_map(self, key_map):
+        """Scores a {cipher_char: plain_char} map; letters outside a-z or missing keep their identity mapping."""
+        plain_of = []
+        for idx, char in enumerate(string.ascii_lowercase):
+            plain_char = key_map.get(char, char)
+            plain_of.append(ord(plain_char) - 97 if len(plain_char) == 1 and 'a' <= plain_char <= 'z' else idx)
+        return self.score(plain_of)
@@ -4,7 +4,12 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, font, filedialog # Added filedialog
 import string
 import json # Added json for saving/loading key table
+import os
+import queue
+import threading
+from bisect import bisect_left, bisect_right
 from logic import DecryptionLogic
+from solver import AutoSolver
 
 class DecryptionAppGUI:
     """
@@ -22,9 +27,38 @@ class DecryptionAppGUI:
         self.apply_button = None
         self.apply_suggestion_button = None
         self.undo_button = None
+        self.redo_button = None
         self.save_key_button = None # New button
         self.load_key_button = None # New button
+        self.auto_solve_button = None
+        self.auto_solve_method = 'hill_climbing' # Or 'annealing'
+        self.auto_solve_time_limit = 5.0 # Seconds
+        self.auto_solve_results = queue.Queue() # (solver, result or None if cancelled, error message) from the worker thread
+        self.auto_solve_cancel = None # threading.Event of the running search, None while idle
+        self.diagnostics_button = None
+        self.diagnostics_window = None # Optional pane with the logic's instrumentation counters
+        self.diagnostics_display = None
+        self.instrumentation_var = None
         self.key_entries = {}
+        # Suggestions are computed by a worker thread so the main loop never waits for them
+        self.logic.defer_suggestions = True
+        self.suggestion_errors = queue.Queue() # (generation, error message) reported by worker threads
+        self.requested_suggestion_generation = None
+        self.suggestion_polling = False
+        self.suggestion_poll_ms = 50
+        self.displayed_suggestion_generation = None # State whose single-move suggestions are on screen
+        # Plaintext rendering works on fixed-size blocks of the text; each block remembers the key state it
+        # shows, so a key change only rewrites the changed letters, and only near the viewport at first
+        self.plain_block_chars = 4096
+        self.plain_eager_chars = 200000 # Shorter texts are always rendered completely
+        self.plain_margin_chars = 8192 # Rendered around the viewport of longer texts
+        self.plain_rewrite_fraction = 0.125 # Above this share of changed positions a block is rewritten in runs
+        self.plain_line_starts = None
+        self.plain_block_states = []
+        self.plain_stale_blocks = set()
+        self.plain_target_state = None
+        self.plain_fill_scheduled = False
+        self.plain_scroll_scheduled = False
 
         self.setup_ui()
         self.refresh_display()
@@ -48,7 +82,12 @@ class DecryptionAppGUI:
         left_frame = ttk.Frame(main_paned_window, padding=5)
         main_paned_window.add(left_frame) # Give weight for resizing
 
-        ttk.Label(left_frame, text="密文:").pack(anchor=tk.W)
+        statistics = self.logic.text_statistics
+        if statistics is not None and statistics.total_chars > len(self.logic.get_ciphertext()): # Streaming mode
+            ttk.Label(left_frame, text=f"密文 (大文件: 仅载入前 {len(self.logic.get_ciphertext())} 个字符, 共 {statistics.total_chars} 个字符; "
+                                       f"字母频率与自动破解按整个文件统计):").pack(anchor=tk.W)
+        else:
+            ttk.Label(left_frame, text="密文:").pack(anchor=tk.W)
         self.ciphertext_display = scrolledtext.ScrolledText(left_frame, wrap=tk.WORD, height=15, font=fixed_font, relief=tk.SUNKEN, borderwidth=1)
         self.ciphertext_display.insert(tk.END, self.logic.get_ciphertext())
         self.ciphertext_display.config(state=tk.DISABLED)
@@ -60,6 +99,7 @@ class DecryptionAppGUI:
         self.plaintext_display.pack(fill=tk.BOTH, expand=True)
         self.plaintext_display.tag_configure('highlight_current', background='yellow')
         self.plaintext_display.tag_configure('highlight_modified', background='lightgreen')
+        self.plaintext_display.config(yscrollcommand=self._on_plaintext_scroll)
 
         right_frame = ttk.Frame(main_paned_window, padding=5)
         main_paned_window.add(right_frame) # Give weight for resizing
@@ -89,6 +129,22 @@ class DecryptionAppGUI:
         suggestion_frame.pack(fill=tk.X, pady=(0, 5))
         self.suggestion_label = ttk.Label(suggestion_frame, text="加载建议中...", justify=tk.LEFT, font=fixed_font, wraplength=500) # Adjusted wraplength
         self.suggestion_label.pack(anchor=tk.NW, fill=tk.X)
+        self.pattern_constraints_var = tk.BooleanVar(value=self.logic.use_pattern_constraints)
+        ttk.Checkbutton(suggestion_frame, text="仅建议与单词模式一致的替换", variable=self.pattern_constraints_var,
+                        command=self.toggle_pattern_constraints_action).pack(anchor=tk.W)
+        self.partial_word_scoring_var = tk.BooleanVar(value=self.logic.use_partial_word_scoring)
+        ttk.Checkbutton(suggestion_frame, text="对部分解密的长单词进行词典匹配评分", variable=self.partial_word_scoring_var,
+                        command=self.toggle_partial_word_scoring_action).pack(anchor=tk.W)
+        self.parallel_scoring_var = tk.BooleanVar(value=self.logic.parallel_scorer is not None)
+        if self.logic.scoring_engine == 'python' and (os.cpu_count() or 1) > 1: # Nothing to gain with NumPy or on one core
+            ttk.Checkbutton(suggestion_frame, text=f"多进程并行计算建议 (长文本, {os.cpu_count()}个进程)", variable=self.parallel_scoring_var,
+                            command=self.toggle_parallel_scoring_action).pack(anchor=tk.W)
+        self.lookahead_var = tk.BooleanVar(value=self.logic.use_lookahead)
+        ttk.Checkbutton(suggestion_frame, text=f"多步前瞻建议 ({self.logic.lookahead_depth}步组合, 束宽{self.logic.lookahead_beam_width})",
+                        variable=self.lookahead_var, command=self.toggle_lookahead_action).pack(anchor=tk.W)
+        self.mapping_confidence_var = tk.BooleanVar(value=self.logic.use_mapping_confidence)
+        ttk.Checkbutton(suggestion_frame, text=f"估计建议的置信度 (MCMC抽样, {self.logic.confidence_time_budget:g}秒)",
+                        variable=self.mapping_confidence_var, command=self.toggle_mapping_confidence_action).pack(anchor=tk.W)
 
         # Button Frame for actions
         actions_button_frame = ttk.Frame(right_frame, padding=(0, 5, 0, 0))
@@ -101,7 +157,10 @@ class DecryptionAppGUI:
         self.apply_suggestion_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 2))
 
         self.undo_button = ttk.Button(actions_button_frame, text="撤销上次更改", command=self.undo_last_change_action, state=tk.DISABLED)
-        self.undo_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        self.undo_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 2))
+
+        self.redo_button = ttk.Button(actions_button_frame, text="重做", command=self.redo_last_change_action, state=tk.DISABLED)
+        self.redo_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
 
         # Button Frame for file operations
         file_ops_button_frame = ttk.Frame(right_frame, padding=(0, 5, 0, 0))
@@ -111,7 +170,13 @@ class DecryptionAppGUI:
         self.save_key_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
 
         self.load_key_button = ttk.Button(file_ops_button_frame, text="读取替换表", command=self.load_key_table_action)
-        self.load_key_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        self.load_key_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 2))
+
+        self.auto_solve_button = ttk.Button(file_ops_button_frame, text="自动破解", command=self.auto_solve_action)
+        self.auto_solve_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 2))
+
+        self.diagnostics_button = ttk.Button(file_ops_button_frame, text="性能诊断", command=self.open_diagnostics_action)
+        self.diagnostics_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
 
 
         legend_frame = ttk.LabelFrame(right_frame, text="颜色图例", padding=5)
@@ -130,36 +195,135 @@ class DecryptionAppGUI:
             entry_widget.insert(0, plain_char.lower())
             entry_widget.config(validate="key")
 
-    def _update_plaintext_display(self):
-        decrypted_text = self.logic.get_current_decrypted_text()
+    def _plain_render_state(self):
+        # (plain char, highlight tag) of every cipher letter; blocks showing the same state need no work
+        current_key = self.logic.get_current_key()
         last_changed = self.logic.get_last_changed_chars()
         modified = self.logic.get_modified_set()
-        original_ciphertext = self.logic.get_ciphertext()
-
+        plain_chars = tuple(current_key.get(c, c) for c in string.ascii_lowercase)
+        tags = tuple('highlight_current' if c in last_changed else 'highlight_modified' if c in modified else ''
+                     for c in string.ascii_lowercase)
+        return plain_chars, tags
+
+    def _reset_plaintext_display(self, state):
+        """Inserts the whole decrypted text untagged in one call; highlights are then added block by block."""
+        ciphertext = self.logic.get_ciphertext()
+        self.plain_line_starts = [0]
+        newline = ciphertext.find('\n')
+        while newline != -1:
+            self.plain_line_starts.append(newline + 1); newline = ciphertext.find('\n', newline + 1)
         self.plaintext_display.config(state=tk.NORMAL)
         self.plaintext_display.delete('1.0', tk.END)
-
-        current_decrypted_index = 0
-        for i, cipher_char_original in enumerate(original_ciphertext):
-            lower_cipher = cipher_char_original.lower()
-            if 'a' <= lower_cipher <= 'z':
-                while current_decrypted_index < len(decrypted_text) and not decrypted_text[current_decrypted_index].isalpha():
-                    self.plaintext_display.insert(tk.END, decrypted_text[current_decrypted_index])
-                    current_decrypted_index += 1
-                if current_decrypted_index < len(decrypted_text):
-                    plain_display_char = decrypted_text[current_decrypted_index]
-                    tag_to_apply = None
-                    if lower_cipher in last_changed:
-                        tag_to_apply = 'highlight_current'
-                    elif lower_cipher in modified:
-                        tag_to_apply = 'highlight_modified'
-                    self.plaintext_display.insert(tk.END, plain_display_char, tag_to_apply if tag_to_apply else ())
-                    current_decrypted_index += 1
-            else:
-                 self.plaintext_display.insert(tk.END, cipher_char_original)
-                 if current_decrypted_index < len(decrypted_text) and decrypted_text[current_decrypted_index] == cipher_char_original:
-                     current_decrypted_index += 1
+        self.plaintext_display.insert('1.0', self.logic.get_current_decrypted_text())
+        self.plaintext_display.config(state=tk.DISABLED)
+        untagged_state = (state[0], ('',) * 26)
+        block_count = (len(ciphertext) + self.plain_block_chars - 1) // self.plain_block_chars
+        self.plain_block_states = [untagged_state] * block_count
+        self.plain_stale_blocks = set(range(block_count))
+
+    def _plain_index(self, offset):
+        # Character offset in the text -> Tk 'line.column' index
+        line = bisect_right(self.plain_line_starts, offset)
+        return f"{line}.{offset - self.plain_line_starts[line - 1]}"
+
+    def _plain_offset(self, index):
+        line, column = map(int, index.split('.'))
+        return self.plain_line_starts[min(line, len(self.plain_line_starts)) - 1] + column
+
+    def _render_plain_block(self, block):
+        """Brings one block to the target state, touching only the letters whose character or highlight changed."""
+        old_plain, old_tags = self.plain_block_states[block]
+        new_plain, new_tags = state = self.plain_target_state
+        start = block * self.plain_block_chars
+        end = min(start + self.plain_block_chars, len(self.logic.get_ciphertext()))
+        changed = [] # (letter index, positions in the block)
+        changed_count = 0
+        for idx, cipher_char in enumerate(string.ascii_lowercase):
+            if old_plain[idx] == new_plain[idx] and old_tags[idx] == new_tags[idx]: continue
+            positions = self.logic.get_letter_positions(cipher_char)
+            block_positions = positions[bisect_left(positions, start):bisect_left(positions, end)]
+            if block_positions: changed.append((idx, block_positions)); changed_count += len(block_positions)
+
+        widget = self.plaintext_display
+        if changed_count > self.plain_rewrite_fraction * (end - start):
+            # Many changes: rewrite the block with one insert, runs of equally highlighted characters joined
+            block_plain = self.logic.get_current_decrypted_text()[start:end]
+            block_cipher = self.logic.get_ciphertext()[start:end].lower()
+            insert_args = []; run_start = 0; run_tag = None
+            for offset, cipher_char in enumerate(block_cipher):
+                tag = new_tags[ord(cipher_char) - 97] if 'a' <= cipher_char <= 'z' else ''
+                if tag != run_tag:
+                    if offset > run_start: insert_args += [block_plain[run_start:offset], run_tag or ()]
+                    run_start = offset; run_tag = tag
+            if len(block_cipher) > run_start: insert_args += [block_plain[run_start:], run_tag or ()]
+            start_index = self._plain_index(start)
+            widget.delete(start_index, self._plain_index(end))
+            widget.insert(start_index, *insert_args)
+        elif changed:
+            ciphertext = self.logic.get_ciphertext()
+            retag_ranges = {'highlight_current': [], 'highlight_modified': []}; cleared_ranges = []
+            for idx, block_positions in changed:
+                tag = new_tags[idx]
+                if old_plain[idx] != new_plain[idx]:
+                    plain_char = new_plain[idx]
+                    for offset in block_positions:
+                        index = self._plain_index(offset)
+                        widget.replace(index, f"{index}+1c", plain_char.upper() if ciphertext[offset].isupper() else plain_char, tag or ())
+                else: # Same character, only the highlight differs
+                    for offset in block_positions:
+                        index = self._plain_index(offset); ranges = (index, f"{index}+1c")
+                        cleared_ranges.extend(ranges)
+                        if tag: retag_ranges[tag].extend(ranges)
+            if cleared_ranges:
+                for tag in retag_ranges: widget.tk.call(widget._w, 'tag', 'remove', tag, *cleared_ranges)
+            for tag, ranges in retag_ranges.items():
+                if ranges: widget.tag_add(tag, *ranges)
+        self.plain_block_states[block] = state
+        self.plain_stale_blocks.discard(block)
+
+    def _visible_plain_blocks(self):
+        widget = self.plaintext_display
+        first = self._plain_offset(widget.index('@0,0'))
+        last = self._plain_offset(widget.index(f"@{widget.winfo_width()},{widget.winfo_height()}"))
+        first = max(0, first - self.plain_margin_chars); last += self.plain_margin_chars
+        return range(first // self.plain_block_chars, min(len(self.plain_block_states), last // self.plain_block_chars + 1))
+
+    def _render_visible_plaintext(self):
+        self.plain_scroll_scheduled = False
+        if not self.plain_stale_blocks: return
+        if len(self.logic.get_ciphertext()) <= self.plain_eager_chars: blocks = list(self.plain_stale_blocks)
+        else: blocks = [block for block in self._visible_plain_blocks() if block in self.plain_stale_blocks]
+        if blocks:
+            self.plaintext_display.config(state=tk.NORMAL)
+            for block in sorted(blocks): self._render_plain_block(block)
+            self.plaintext_display.config(state=tk.DISABLED)
+        if self.plain_stale_blocks and not self.plain_fill_scheduled:
+            self.plain_fill_scheduled = True
+            self.root.after(1, self._fill_plaintext_blocks)
+
+    def _fill_plaintext_blocks(self):
+        # Renders the blocks away from the viewport a few at a time, between user events
+        self.plain_fill_scheduled = False
+        if not self.plain_stale_blocks: return
+        self.plaintext_display.config(state=tk.NORMAL)
+        for block in sorted(self.plain_stale_blocks)[:4]: self._render_plain_block(block)
         self.plaintext_display.config(state=tk.DISABLED)
+        if self.plain_stale_blocks:
+            self.plain_fill_scheduled = True
+            self.root.after(1, self._fill_plaintext_blocks)
+
+    def _on_plaintext_scroll(self, first, last):
+        self.plaintext_display.vbar.set(first, last)
+        if self.plain_stale_blocks and not self.plain_scroll_scheduled:
+            self.plain_scroll_scheduled = True
+            self.root.after_idle(self._render_visible_plaintext)
+
+    def _update_plaintext_display(self):
+        state = self._plain_render_state()
+        if self.plain_line_starts is None: self._reset_plaintext_display(state)
+        self.plain_target_state = state
+        self.plain_stale_blocks = {block for block, block_state in enumerate(self.plain_block_states) if block_state != state}
+        self._render_visible_plaintext()
 
     def _update_analysis_display(self):
         analysis_data = self.logic.get_analysis_data()
@@ -171,12 +335,24 @@ class DecryptionAppGUI:
         for mapped_plain, cipher_freq_pct, std_freq_pct, std_char in analysis_data:
             line = f" {mapped_plain.upper():<7} | {cipher_freq_pct:>12.2f} | {std_freq_pct:>12.2f} |    {std_char.upper()}   \n"
             display_text += line
+        ngram_summary = self.logic.get_ngram_summary()
+        display_text += "\n常见双字母组 (密文->当前解密):\n"
+        display_text += "  ".join(f"{c.upper()}->{p}({n})" for c, p, n in ngram_summary['bigrams']) + "\n"
+        display_text += "常见三字母组 (密文->当前解密):\n"
+        display_text += "  ".join(f"{c.upper()}->{p}({n})" for c, p, n in ngram_summary['trigrams']) + "\n"
+        display_text += "单词长度分布: " + ", ".join(f"{length}:{n}" for length, n in ngram_summary['word_lengths'][:12]) + "\n"
         display_text += "\n" + "-"*45 + "\n"
         display_text += "常见解密提示:\n- 单字母词 (常是 'a' 或 'i')\n- 双字母组合 (如 'll', 'ss', 'ee', 'oo')\n- 最常见三字母词 (常是 'the')\n"
         self.analysis_display.insert('1.0', display_text)
         self.analysis_display.config(state=tk.DISABLED)
 
     def _update_suggestion_display(self):
+        if self.logic.has_pending_suggestions():
+            self.apply_suggestion_button.config(state=tk.DISABLED)
+            if self.suggestion_label:
+                self.suggestion_label.config(text="最佳建议 (基于密文频率+频率匹配+上下文):\n计算中...")
+            self._request_suggestions()
+            return
         suggestions = self.logic.get_suggestions()
         suggestion_text = "最佳建议 (基于密文频率+频率匹配+上下文):\n"
         if suggestions:
@@ -185,17 +361,83 @@ class DecryptionAppGUI:
                 conflict_indicator = ""
                 if conflicting_cipher and conflicting_cipher != c_char:
                     conflict_indicator = f" (!='{p_char.upper()}'已被'{conflicting_cipher.upper()}'确认)"
-                suggestion_text += f"{i+1}. {c_char.upper()} -> {p_char.upper()} (评分:{score:.2f}){conflict_indicator}\n"
+                suggestion_text += f"{i+1}. {c_char.upper()} -> {p_char.upper()} (评分:{score:.2f}{self._suggestion_confidence_text(c_char, p_char)}){conflict_indicator}\n"
             self.apply_suggestion_button.config(state=tk.NORMAL)
         else:
             suggestion_text += "无可用建议或未满足计算条件..."
             self.apply_suggestion_button.config(state=tk.DISABLED)
+        suggestion_text += self._lookahead_text()
+        suggestion_text += self._confidence_diagnostics_text()
         if self.suggestion_label:
              self.suggestion_label.config(text=suggestion_text.strip())
+        self.displayed_suggestion_generation = self.logic.suggestion_generation
+        if self.logic.has_pending_lookahead() or self.logic.has_pending_confidence():
+            self._request_suggestions() # Shown once the worker has them
+
+    def _lookahead_text(self):
+        if not self.logic.use_lookahead: return ""
+        text = f"\n多步前瞻 (最多{self.logic.lookahead_depth}步, 按各步评分之和):\n"
+        sequences = self.logic.get_lookahead_sequences()
+        if sequences is None: return text + "计算中...\n"
+        if not sequences: return text + "无可用组合\n"
+        for i, (moves, total) in enumerate(sequences):
+            text += f"{i+1}. {', '.join(f'{c.upper()} -> {p.upper()}' for c, p, _ in moves)} (合计:{total:.2f})\n"
+        return text
+
+    def _suggestion_confidence_text(self, cipher_char, plain_char):
+        if not self.logic.use_mapping_confidence: return ""
+        confidence = self.logic.get_mapping_confidence()
+        if confidence is None: return ", 置信度:计算中"
+        if not confidence['converged']: return "" # Chains that disagree give noise, not probabilities
+        return f", 置信度:{self.logic.get_suggestion_confidence(cipher_char, plain_char):.0%}"
+
+    def _confidence_diagnostics_text(self):
+        confidence = self.logic.get_mapping_confidence()
+        if confidence is None: return ""
+        state = "已收敛" if confidence['converged'] else "未收敛, 不显示置信度 (可先确认几个高频字母)"
+        return (f"\n置信度: {confidence['chains']}条马尔可夫链 x {confidence['samples_per_chain']}个样本,"
+                f" R-hat {confidence['rhat']:.2f} (映射最大 {confidence['max_mapping_rhat']:.2f}), {state}\n")
+
+    def _request_suggestions(self):
+        """Starts a worker thread for the current state's suggestions (a running one for an older state stops by itself)."""
+        generation = self.logic.suggestion_generation
+        if generation != self.requested_suggestion_generation:
+            self.requested_suggestion_generation = generation
+            threading.Thread(target=self._suggestion_worker, args=(generation,), daemon=True).start()
+        if not self.suggestion_polling:
+            self.suggestion_polling = True
+            self.root.after(self.suggestion_poll_ms, self._poll_suggestions)
+
+    def _suggestion_worker(self, generation):
+        # Runs outside the Tk thread: no widget access here, results are picked up by _poll_suggestions
+        try:
+            self.logic.compute_pending_suggestions(generation)
+        except Exception as e:
+            self.suggestion_errors.put((generation, str(e)))
+
+    def _poll_suggestions(self):
+        error = None
+        while True:
+            try: generation, message = self.suggestion_errors.get_nowait()
+            except queue.Empty: break
+            if generation == self.logic.suggestion_generation: error = message
+        if error is not None:
+            self.suggestion_polling = False
+            if self.suggestion_label:
+                self.suggestion_label.config(text=f"计算替换建议时发生错误:\n{error}")
+        elif self.logic.has_pending_suggestions() or self.logic.has_pending_lookahead() or self.logic.has_pending_confidence():
+            if not self.logic.has_pending_suggestions() and self.displayed_suggestion_generation != self.logic.suggestion_generation:
+                self._update_suggestion_display() # The single moves are ready, the lookahead or confidence is still running
+            self._request_suggestions() # Restarts the computation if the state changed since the last request
+            self.root.after(self.suggestion_poll_ms, self._poll_suggestions)
+        else:
+            self.suggestion_polling = False
+            self._update_suggestion_display()
 
     def _update_button_states(self):
         can_undo = self.logic.can_undo()
         self.undo_button.config(state=tk.NORMAL if can_undo else tk.DISABLED)
+        self.redo_button.config(state=tk.NORMAL if self.logic.can_redo() else tk.DISABLED)
 
     def refresh_display(self):
         print("Refreshing display...")
@@ -204,6 +446,7 @@ class DecryptionAppGUI:
         self._update_analysis_display()
         self._update_suggestion_display()
         self._update_button_states()
+        self._update_diagnostics_display()
         print("Display refresh complete.")
 
     def apply_key_changes_action(self):
@@ -245,6 +488,14 @@ class DecryptionAppGUI:
             messagebox.showinfo("撤销", "没有可恢复的上一步替换表状态。")
             self._update_button_states()
 
+    def redo_last_change_action(self):
+        redone = self.logic.redo_last_change()
+        if redone:
+            self.refresh_display()
+        else:
+            messagebox.showinfo("重做", "没有可重做的替换表更改。")
+            self._update_button_states()
+
     def save_key_table_action(self):
         """Saves the current substitution key to a file."""
         current_key = self.logic.get_current_key()
@@ -258,7 +509,7 @@ class DecryptionAppGUI:
 
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(current_key, f, indent=4, ensure_ascii=False)
+                json.dump(current_key.to_dict(), f, indent=4, ensure_ascii=False)
             messagebox.showinfo("保存成功", f"替换表已保存到:\n{filepath}")
         except Exception as e:
             messagebox.showerror("保存失败", f"保存替换表时发生错误:\n{e}")
@@ -326,6 +577,106 @@ class DecryptionAppGUI:
             messagebox.showerror("读取失败", f"读取替换表时发生错误:\n{e}")
 
 
+    def toggle_pattern_constraints_action(self):
+        self.logic.set_pattern_constraints(self.pattern_constraints_var.get())
+        self._update_suggestion_display()
+
+    def toggle_partial_word_scoring_action(self):
+        self.logic.set_partial_word_scoring(self.partial_word_scoring_var.get())
+        self._update_suggestion_display()
+
+    def toggle_lookahead_action(self):
+        self.logic.set_lookahead(self.lookahead_var.get())
+        self._update_suggestion_display()
+
+    def toggle_mapping_confidence_action(self):
+        self.logic.set_mapping_confidence(self.mapping_confidence_var.get())
+        self._update_suggestion_display()
+
+    def toggle_parallel_scoring_action(self):
+        try:
+            self.logic.set_parallel_scoring(os.cpu_count() or 1 if self.parallel_scoring_var.get() else 0)
+        except Exception as e:
+            self.parallel_scoring_var.set(False)
+            messagebox.showerror("并行计算", f"无法启动进程池:\n{e}")
+        self._update_suggestion_display()
+
+    def auto_solve_action(self):
+        """
+        Searches for a complete key automatically on a worker thread and adopts it as if it was loaded from
+        a file; pressing the button again while it runs cancels the search.
+        """
+        if self.auto_solve_cancel is not None:
+            self.auto_solve_cancel.set(); self.auto_solve_button.config(state=tk.DISABLED); return
+        try:
+            solver = AutoSolver(self.logic, method=self.auto_solve_method, time_limit=self.auto_solve_time_limit)
+        except Exception as e:
+            messagebox.showerror("自动破解失败", f"自动破解时发生错误:\n{e}"); return
+        self.auto_solve_cancel = threading.Event()
+        self.auto_solve_button.config(text="停止破解")
+        threading.Thread(target=self._auto_solve_worker, args=(solver, self.auto_solve_cancel), daemon=True).start()
+        self.root.after(self.suggestion_poll_ms, self._poll_auto_solve)
+
+    def _auto_solve_worker(self, solver, cancel):
+        # Runs outside the Tk thread: the solver only reads the key fitness built when it was created
+        try: self.auto_solve_results.put((solver, solver.solve(is_cancelled=cancel.is_set), None))
+        except Exception as e: self.auto_solve_results.put((solver, None, str(e)))
+
+    def _poll_auto_solve(self):
+        try: solver, result, error = self.auto_solve_results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.suggestion_poll_ms, self._poll_auto_solve); return
+        self.auto_solve_cancel = None
+        self.auto_solve_button.config(text="自动破解", state=tk.NORMAL)
+        if error is not None:
+            messagebox.showerror("自动破解失败", f"自动破解时发生错误:\n{error}"); return
+        if result is None: return # Cancelled: the key is left as it was
+        solved_key, score = result
+        try:
+            self.logic.load_key_from_file(solved_key) # Undo returns to the previous key
+            self.refresh_display()
+        except Exception as e:
+            messagebox.showerror("自动破解失败", f"载入破解结果时发生错误:\n{e}"); return
+        messagebox.showinfo("自动破解", f"自动破解完成 (评分:{score:.2f}, 迭代次数:{solver.iterations})。\n"
+                                       f"可在此基础上继续手动调整替换表。")
+
+    def open_diagnostics_action(self):
+        """Opens (or raises) the diagnostics pane: per-method and per-scoring-component calls, time and items scanned."""
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift(); self._update_diagnostics_display(); return
+        self.diagnostics_window = tk.Toplevel(self.root)
+        self.diagnostics_window.title("性能诊断")
+        self.diagnostics_window.geometry("780x360")
+        controls = ttk.Frame(self.diagnostics_window, padding=5)
+        controls.pack(fill=tk.X)
+        self.instrumentation_var = tk.BooleanVar(value=self.logic.instrumentation.enabled)
+        ttk.Checkbutton(controls, text="记录各组件的耗时与计数 (关闭时几乎无开销)", variable=self.instrumentation_var,
+                        command=self.toggle_instrumentation_action).pack(side=tk.LEFT)
+        ttk.Button(controls, text="刷新", command=self._update_diagnostics_display).pack(side=tk.RIGHT)
+        ttk.Button(controls, text="清零", command=self.reset_instrumentation_action).pack(side=tk.RIGHT, padx=(0, 5))
+        self.diagnostics_display = scrolledtext.ScrolledText(self.diagnostics_window, wrap=tk.NONE, font=("Consolas", 10),
+                                                             relief=tk.SUNKEN, borderwidth=1)
+        self.diagnostics_display.pack(fill=tk.BOTH, expand=True)
+        self._update_diagnostics_display()
+
+    def toggle_instrumentation_action(self):
+        self.logic.set_instrumentation(self.instrumentation_var.get())
+        self._update_diagnostics_display()
+
+    def reset_instrumentation_action(self):
+        self.logic.set_instrumentation(self.instrumentation_var.get(), reset=True)
+        self._update_diagnostics_display()
+
+    def _update_diagnostics_display(self):
+        if self.diagnostics_window is None or not self.diagnostics_window.winfo_exists(): return
+        if self.logic.get_instrumentation_stats(): display_text = "\n".join(self.logic.instrumentation.report_lines())
+        elif self.logic.instrumentation.enabled: display_text = "暂无数据：修改替换表或计算建议后点击\"刷新\"。"
+        else: display_text = "计时未开启。勾选上方选项后，之后的操作会被记录。"
+        self.diagnostics_display.config(state=tk.NORMAL)
+        self.diagnostics_display.delete('1.0', tk.END)
+        self.diagnostics_display.insert('1.0', display_text)
+        self.diagnostics_display.config(state=tk.DISABLED)
+
     def validate_key_input(self, new_value):
         if not new_value:
             return True
@@ -1,18 +1,49 @@
 # logic.py
 # -*- coding: utf-8 -*-
-import string
 import copy
+import string
 import math
+import functools
+import heapq
+import threading
+import time
 from collections import Counter
 import cipher as ci
-import re
+import vector_engine as ve
+from fitness import BigramFitness
+from ngram_model import NgramModel
+from word_patterns import PatternIndex, ConstraintSolver
+from word_trie import WordTrie, FULL_MASK
+from compact_text import CompactText, CODE_APOSTROPHE, CODE_OTHER_ALPHA
+from instrumentation import Instrumentation, instrumented
+from substitution_key import SubstitutionKey
+from parallel_scoring import ParallelScorer
+from posterior import PosteriorSampler
+
+
+def _changes_state(method):
+    # Key/option changes first mark any background suggestion computation as stale (so it stops at its
+    # next check and releases the lock quickly), then run under the lock the computation holds
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.suggestion_generation += 1
+        with self.suggestion_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class DecryptionLogic:
     def __init__(self, ciphertext, standard_freq_sorted, standard_freq_dict,
                  standard_mono_log_probs, standard_digram_log_probs,
-                 common_trigrams_set, word_list_files):
+                 common_trigrams_set, word_list_files, scoring_engine='python', language_model=None,
+                 dictionary_file=None, text_statistics=None, word_sets=None, defer_suggestions=False):
         self.ciphertext = ciphertext
-        self.ciphertext_lower = ciphertext.lower()
+        # Opt-in per-method and per-scoring-component counters (set_instrumentation); off, they cost one flag test
+        self.instrumentation = Instrumentation()
+        # Streaming mode (stream_text.TextStatistics of a whole file of which ciphertext is only the first window):
+        # letter frequencies and the key fitness then describe the whole file
+        self.text_statistics = text_statistics
+        # Scoring reads the compact form only: letter codes, case bits and array('I') letter positions
+        self.compact_text = CompactText(ciphertext)
         self.standard_freq_sorted = standard_freq_sorted
         self.standard_freq_dict = standard_freq_dict
         self.standard_mono_log_probs = standard_mono_log_probs
@@ -26,16 +57,29 @@ class DecryptionLogic:
         self.apostrophe_s_common_letter_reward = 6.0
         self.common_apostrophe_s_letters = {'t', 's', 'd', 'l', 'm', 'v', 'r'}
         self.initial_e_mapping_priority_bonus = 100.0
+        self.digram_threshold = -7.0 # Digrams above this log-prob earn the context bonus
+        self.common_trigram_threshold = -6.0 # Trigrams above this log-prob count as common
+
+        # Full n-gram tables; without a trained model they are built from the small tables passed in
+        if language_model is None:
+            language_model = NgramModel.from_tables(standard_mono_log_probs, standard_digram_log_probs,
+                                                    common_trigrams_set, self.default_log_prob)
+        self.language_model = language_model
+        self.common_digram_flags = bytearray(lp > self.digram_threshold for lp in language_model.digrams)
+        self.common_trigram_flags = bytearray(lp > self.common_trigram_threshold for lp in language_model.trigrams)
 
-        self.word_sets = self._load_word_sets(word_list_files)
-        self.char_indices = {char: [i for i, c in enumerate(self.ciphertext_lower) if c == char]
-                             for char in string.ascii_lowercase}
-        self.ciphertext_analyzer = ci.stat(self.ciphertext)
+        # word_sets: lists already read with load_word_sets (e.g. once per batch worker); word_list_files is then not read
+        self.word_sets = word_sets if word_sets is not None else self.load_word_sets(word_list_files)
+        self.char_indices = dict(zip(string.ascii_lowercase, self.compact_text.positions)) # char -> array('I') of offsets
+        # Characters of the ciphertext that decrypt through the key (their lower case is a-z)
+        self.cipher_letter_chars = {ch for ch in set(self.ciphertext) if 'a' <= ch.lower() <= 'z'}
+        self.ciphertext_analyzer = ci.stat(self.ciphertext, self.compact_text) # Shares the encoded text, caches n-gram counts
         _cipher_freq_dict_percent = {char: freq for char, freq in self.ciphertext_analyzer.sorted_freq}
         self.ciphertext_freq_dict = {
             chr(ord('a') + i): _cipher_freq_dict_percent.get(chr(ord('a') + i), 0.0) / 100.0
             for i in range(26)
         }
+        if text_statistics is not None: self.ciphertext_freq_dict = text_statistics.letter_frequencies()
         self.ciphertext_freq_sorted_stable = sorted(
             self.ciphertext_freq_dict.items(), key=lambda item: item[1], reverse=True
         )
@@ -43,22 +87,191 @@ class DecryptionLogic:
         if self.ciphertext_freq_sorted_stable:
             self.most_frequent_cipher_char = self.ciphertext_freq_sorted_stable[0][0]
 
-        self.current_key = {c: c for c in string.ascii_lowercase} # Initial key: a->a, b->b, etc.
+        self.current_key = SubstitutionKey() # Initial key: a->a, b->b, etc.; immutable, replaced on every change
+        # Undo/redo steps: the changed mappings as (letter, old, new) records plus the cached scores and suggestions
+        # of the state on the other side of the step, so stepping back and forth needs no rescoring
         self.history = []
+        self.redo_history = []
         self.modified_from_identity = set()
         self.last_changed_chars = set()
         self.current_suggestions = []
-        self.ciphertext_tokens_with_type = []
-        raw_tokens = re.split('([a-zA-Z]+)', self.ciphertext_lower)
-        for rt in raw_tokens:
-            if rt:
-                self.ciphertext_tokens_with_type.append((rt, rt.isalpha()))
+        # Distinct a-z words of the ciphertext with their counts, and how many of those occurrences touch other letters
+        self.token_counts = self.ciphertext_analyzer.token_counts
+        self.attached_token_counts = self.ciphertext_analyzer.attached_token_counts
+        # letter_token_index[c]: (token, occurrences, standalone occurrences) for each distinct 1-4 letter token containing c
+        self.letter_token_index = self._build_letter_token_index()
+        # Per-candidate score cache: (cipher_char, target_plain_char) -> score without the initial 'e' bonus.
+        # score_dependencies[c] holds the cipher letters whose mapping can change any score of c.
+        self.score_cache = {}
+        self.score_dependencies = self._build_score_dependencies()
+        self.key_fitness = None # BigramFitness, counted on first use
+        # Word-pattern constraints (opt-in): suggestions are limited to mappings consistent with the dictionary
+        self.dictionary_file = dictionary_file
+        self.use_pattern_constraints = False
+        self.pattern_min_occurrences = 2 # Cipher words seen fewer times do not constrain
+        self.constraint_solver = None
+        self.consistent_candidates = None # {cipher_char: set of plain chars}, computed per key state
+        self.dictionary_words = None # Words of dictionary_file, read on first use
+        # Partial-word scoring (opt-in): words of 5+ letters are checked against a dictionary trie while
+        # some of their letters are still unmapped; impossible words are penalised, specific ones rewarded
+        self.use_partial_word_scoring = False
+        self.partial_word_min_length = 5
+        self.partial_word_min_known = 3 # Confirmed letters (plus the swapped one) needed before a word is checked
+        self.partial_word_max_tokens = 200 # Most frequent distinct long tokens checked per cipher letter
+        self.partial_word_dead_end_penalty = -4.0
+        self.partial_word_match_reward = 2.0
+        self.word_trie = None
+        self.long_token_index = None # c -> [(token, occurrences)] for distinct tokens of 5+ letters containing c
+        self.long_word_dependencies = None
+        self.partial_word_cache = {} # (cipher_char, target_plain_char) -> partial-word bonus
 
-        self.current_decrypted_text = self._perform_decryption()
-        self.decrypted_text_analyzer = ci.stat(self.current_decrypted_text)
+        # Deferred suggestions: when defer_suggestions is set (the GUI does), state changes only mark the
+        # suggestions as pending and compute_pending_suggestions() fills them in, e.g. from a worker thread.
+        # Passed to the constructor, the initial suggestions are not computed either (batch solving never reads them)
+        self.defer_suggestions = defer_suggestions
+        self.suggestions_pending = False
+        self.suggestion_generation = 0 # Bumped on every state change; a computation for an older one is stale
+        self.suggestion_lock = threading.RLock()
+
+        self.decrypted_buffer = None # Current plaintext as ASCII bytes, patched in place (None: not ASCII)
+        self._perform_full_decryption()
+        self.scoring_engine = 'python'
+        self.vector_scorer = None
+        # Parallel scoring (opt-in, set_parallel_scoring): a process pool scores the uncached candidates of
+        # texts of at least parallel_min_text_length characters; shorter texts are faster scored here
+        self.parallel_scorer = None
+        self.parallel_min_text_length = 200000
+        # Lookahead (opt-in): beam search over sequences of lookahead_depth swaps, within lookahead_time_budget
+        # seconds; lookahead_sequences belong to state lookahead_generation (stale once the state changes)
+        self.use_lookahead = False
+        self.lookahead_depth = 2
+        self.lookahead_beam_width = 5
+        self.lookahead_time_budget = 0.5
+        self.lookahead_sequences = []
+        self.lookahead_generation = None
+        # Mapping confidence (opt-in): posterior probability of every (cipher, plain) mapping sampled by MCMC
+        # within confidence_time_budget seconds; mapping_confidence belongs to state confidence_generation
+        self.use_mapping_confidence = False
+        self.confidence_chains = 8
+        self.confidence_time_budget = 1.0
+        self.confidence_temperature = 1.0
+        self.mapping_confidence = None
+        self.confidence_generation = None
+        self.set_scoring_engine(scoring_engine, recalculate=False)
         self.calculate_and_store_suggestions()
 
-    def _load_word_sets(self, file_paths):
+    @instrumented
+    @_changes_state
+    def set_scoring_engine(self, engine, recalculate=True):
+        """Selects the candidate scorer: 'python' (calculate_local_swap_score) or 'numpy' (batched VectorizedScorer)."""
+        if engine not in ('python', 'numpy'): raise ValueError(f"Unknown scoring engine: {engine}")
+        if engine == 'numpy' and not ve.numpy_available():
+            print("Warning: NumPy is not installed. Falling back to the Python scoring engine.")
+            engine = 'python'
+        if engine == 'numpy' and self.vector_scorer is None:
+            self.vector_scorer = ve.VectorizedScorer(self) # Encodes the ciphertext once
+        if engine == 'numpy' and self.parallel_scorer is not None: # The matrix fills every score, the pool would idle
+            self.parallel_scorer.close(); self.parallel_scorer = None
+        self.scoring_engine = engine
+        if recalculate: self.calculate_and_store_suggestions()
+        return engine
+
+    @instrumented
+    @_changes_state
+    def set_parallel_scoring(self, workers):
+        """
+        Scores the suggestions of long texts in a pool of `workers` processes (0: in this process); returns the count.
+        Only for the Python engine: the NumPy engine scores every pair in one matrix pass before a pool could help.
+        """
+        workers = max(0, int(workers or 0))
+        if workers and self.scoring_engine == 'numpy':
+            print("Warning: Parallel scoring only applies to the Python scoring engine. Scoring in this process.")
+            workers = 0
+        if self.parallel_scorer is not None and self.parallel_scorer.workers != workers:
+            self.parallel_scorer.close(); self.parallel_scorer = None
+        if workers and self.parallel_scorer is None:
+            self.parallel_scorer = ParallelScorer(self, workers)
+        return workers
+
+    def _build_letter_token_index(self):
+        index = {char: [] for char in string.ascii_lowercase}
+        for token_str, token_count in self.token_counts.items():
+            if len(token_str) > 4: continue
+            # A token stands alone when neither neighbouring separator consists of (non a-z) letters only
+            standalone_count = token_count - self.attached_token_counts.get(token_str, 0)
+            for char in set(token_str): index[char].append((token_str, token_count, standalone_count))
+        return index
+
+    def _build_score_dependencies(self):
+        # A score of c only reads the mappings of letters adjacent to c and of letters sharing a 2-4 letter token with c
+        dependencies = {char: set() for char in string.ascii_lowercase}
+        for pair_idx, count in enumerate(self.ciphertext_analyzer.bigram_counts):
+            if count:
+                left, right = string.ascii_lowercase[pair_idx // 26], string.ascii_lowercase[pair_idx % 26]
+                dependencies[left].add(right); dependencies[right].add(left)
+        for char, token_entries in self.letter_token_index.items():
+            for token_str, _, _ in token_entries: dependencies[char].update(token_str)
+        return dependencies
+
+    def _stale_letters(self, changed_chars):
+        # Cipher letters whose cached scores / partial-word bonuses depend on one of changed_chars
+        if not changed_chars: return set(), set()
+        score_stale = {c for c, deps in self.score_dependencies.items() if c in changed_chars or deps & changed_chars}
+        partial_stale = set()
+        if self.partial_word_cache:
+            partial_stale = {c for c, deps in self.long_word_dependencies.items() if c in changed_chars or deps & changed_chars}
+        return score_stale, partial_stale
+
+    def _invalidate_score_cache(self, changed_chars):
+        """Drops the cached scores of every cipher letter whose score depends on one of changed_chars."""
+        score_stale, partial_stale = self._stale_letters(changed_chars)
+        if score_stale: self.score_cache = {pair: score for pair, score in self.score_cache.items() if pair[0] not in score_stale}
+        if partial_stale:
+            self.partial_word_cache = {pair: bonus for pair, bonus in self.partial_word_cache.items() if pair[0] not in partial_stale}
+
+    def _history_entry(self, changes):
+        # Only the cache entries the step invalidates are kept: all others are valid on both sides of it
+        score_stale, partial_stale = self._stale_letters({c for c, _, _ in changes})
+        return {
+            'changes': changes, # ((cipher letter, plain before, plain after), ...)
+            'last_changed': ''.join(sorted(self.last_changed_chars)),
+            'score_cache': {pair: score for pair, score in self.score_cache.items() if pair[0] in score_stale},
+            'partial_word_cache': {pair: bonus for pair, bonus in self.partial_word_cache.items() if pair[0] in partial_stale},
+            'partial_word_scoring': self.use_partial_word_scoring,
+            'suggestions': None if self.suggestions_pending else tuple(self.current_suggestions),
+            'pattern_constraints': self.use_pattern_constraints
+        }
+
+    def _push_history(self, new_key, changed_chars):
+        # Called before the key changes; a new step makes the undone steps unreachable
+        changes = tuple((c, self.current_key.get(c, c), new_key.get(c, c)) for c in sorted(changed_chars))
+        self.history.append(self._history_entry(changes))
+        self.redo_history.clear()
+
+    def _step_history(self, from_history, to_history, backwards):
+        # Moves one step along the history; the entry for the way back is built from the state being left
+        entry = from_history.pop()
+        changes = entry['changes']
+        to_history.append(self._history_entry(changes))
+        changed_chars = {c for c, _, _ in changes}
+        old_key = self.current_key
+        self.current_key = old_key.with_changes({cipher_char: plain_before if backwards else plain_after
+                                                 for cipher_char, plain_before, plain_after in changes})
+        self.last_changed_chars = set(entry['last_changed'])
+        self._update_modified_set()
+        self._invalidate_score_cache(changed_chars)
+        self.score_cache.update(entry['score_cache']); self.partial_word_cache.update(entry['partial_word_cache'])
+        self.consistent_candidates = None
+        self._redecrypt_letters(changed_chars, old_key)
+        self.current_suggestions = list(entry['suggestions'] or ()) # Scores of that state are restored, not recomputed
+        self.suggestions_pending = False
+        if (entry['suggestions'] is None or entry['pattern_constraints'] != self.use_pattern_constraints or
+                entry['partial_word_scoring'] != self.use_partial_word_scoring):
+            self.calculate_and_store_suggestions()
+
+    @staticmethod
+    def load_word_sets(file_paths):
+        """{2: set, 3: set, 4: set} of the words in the 'two'/'three'/'four' word list files (None for an unreadable file)."""
         word_sets = {2: set(), 3: set(), 4: set()}
         expected_lengths = {'two': 2, 'three': 3, 'four': 4}
         for key, path in file_paths.items():
@@ -80,34 +293,55 @@ class DecryptionLogic:
         return plain_word, is_fully_decrypted_alpha
 
     def _perform_decryption(self):
-        decrypted_list = []
-        for char_original in self.ciphertext:
+        decryption_table = {}
+        for char_original in self.cipher_letter_chars:
             char_lower = char_original.lower()
-            if 'a' <= char_lower <= 'z':
-                plain_char_lower = self.current_key.get(char_lower, char_lower)
-                display_char = plain_char_lower.upper() if char_original.isupper() else plain_char_lower
-                decrypted_list.append(display_char)
-            else: decrypted_list.append(char_original)
-        return "".join(decrypted_list)
+            plain_char_lower = self.current_key.get(char_lower, char_lower)
+            decryption_table[ord(char_original)] = plain_char_lower.upper() if char_original.isupper() else plain_char_lower
+        return self.ciphertext.translate(decryption_table)
+
+    def _perform_full_decryption(self):
+        self.current_decrypted_text = self._perform_decryption()
+        is_ascii = self.current_decrypted_text.isascii() and len(self.current_decrypted_text) == len(self.ciphertext)
+        self.decrypted_buffer = bytearray(self.current_decrypted_text, 'ascii') if is_ascii else None
+        self.decrypted_text_analyzer = ci.stat(self.current_decrypted_text)
+
+    def _redecrypt_letters(self, changed_chars, old_key):
+        """Re-decrypts only the positions of changed_chars and updates the letter counts from the deltas."""
+        new_plains = [self.current_key.get(c, c) for c in changed_chars]
+        if self.decrypted_buffer is None or not all(len(p) == 1 and 'a' <= p <= 'z' for p in new_plains):
+            self._perform_full_decryption(); return # Only single a-z letters can be written into the byte buffer
+        buffer = self.decrypted_buffer; upper_mask = self.compact_text.upper_mask; count_deltas = Counter()
+        for cipher_char, new_plain in zip(changed_chars, new_plains):
+            positions = self.char_indices.get(cipher_char)
+            if not positions: continue
+            old_plain = old_key.get(cipher_char, cipher_char)
+            if old_plain == new_plain: continue
+            lower_code = ord(new_plain); upper_code = lower_code - 32
+            for i in positions: buffer[i] = upper_code if upper_mask[i >> 3] >> (i & 7) & 1 else lower_code
+            count_deltas[old_plain] -= len(positions); count_deltas[new_plain] += len(positions)
+        self.current_decrypted_text = buffer.decode('ascii')
+        self.decrypted_text_analyzer.update_counts(count_deltas, self.current_decrypted_text)
+
+    def _current_key_indices(self):
+        # Plain letter index of every cipher letter, -1 where the mapping is not an a-z letter
+        return self.current_key.plain_idx
 
     def _update_modified_set(self):
         self.modified_from_identity.clear()
-        for cipher_char, plain_char in self.current_key.items():
-            if plain_char != cipher_char: self.modified_from_identity.add(cipher_char)
+        self.modified_from_identity.update(self.current_key.modified_letters())
 
+    @instrumented
+    @_changes_state
     def apply_key_changes(self, proposed_key_map):
-        new_key = copy.deepcopy(self.current_key); changed_this_operation = set(); has_actual_change = False
+        key_changes = {}; changed_this_operation = set(); has_actual_change = False
         for cipher_char, plain_char_input in proposed_key_map.items():
             current_mapping = self.current_key.get(cipher_char, cipher_char); target_plain_char = current_mapping
             if plain_char_input and plain_char_input.isalpha(): target_plain_char = plain_char_input.lower()
             elif not plain_char_input: target_plain_char = cipher_char # Revert to identity if input is cleared
-            if target_plain_char != current_mapping: new_key[cipher_char] = target_plain_char; changed_this_operation.add(cipher_char); has_actual_change = True
-
-        plain_to_cipher_map = {}; conflicts_found = []
-        for c, p in new_key.items():
-            if p != c and 'a' <= p <= 'z': # Only check for conflicts on non-identity active mappings
-                if p in plain_to_cipher_map: conflicts_found.append(((plain_to_cipher_map[p], p), (c, p)))
-                else: plain_to_cipher_map[p] = c
+            if target_plain_char != current_mapping: key_changes[cipher_char] = target_plain_char; changed_this_operation.add(cipher_char); has_actual_change = True
+        new_key = self.current_key.with_changes(key_changes)
+        conflicts_found = new_key.conflicts() # Only non-identity active mappings conflict; read from the inverse index
 
         if not has_actual_change and not conflicts_found: # if no change and no new conflict introduced by reverting
             # Check if the proposed map *resolved* a conflict that existed due to identity mappings
@@ -123,36 +357,38 @@ class DecryptionLogic:
                  return False, conflicts_found # No change to key, return existing/new conflicts
 
         # If there was an actual change or new conflicts are found with the new_key
-        self.history.append({'key': copy.deepcopy(self.current_key),'modified': copy.deepcopy(self.modified_from_identity),'last_changed': copy.deepcopy(self.last_changed_chars)})
+        self._push_history(new_key, changed_this_operation)
+        old_key = self.current_key
         self.current_key = new_key
         self.last_changed_chars = changed_this_operation
         self._update_modified_set()
-        self.current_decrypted_text = self._perform_decryption()
-        self.decrypted_text_analyzer = ci.stat(self.current_decrypted_text)
+        self._invalidate_score_cache(changed_this_operation)
+        self.consistent_candidates = None
+        self._redecrypt_letters(changed_this_operation, old_key)
         self.calculate_and_store_suggestions()
         return True, conflicts_found
 
+    @instrumented
+    @_changes_state
     def load_key_from_file(self, loaded_key_map):
         """Loads a key from a file, updates state, and recalculates."""
         # Ensure all chars a-z are in the loaded map, defaulting to identity if somehow missing
         # (GUI validation should prevent this, but good for robustness)
-        new_key = {c: c for c in string.ascii_lowercase}
+        key_map = {}
         changed_from_current = set()
 
         for cipher_char in string.ascii_lowercase:
             # loaded_key_map values should already be lowercase from GUI
             plain_char = loaded_key_map.get(cipher_char, cipher_char) # Default to identity
-            new_key[cipher_char] = plain_char
+            key_map[cipher_char] = plain_char
             if self.current_key.get(cipher_char) != plain_char:
                 changed_from_current.add(cipher_char)
+        new_key = SubstitutionKey(key_map)
 
         # Save current state to history before overwriting
-        self.history.append({
-            'key': copy.deepcopy(self.current_key),
-            'modified': copy.deepcopy(self.modified_from_identity),
-            'last_changed': copy.deepcopy(self.last_changed_chars)
-        })
+        self._push_history(new_key, changed_from_current)
 
+        old_key = self.current_key
         self.current_key = new_key
         # For a loaded key, consider all non-identity mappings as "changed" for highlighting
         # Or, more accurately, what changed *from the previous state*
@@ -162,130 +398,115 @@ class DecryptionLogic:
         self.last_changed_chars = changed_from_current # Or simply all keys in new_key if we treat load as a full reset
 
         self._update_modified_set() # This will set based on current_key vs identity
-        self.current_decrypted_text = self._perform_decryption()
-        self.decrypted_text_analyzer = ci.stat(self.current_decrypted_text)
+        self._invalidate_score_cache(changed_from_current)
+        self.consistent_candidates = None
+        self._redecrypt_letters(changed_from_current, old_key)
         self.calculate_and_store_suggestions()
         # No conflicts to return here as we assume the loaded key is what the user wants.
         # GUI performs some validation. Further conflict display will happen naturally.
 
+    @instrumented
+    @_changes_state
     def undo_last_change(self):
         if not self.history: return False
-        prev_state = self.history.pop()
-        self.current_key = prev_state['key']
-        self.modified_from_identity = prev_state['modified']
-        self.last_changed_chars = prev_state['last_changed']
-        self.current_decrypted_text = self._perform_decryption()
-        self.decrypted_text_analyzer = ci.stat(self.current_decrypted_text)
-        self.calculate_and_store_suggestions()
+        self._step_history(self.history, self.redo_history, backwards=True)
+        return True
+
+    @instrumented
+    @_changes_state
+    def redo_last_change(self):
+        if not self.redo_history: return False
+        self._step_history(self.redo_history, self.history, backwards=False)
         return True
 
+    @instrumented
     def calculate_local_swap_score(self, cipher_char_to_swap, target_plain_char, apply_initial_e_bonus=False):
         occurrences = self.char_indices.get(cipher_char_to_swap, [])
         if not occurrences:
             return -float('inf')
+        timer = time.perf_counter if self.instrumentation.enabled else None
+        if timer: started = timer()
 
-        cipher_weight = 4.0; delta_weight = 2.0; digram_bonus = 0.5; trigram_bonus = 0.8; digram_threshold = -7.0
+        cipher_weight = 4.0; delta_weight = 2.0; digram_bonus = 0.5; trigram_bonus = 0.8
         cipher_freq = self.ciphertext_freq_dict.get(cipher_char_to_swap, 0.0)
         target_freq = self.standard_freq_dict.get(target_plain_char, 0.0)
         delta_freq = max(0.01, abs(cipher_freq - target_freq))
         log_cipher_freq = math.log(cipher_freq) if cipher_freq > 0 else self.default_log_prob
         base_score = cipher_weight * log_cipher_freq - delta_weight * math.log(delta_freq)
+        if timer: now = timer(); self.instrumentation.record('score.base', now - started, 1); started = now
 
         context_bonus_dt = 0.0
-        text_len = len(self.ciphertext_lower)
+        codes = self.compact_text.codes
+        text_len = len(codes)
+        # Digram/trigram checks are integer lookups into the language model flags (-1: not an a-z letter)
+        target_idx = ord(target_plain_char) - 97 if len(target_plain_char) == 1 and 'a' <= target_plain_char <= 'z' else -1
+        key_idx = self._current_key_indices()
+        # Plain letter index of each confirmed cipher letter code, -1 for unconfirmed letters and non-letters
+        confirmed_idx = [key_idx[code] if code < 26 and chr(97 + code) in self.modified_from_identity else -1 for code in range(256)]
+        common_digrams = self.common_digram_flags; common_trigrams = self.common_trigram_flags
         for i in occurrences:
-             prev_plain = None; prev_is_confirmed = False
+             if target_idx < 0: break
+             prev_idx = -1
              if i > 0:
-                 prev_cipher = self.ciphertext_lower[i-1]
-                 if 'a' <= prev_cipher <= 'z' and prev_cipher in self.modified_from_identity:
-                     prev_plain = self.current_key.get(prev_cipher); prev_is_confirmed = True
-                     if prev_plain:
-                         digram_prev = prev_plain + target_plain_char
-                         if self.standard_digram_log_probs.get(digram_prev, self.default_log_prob) > digram_threshold: context_bonus_dt += digram_bonus
-             next_plain = None; next_is_confirmed = False
+                 prev_idx = confirmed_idx[codes[i-1]]
+                 if prev_idx >= 0 and common_digrams[prev_idx * 26 + target_idx]: context_bonus_dt += digram_bonus
+             next_idx = -1
              if i < text_len - 1:
-                 next_cipher = self.ciphertext_lower[i+1]
-                 if 'a' <= next_cipher <= 'z' and next_cipher in self.modified_from_identity:
-                     next_plain = self.current_key.get(next_cipher); next_is_confirmed = True
-                     if next_plain:
-                         digram_next = target_plain_char + next_plain
-                         if self.standard_digram_log_probs.get(digram_next, self.default_log_prob) > digram_threshold: context_bonus_dt += digram_bonus
-             if prev_is_confirmed and next_is_confirmed and prev_plain and next_plain:
-                 trigram = prev_plain + target_plain_char + next_plain
-                 if trigram in self.common_trigrams_set: context_bonus_dt += trigram_bonus
+                 next_idx = confirmed_idx[codes[i+1]]
+                 if next_idx >= 0 and common_digrams[target_idx * 26 + next_idx]: context_bonus_dt += digram_bonus
+             if prev_idx >= 0 and next_idx >= 0:
+                 if common_trigrams[(prev_idx * 26 + target_idx) * 26 + next_idx]: context_bonus_dt += trigram_bonus
+        if timer: now = timer(); self.instrumentation.record('score.context', now - started, len(occurrences)); started = now
 
         word_penalty = 0.0; unique_valid_words_for_reward = set()
         single_letter_bonus = 0.0; apostrophe_s_bonus = 0.0
-        temp_key = self.current_key.copy(); temp_key[cipher_char_to_swap] = target_plain_char
-        processed_token_indices_for_penalty = set(); processed_token_indices_for_reward_check = set()
-        processed_indices_for_single_letter = set(); processed_indices_for_apostrophe = set()
+        temp_key = self.current_key.to_dict(); temp_key[cipher_char_to_swap] = target_plain_char
+        processed_indices_for_apostrophe = set()
 
-        for token_idx, (token_str, is_alpha_token) in enumerate(self.ciphertext_tokens_with_type):
-            if not is_alpha_token: continue
+        # Only the distinct short tokens containing the swapped letter matter; repeats are weighted by their counts
+        for token_str, token_count, standalone_count in self.letter_token_index.get(cipher_char_to_swap, ()):
             token_len = len(token_str)
-            if token_len in [1, 2, 3, 4] and cipher_char_to_swap in token_str:
-                potential_plain_word, is_fully_decrypted_alpha = self._perform_decryption_on_word(token_str, temp_key)
-                if is_fully_decrypted_alpha:
-                    is_independent_word = True # This logic might need refinement for edge cases
-                    # A simple check for independence: not adjacent to another alpha token
-                    if token_idx > 0 and self.ciphertext_tokens_with_type[token_idx - 1][1]: is_independent_word = False
-                    if token_idx < len(self.ciphertext_tokens_with_type) - 1 and self.ciphertext_tokens_with_type[token_idx + 1][1]: is_independent_word = False
-                    # The above independence check is very strict. Might need adjustment.
-                    # For now, we assume if a token is alpha, and contains the char, it's relevant.
-
-                    if token_len == 1 and token_str == cipher_char_to_swap: # current token IS the char being swapped
-                        if token_idx not in processed_indices_for_single_letter:
-                            # Check if it's a standalone word (e.g., surrounded by spaces or punctuation)
-                            is_standalone_single = True
-                            if token_idx > 0 and self.ciphertext_tokens_with_type[token_idx-1][0].isalpha(): is_standalone_single = False
-                            if token_idx < len(self.ciphertext_tokens_with_type) -1 and self.ciphertext_tokens_with_type[token_idx+1][0].isalpha(): is_standalone_single = False
-
-                            if is_standalone_single:
-                                if target_plain_char == 'a' or target_plain_char == 'i':
-                                    single_letter_bonus += self.single_letter_ia_reward
-                                else: single_letter_bonus += self.single_letter_other_penalty
-                                processed_indices_for_single_letter.add(token_idx)
-
-                    elif token_len in [2,3,4]:
-                        word_list_for_len = self.word_sets.get(token_len)
-                        if word_list_for_len is None: continue
-                        if token_idx not in processed_token_indices_for_penalty:
-                            if potential_plain_word not in word_list_for_len:
-                                all_other_confirmed = True
-                                for cit in token_str:
-                                    if cit == cipher_char_to_swap: continue
-                                    if cit not in self.modified_from_identity: all_other_confirmed = False; break
-                                if all_other_confirmed:
-                                    word_penalty += self.invalid_word_penalty
-                                    processed_token_indices_for_penalty.add(token_idx)
-                        if potential_plain_word in word_list_for_len:
-                            if token_idx not in processed_token_indices_for_reward_check:
-                               all_meaningfully_mapped = True
-                               for cit in token_str:
-                                   if not (cit == cipher_char_to_swap or cit in self.modified_from_identity):
-                                       all_meaningfully_mapped = False; break
-                               if all_meaningfully_mapped:
-                                   unique_valid_words_for_reward.add(potential_plain_word)
-                                   processed_token_indices_for_reward_check.add(token_idx)
-
-        for i in occurrences: # Apostrophe check based on original ciphertext_lower structure
+            potential_plain_word, is_fully_decrypted_alpha = self._perform_decryption_on_word(token_str, temp_key)
+            if not is_fully_decrypted_alpha: continue
+            if token_len == 1: # The token IS the char being swapped
+                if standalone_count: # Standalone single-letter words (surrounded by spaces or punctuation)
+                    if target_plain_char == 'a' or target_plain_char == 'i':
+                        single_letter_bonus += standalone_count * self.single_letter_ia_reward
+                    else: single_letter_bonus += standalone_count * self.single_letter_other_penalty
+                continue
+            word_list_for_len = self.word_sets.get(token_len)
+            if word_list_for_len is None: continue
+            all_other_confirmed = True
+            for cit in token_str:
+                if cit == cipher_char_to_swap: continue
+                if cit not in self.modified_from_identity: all_other_confirmed = False; break
+            if not all_other_confirmed: continue
+            if potential_plain_word in word_list_for_len:
+                unique_valid_words_for_reward.add(potential_plain_word)
+            else:
+                word_penalty += token_count * self.invalid_word_penalty
+        if timer:
+            now = timer(); self.instrumentation.record('score.tokens', now - started, len(self.letter_token_index.get(cipher_char_to_swap, ())))
+            started = now
+
+        for i in occurrences: # Apostrophe check based on the encoded ciphertext structure
             # Look for patterns like <non-alpha>'<cipher_char_to_swap><non-alpha>
             # or <start>'<cipher_char_to_swap><non-alpha>
             # or <non-alpha>'<cipher_char_to_swap><end>
             # A common case is "X's" -> "X'S" where X is a single letter.
             # We are interested if target_plain_char makes sense after an apostrophe.
             # Example: cipher "g" becomes plain "s". If ciphertext has "...N'G...", becomes "...n's..."
-            if i > 0 and self.ciphertext_lower[i-1] == "'": # char is preceded by apostrophe
+            if i > 0 and codes[i-1] == CODE_APOSTROPHE: # char is preceded by apostrophe
                 # And not followed by another letter (e.g. "it's" not "it's'a")
                 is_end_of_contraction = True
-                if i < len(self.ciphertext_lower) -1 and self.ciphertext_lower[i+1].isalpha():
+                if i < text_len - 1 and (codes[i+1] < 26 or codes[i+1] == CODE_OTHER_ALPHA):
                     is_end_of_contraction = False
 
                 if is_end_of_contraction and i not in processed_indices_for_apostrophe:
                     if target_plain_char in self.common_apostrophe_s_letters: # 's', 't', 'd', 'l', 'm', 'v', 'r'
                         apostrophe_s_bonus += self.apostrophe_s_common_letter_reward
                     processed_indices_for_apostrophe.add(i)
-
+        if timer: self.instrumentation.record('score.apostrophe', timer() - started, len(occurrences))
 
         word_reward = 0.0
         if len(unique_valid_words_for_reward) >= 2: # Require multiple unique words for stronger signal
@@ -299,8 +520,14 @@ class DecryptionLogic:
 
         return final_score
 
-    def suggest_best_swaps(self, num_suggestions=5):
-        all_suggestions = []
+    @instrumented
+    def suggest_best_swaps(self, num_suggestions=5, use_pattern_constraints=None, is_cancelled=None):
+        """Top suggestions as (cipher_char, plain_char, score); returns None if is_cancelled() turns true midway."""
+        if use_pattern_constraints is None: use_pattern_constraints = self.use_pattern_constraints
+        if num_suggestions <= 0: return []
+        consistent = self.get_consistent_candidates(is_cancelled) if use_pattern_constraints else {}
+        if consistent is None: return None
+        candidates = [] # (cipher_char, target_plain_char, gets the initial 'e' bonus), in evaluation order
         alphabet = string.ascii_lowercase
 
         initial_phase_for_e = False
@@ -308,49 +535,411 @@ class DecryptionLogic:
             initial_phase_for_e = True
         elif self.most_frequent_cipher_char and \
              self.current_key.get(self.most_frequent_cipher_char) != 'e' and \
-             not any(p == 'e' and c in self.modified_from_identity for c, p in self.current_key.items() if c != self.most_frequent_cipher_char):
+             self.current_key.mapped_by_other('e', self.most_frequent_cipher_char) is None:
             initial_phase_for_e = True
 
+        matrix_pending = self.scoring_engine == 'numpy'
+
         for cipher_char_to_swap in alphabet:
             if cipher_char_to_swap in self.modified_from_identity:
                 continue
+            if is_cancelled is not None and is_cancelled(): return None
             for target_plain_char in alphabet:
                 if target_plain_char == cipher_char_to_swap:
                     continue
-                is_used_by_confirmed_other = False
-                for c_other, p_other in self.current_key.items():
-                    if p_other == target_plain_char and c_other != cipher_char_to_swap and c_other in self.modified_from_identity:
-                        is_used_by_confirmed_other = True; break
-                if is_used_by_confirmed_other: continue
-
-                is_used_by_tentative_other_non_identity = False # Check if target_plain is already mapped from another C (not yet confirmed)
-                for c_other, p_other in self.current_key.items():
-                    # if p_other is the target, AND c_other is not the one we are trying to swap, AND that mapping is NOT an identity mapping
-                    if p_other == target_plain_char and c_other != cipher_char_to_swap and p_other != c_other : # and c_other not in self.modified_from_identity (implicit by outer loop):
-                         is_used_by_tentative_other_non_identity = True; break
-                if is_used_by_tentative_other_non_identity: continue
+                # Skip targets another cipher letter already maps to (a non-identity mapping, i.e. a modified letter)
+                if self.current_key.mapped_by_other(target_plain_char, cipher_char_to_swap) is not None: continue
+
+                if cipher_char_to_swap in consistent and target_plain_char not in consistent[cipher_char_to_swap]:
+                    continue # Ruled out by the word-pattern constraints
 
                 apply_e_bonus_for_this_suggestion = False
                 if initial_phase_for_e and \
                    cipher_char_to_swap == self.most_frequent_cipher_char and \
                    target_plain_char == 'e':
                     apply_e_bonus_for_this_suggestion = True
+                candidates.append((cipher_char_to_swap, target_plain_char, apply_e_bonus_for_this_suggestion))
+
+        if matrix_pending and any((c, t) not in self.score_cache for c, t, _ in candidates):
+            self._fill_score_cache_from_matrix() # The batched engine scores every pair at once
+
+        if self.parallel_scorer is not None and len(self.compact_text) >= self.parallel_min_text_length:
+            top = self.parallel_scorer.top_candidates(self, candidates, num_suggestions, is_cancelled)
+        else: top = self._top_candidates(candidates, num_suggestions, is_cancelled)
+        if top is None: return None
+
+        if not top and consistent: # Constraints ruled out everything: fall back to unconstrained suggestions
+            return self.suggest_best_swaps(num_suggestions, use_pattern_constraints=False, is_cancelled=is_cancelled)
+        return [(candidates[-neg_idx][0], candidates[-neg_idx][1], score) for score, neg_idx in sorted(top, reverse=True)]
+
+    def _top_candidates(self, candidates, num_suggestions, is_cancelled=None, indices=None):
+        """
+        Min-heap of the num_suggestions best (score, -index) of the (cipher_char, target_plain_char, e bonus)
+        candidates, or None if is_cancelled() turns true. indices are the candidates' positions in the caller's
+        list (default: their positions here); ties rank by them, like a stable sort.
+        """
+        # Branch and bound: candidates are fully scored in order of an optimistic bound (exact for cached scores);
+        # once a bound falls below the k-th best score so far, no later candidate can enter the top k.
+        bounds = self._candidate_score_bounds(candidates)
+        order = sorted(range(len(candidates)), key=lambda pos: bounds[pos], reverse=True)
+        top = []
+        for rank, pos in enumerate(order):
+            bound = bounds[pos]
+            if bound == -float('inf'): break
+            # The margin covers rounding: the bound sums the same terms in another order than the full score
+            if len(top) >= num_suggestions and bound + 1e-7 * (1.0 + abs(bound)) < top[0][0]: break
+            if is_cancelled is not None and rank % 26 == 0 and is_cancelled(): return None
+            cipher_char_to_swap, target_plain_char, apply_e_bonus_for_this_suggestion = candidates[pos]
+            score = self.score_cache.get((cipher_char_to_swap, target_plain_char))
+            if score is None:
+                score = self.calculate_local_swap_score(cipher_char_to_swap, target_plain_char)
+                self.score_cache[(cipher_char_to_swap, target_plain_char)] = score
+            if self.use_partial_word_scoring and score > -float('inf'):
+                score += self._cached_partial_word_bonus(cipher_char_to_swap, target_plain_char)
+            if apply_e_bonus_for_this_suggestion: score += self.initial_e_mapping_priority_bonus
+            if score == -float('inf') or num_suggestions <= 0: continue
+            idx = pos if indices is None else indices[pos]
+            if len(top) < num_suggestions: heapq.heappush(top, (score, -idx))
+            elif (score, -idx) > top[0]: heapq.heapreplace(top, (score, -idx))
+        return top
+
+    def _candidate_score_bounds(self, candidates):
+        """
+        Upper bound of the suggestion score of every (cipher_char, target_plain_char, e bonus) candidate.
+        Cached scores are used as they are. Otherwise the frequency term is computed, and the context,
+        single-letter and apostrophe terms are rebuilt from the cached n-gram counts. Those terms equal what
+        calculate_local_swap_score adds up position by position. Word penalties count as 0, the word reward
+        as if every eligible token were a dictionary word, and partial-word bonuses as if every word matched.
+        """
+        key_idx = self._current_key_indices()
+        confirmed = [ord(c) - 97 for c in self.modified_from_identity if key_idx[ord(c) - 97] >= 0]
+        common_digrams = self.common_digram_flags; common_trigrams = self.common_trigram_flags
+        letter_terms = {}
+        bounds = []
+        for cipher_char, target_plain_char, apply_e_bonus in candidates:
+            score = self.score_cache.get((cipher_char, target_plain_char))
+            bonus = self.partial_word_cache.get((cipher_char, target_plain_char)) if self.use_partial_word_scoring else 0.0
+            terms = letter_terms.get(cipher_char)
+            if terms is None and (score is None or bonus is None): # Only needed for what is not cached yet
+                terms = letter_terms[cipher_char] = self._letter_bound_terms(cipher_char, key_idx, confirmed)
+            if score is None:
+                if not terms['occurrences']: bounds.append(-float('inf')); continue
+                target_freq = self.standard_freq_dict.get(target_plain_char, 0.0)
+                delta_freq = max(0.01, abs(terms['cipher_freq'] - target_freq))
+                score = terms['log_cipher_term'] - 2.0 * math.log(delta_freq)
+                t = ord(target_plain_char) - 97 if len(target_plain_char) == 1 and 'a' <= target_plain_char <= 'z' else -1
+                if t >= 0:
+                    score += 0.5 * sum(count for p, count in terms['before'] if common_digrams[p * 26 + t])
+                    score += 0.5 * sum(count for n, count in terms['after'] if common_digrams[t * 26 + n])
+                    score += 0.8 * sum(count for p, n, count in terms['around'] if common_trigrams[(p * 26 + t) * 26 + n])
+                    if terms['standalone']:
+                        score += terms['standalone'] * (self.single_letter_ia_reward if target_plain_char in ('a', 'i')
+                                                        else self.single_letter_other_penalty)
+                if target_plain_char in self.common_apostrophe_s_letters:
+                    score += terms['apostrophes'] * self.apostrophe_s_common_letter_reward
+                score += terms['word_reward']
+            if score == -float('inf'): bounds.append(score); continue
+            score += terms['partial_word_bonus'] if bonus is None else bonus
+            if apply_e_bonus: score += self.initial_e_mapping_priority_bonus
+            bounds.append(score)
+        return bounds
+
+    def _letter_bound_terms(self, cipher_char, key_idx, confirmed):
+        # Target-independent parts of the bounds of one cipher letter's candidates
+        c = ord(cipher_char) - 97
+        analyzer = self.ciphertext_analyzer
+        bigrams = analyzer.bigram_counts
+        cipher_freq = self.ciphertext_freq_dict.get(cipher_char, 0.0)
+        terms = {'occurrences': len(self.char_indices.get(cipher_char, ())), 'cipher_freq': cipher_freq,
+                 'log_cipher_term': 4.0 * (math.log(cipher_freq) if cipher_freq > 0 else self.default_log_prob),
+                 'apostrophes': analyzer.apostrophe_counts[c]}
+        # Confirmed neighbours (as their plain letter index) with the number of times they touch cipher_char
+        before = [(p, bigrams[p * 26 + c]) for p in confirmed if bigrams[p * 26 + c]]
+        after = [(n, bigrams[c * 26 + n]) for n in confirmed if bigrams[c * 26 + n]]
+        trigrams = analyzer.trigram_counts if before and after else None
+        terms['before'] = [(key_idx[p], count) for p, count in before]
+        terms['after'] = [(key_idx[n], count) for n, count in after]
+        terms['around'] = [(key_idx[p], key_idx[n], trigrams[(p * 26 + c) * 26 + n]) for p, _ in before for n, _ in after
+                           if trigrams[(p * 26 + c) * 26 + n]] if trigrams else []
+        standalone = 0; eligible_words = 0
+        for token_str, _, standalone_count in self.letter_token_index.get(cipher_char, ()):
+            if len(token_str) == 1: standalone = standalone_count; continue
+            if self.word_sets.get(len(token_str)) is None: continue
+            if all(ch == cipher_char or ch in self.modified_from_identity for ch in token_str): eligible_words += 1
+        terms['standalone'] = standalone
+        terms['word_reward'] = eligible_words * self.valid_word_reward_base if eligible_words >= 2 else 0.0
+        partial_word_bonus = 0.0
+        if self.use_partial_word_scoring and self.word_trie is not None:
+            for token_str, token_count in self.long_token_index.get(cipher_char, ()):
+                known = sum(1 for ch in token_str if ch == cipher_char or (ch in self.modified_from_identity and key_idx[ord(ch) - 97] >= 0))
+                if known >= self.partial_word_min_known: partial_word_bonus += self.partial_word_match_reward * token_count
+        terms['partial_word_bonus'] = partial_word_bonus
+        return terms
+
+    @instrumented
+    def _fill_score_cache_from_matrix(self):
+        # The batched engine scores every pair at once, so the whole cache is refreshed in one pass
+        score_matrix = self.vector_scorer.score_matrix(self.current_key, self.modified_from_identity)
+        if score_matrix is None: return None
+        for ci_idx, cipher_char in enumerate(string.ascii_lowercase):
+            row = score_matrix[ci_idx].tolist()
+            for t_idx, target_plain_char in enumerate(string.ascii_lowercase):
+                if t_idx != ci_idx: self.score_cache[(cipher_char, target_plain_char)] = row[t_idx]
+        return score_matrix
+
+    def _get_dictionary_words(self):
+        if self.dictionary_words is None:
+            self.dictionary_words = []
+            if self.dictionary_file:
+                try: self.dictionary_words = PatternIndex.read_word_file(self.dictionary_file)
+                except Exception as e: print(f"Warning: Could not read dictionary {self.dictionary_file}: {e}. Using the word lists only.")
+        return self.dictionary_words
+
+    def _build_constraint_solver(self):
+        pattern_index = PatternIndex.from_word_sets(self.word_sets, self._get_dictionary_words())
+        return ConstraintSolver(self.token_counts, pattern_index, min_occurrences=self.pattern_min_occurrences)
+
+    @instrumented
+    def get_consistent_candidates(self, is_cancelled=None):
+        """
+        Plain letters each cipher letter can still take given the confirmed mappings and the dictionary patterns,
+        or None if is_cancelled() turns true during the propagation (nothing is stored then).
+        """
+        if self.consistent_candidates is None:
+            if self.constraint_solver is None: self.constraint_solver = self._build_constraint_solver()
+            fixed = {c: self.current_key[c] for c in self.modified_from_identity}
+            self.consistent_candidates = self.constraint_solver.propagate(fixed, is_cancelled)
+        return self.consistent_candidates
+
+    @instrumented
+    @_changes_state
+    def set_pattern_constraints(self, enabled):
+        self.use_pattern_constraints = bool(enabled)
+        self.calculate_and_store_suggestions()
+
+    @instrumented
+    @_changes_state
+    def set_partial_word_scoring(self, enabled):
+        """Turns the dictionary-trie check of partially decrypted long words on or off."""
+        self.use_partial_word_scoring = bool(enabled)
+        if self.use_partial_word_scoring and self.word_trie is None:
+            self.word_trie = WordTrie(self._get_dictionary_words())
+            for words in self.word_sets.values():
+                if words: self.word_trie.add_words(words)
+            self._build_long_token_index()
+        self.partial_word_cache = {}
+        self.calculate_and_store_suggestions()
 
-                score = self.calculate_local_swap_score(cipher_char_to_swap, target_plain_char,
-                                                        apply_initial_e_bonus=apply_e_bonus_for_this_suggestion)
-                if score > -float('inf'):
-                    all_suggestions.append((cipher_char_to_swap, target_plain_char, score))
+    def _build_long_token_index(self):
+        token_counts = Counter({token_str: count for token_str, count in self.token_counts.items()
+                                if len(token_str) >= self.partial_word_min_length})
+        self.long_token_index = {char: [] for char in string.ascii_lowercase}
+        self.long_word_dependencies = {char: set() for char in string.ascii_lowercase}
+        for token_str, count in token_counts.most_common():
+            for char in set(token_str):
+                if len(self.long_token_index[char]) < self.partial_word_max_tokens:
+                    self.long_token_index[char].append((token_str, count))
+                    self.long_word_dependencies[char].update(token_str)
 
-        all_suggestions.sort(key=lambda item: item[2], reverse=True)
-        return all_suggestions[:num_suggestions]
+    def _cached_partial_word_bonus(self, cipher_char_to_swap, target_plain_char):
+        bonus = self.partial_word_cache.get((cipher_char_to_swap, target_plain_char))
+        if bonus is None:
+            bonus = self.calculate_partial_word_bonus(cipher_char_to_swap, target_plain_char)
+            self.partial_word_cache[(cipher_char_to_swap, target_plain_char)] = bonus
+        return bonus
 
+    @instrumented
+    def calculate_partial_word_bonus(self, cipher_char_to_swap, target_plain_char):
+        """Trie-based score of the long words containing cipher_char_to_swap if it were mapped to target_plain_char."""
+        if self.word_trie is None or not ('a' <= target_plain_char <= 'z'): return 0.0
+        target_idx = ord(target_plain_char) - 97
+        key_idx = self._current_key_indices()
+        used_mask = 1 << target_idx # Plain letters taken by confirmed mappings cannot fill the unknown positions
+        for c in self.modified_from_identity:
+            if key_idx[ord(c) - 97] >= 0: used_mask |= 1 << key_idx[ord(c) - 97]
+        available_mask = FULL_MASK & ~used_mask
+
+        bonus = 0.0
+        for token_str, token_count in self.long_token_index.get(cipher_char_to_swap, ()):
+            template = []; unknown_ids = {}; known = 0
+            for ch in token_str:
+                if ch == cipher_char_to_swap: template.append(target_idx); known += 1
+                elif ch in self.modified_from_identity and key_idx[ord(ch) - 97] >= 0:
+                    template.append(key_idx[ord(ch) - 97]); known += 1
+                else: template.append(unknown_ids.setdefault(ch, -(len(unknown_ids) + 1)))
+            if known < self.partial_word_min_known: continue
+            matches = self.word_trie.count_matches(tuple(template), available_mask)
+            if matches == 0: bonus += self.partial_word_dead_end_penalty * token_count
+            else: bonus += self.partial_word_match_reward * token_count / matches
+        return bonus
+
+    @instrumented
     def calculate_and_store_suggestions(self):
-        if len(self.ciphertext) < 10: self.current_suggestions = []; return # Avoid calc for too short texts
+        if len(self.ciphertext) < 10: self.current_suggestions = []; self.suggestions_pending = False; return # Avoid calc for too short texts
+        if self.defer_suggestions:
+            self.current_suggestions = []; self.suggestions_pending = True; return
         self.current_suggestions = self.suggest_best_swaps(5)
+        self.suggestions_pending = False
+        if self.use_lookahead:
+            self.lookahead_sequences = self.suggest_swap_sequences(); self.lookahead_generation = self.suggestion_generation
+        if self.use_mapping_confidence:
+            self.mapping_confidence = self.estimate_mapping_confidence(); self.confidence_generation = self.suggestion_generation
+
+    @instrumented
+    def compute_pending_suggestions(self, generation):
+        """
+        Computes the pending suggestions for state `generation` (the suggestion_generation read when they were
+        requested). Safe to call from a worker thread. Returns the suggestions, or None if the state changed
+        before they were done (a newer request then takes over).
+        Every step under suggestion_lock checks is_stale often, pattern propagation included, so a state change
+        (which waits for the lock) waits milliseconds; new work here must check it too.
+        """
+        is_stale = lambda: generation != self.suggestion_generation
+        with self.suggestion_lock:
+            if is_stale(): return None
+            if self.suggestions_pending:
+                suggestions = self.suggest_best_swaps(5, is_cancelled=is_stale)
+                if suggestions is None or is_stale(): return None
+                self.current_suggestions = suggestions; self.suggestions_pending = False
+            if self.has_pending_lookahead(): # The single moves are already visible while this runs
+                sequences = self.suggest_swap_sequences(is_cancelled=is_stale)
+                if sequences is not None and not is_stale():
+                    self.lookahead_sequences = sequences; self.lookahead_generation = generation
+            if self.has_pending_confidence():
+                confidence = self.estimate_mapping_confidence(is_cancelled=is_stale)
+                if confidence is not None and not is_stale():
+                    self.mapping_confidence = confidence; self.confidence_generation = generation
+            return list(self.current_suggestions)
+
+    def has_pending_suggestions(self): return self.suggestions_pending
+    def has_pending_lookahead(self):
+        return self.use_lookahead and len(self.ciphertext) >= 10 and self.lookahead_generation != self.suggestion_generation
+    def has_pending_confidence(self):
+        return self.use_mapping_confidence and len(self.ciphertext) >= 10 and self.confidence_generation != self.suggestion_generation
+
+    @instrumented
+    @_changes_state
+    def set_lookahead(self, enabled, depth=None, beam_width=None, time_budget=None):
+        """Turns the multi-step lookahead on or off; depth, beam_width and time_budget (seconds) replace the defaults if given."""
+        self.use_lookahead = bool(enabled)
+        if depth is not None: self.lookahead_depth = max(1, int(depth))
+        if beam_width is not None: self.lookahead_beam_width = max(1, int(beam_width))
+        if time_budget is not None: self.lookahead_time_budget = max(0.0, float(time_budget))
+        if self.use_lookahead and not self.defer_suggestions and not self.suggestions_pending:
+            self.calculate_and_store_suggestions()
+
+    @instrumented
+    @_changes_state
+    def set_mapping_confidence(self, enabled, time_budget=None, chains=None, temperature=None):
+        """Turns the MCMC mapping confidence on or off; time_budget (seconds), chains and temperature replace the defaults if given."""
+        self.use_mapping_confidence = bool(enabled)
+        if time_budget is not None: self.confidence_time_budget = max(0.0, float(time_budget))
+        if chains is not None: self.confidence_chains = max(2, int(chains))
+        if temperature is not None: self.confidence_temperature = max(1e-9, float(temperature))
+        if self.use_mapping_confidence and not self.defer_suggestions and not self.suggestions_pending:
+            self.calculate_and_store_suggestions()
+
+    @instrumented
+    def estimate_mapping_confidence(self, time_budget=None, is_cancelled=None):
+        """
+        Samples keys consistent with the current mappings (see posterior.PosteriorSampler) for time_budget seconds.
+        Returns the sampler's summary (probabilities {cipher_char: {plain_char: p}}, R-hat, converged...),
+        or None if is_cancelled() turns true midway.
+        """
+        sampler = PosteriorSampler(self, chains=self.confidence_chains, temperature=self.confidence_temperature,
+                                   time_budget=self.confidence_time_budget if time_budget is None else time_budget)
+        return sampler.run(is_cancelled)
+
+    def get_mapping_confidence(self):
+        """Mapping confidence of the current state (see estimate_mapping_confidence), or None while not computed for it."""
+        if not self.use_mapping_confidence or self.confidence_generation != self.suggestion_generation: return None
+        return self.mapping_confidence
+
+    def get_suggestion_confidence(self, cipher_char, plain_char):
+        """Posterior probability that cipher_char decrypts to plain_char, or None while not computed for this state."""
+        confidence = self.get_mapping_confidence()
+        if confidence is None: return None
+        return confidence['probabilities'].get(cipher_char, {}).get(plain_char, 0.0)
+
+    def get_lookahead_sequences(self):
+        """Best swap sequences of the current state (see suggest_swap_sequences), or None while not computed for it."""
+        if len(self.ciphertext) < 10: return []
+        return list(self.lookahead_sequences) if self.lookahead_generation == self.suggestion_generation else None
+
+    def _scoring_view(self, key, score_cache, partial_word_cache):
+        # Shallow copy scoring a hypothetical key: shares the text indexes, word lists and scorers, owns its key,
+        # its caches and its candidate sets, so the real state stays as it is (the GUI may read it meanwhile)
+        view = copy.copy(self)
+        view.current_key = key; view.modified_from_identity = key.modified_letters()
+        view.score_cache = score_cache; view.partial_word_cache = partial_word_cache
+        view.consistent_candidates = None
+        return view
+
+    def _child_view(self, view, cipher_char, plain_char):
+        # Scores of the parent that the swap does not affect are reused
+        score_stale, partial_stale = view._stale_letters({cipher_char})
+        return self._scoring_view(view.current_key.with_changes({cipher_char: plain_char}),
+                                  {pair: score for pair, score in view.score_cache.items() if pair[0] not in score_stale},
+                                  {pair: bonus for pair, bonus in view.partial_word_cache.items() if pair[0] not in partial_stale})
+
+    @instrumented
+    def suggest_swap_sequences(self, depth=None, beam_width=None, num_sequences=3, time_budget=None, is_cancelled=None):
+        """
+        Beam search over sequences of up to depth swaps. Each of the beam_width best sequences so far is extended
+        by its beam_width best next swaps, scored as suggest_best_swaps scores them after the earlier swaps.
+        Sequences are ranked by the sum of their step scores; orders of the same swaps count once.
+        Returns the num_sequences best [(((cipher_char, plain_char, step score), ...), total score)] of the deepest
+        level completed within time_budget seconds (an expansion stops at its next check once the time is up),
+        or None if is_cancelled() turns true.
+        """
+        depth = depth or self.lookahead_depth; beam_width = beam_width or self.lookahead_beam_width
+        deadline = time.perf_counter() + (self.lookahead_time_budget if time_budget is None else time_budget)
+        # Builds the solver once, shared by the views
+        if self.use_pattern_constraints and self.get_consistent_candidates(is_cancelled) is None: return None
+        expanded = {} # key -> next swaps of that state, shared by every sequence reaching it
+        beam = [((), 0.0, self._scoring_view(self.current_key, self.score_cache, self.partial_word_cache))]
+        out_of_time = lambda: time.perf_counter() > deadline or (is_cancelled is not None and is_cancelled())
+        best = []
+        for level in range(depth):
+            children = {} # key after the sequence -> (moves, total, parent view)
+            for moves, total, view in beam:
+                if is_cancelled is not None and is_cancelled(): return None
+                if level and time.perf_counter() > deadline: break # The first level is the single moves themselves
+                next_moves = expanded.get(view.current_key)
+                if next_moves is None:
+                    next_moves = view.suggest_best_swaps(beam_width, is_cancelled=out_of_time if level else is_cancelled)
+                    if next_moves is None:
+                        if is_cancelled is not None and is_cancelled(): return None
+                        break
+                    expanded[view.current_key] = next_moves
+                for cipher_char, plain_char, score in next_moves:
+                    key = view.current_key.with_changes({cipher_char: plain_char})
+                    if key in children and children[key][1] >= total + score: continue
+                    children[key] = (moves + ((cipher_char, plain_char, score),), total + score, view)
+            else:
+                if not children: break
+                ranked = sorted(children.values(), key=lambda child: -child[1])
+                best = [(moves, total) for moves, total, _ in ranked[:num_sequences]]
+                if level + 1 < depth: # Views only for the sequences that are extended
+                    beam = [(moves, total, self._child_view(view, moves[-1][0], moves[-1][1]))
+                            for moves, total, view in ranked[:beam_width]]
+                continue
+            break # Out of time: the unfinished level is dropped
+        return best
+
+    def get_key_fitness(self):
+        """Returns the BigramFitness of the ciphertext; the bigram matrix is counted once and reused for any key."""
+        if self.key_fitness is None: self.key_fitness = BigramFitness.from_logic(self)
+        return self.key_fitness
+    @instrumented
+    def score_key(self, key_map):
+        """Key-level n-gram fitness of key_map without decrypting the text again."""
+        return self.get_key_fitness().score_key_map(key_map)
 
     def get_ciphertext(self): return self.ciphertext
     def get_current_decrypted_text(self): return self.current_decrypted_text
-    def get_current_key(self): return copy.deepcopy(self.current_key)
+    def get_current_key(self): return self.current_key # Immutable SubstitutionKey, no copy needed
+    @instrumented
     def get_analysis_data(self):
         analysis_lines = []
         # Ensure we iterate through cipher chars as they appear in ciphertext freq first
@@ -425,12 +1014,36 @@ class DecryptionLogic:
             analysis_lines_ranked.append((mapped_plain_char, original_cipher_freq_percent_at_rank, std_freq_at_rank, std_char_at_rank))
         return analysis_lines_ranked # Use this rank-based for consistency with likely intent
 
+    @instrumented
+    def get_ngram_summary(self, top=8):
+        """
+        Most frequent ciphertext bigrams and trigrams, each as (cipher gram, gram under the current key, count),
+        plus [(word length, occurrences)]. Read from the counts cached on ciphertext_analyzer, nothing is recounted.
+        """
+        analyzer = self.ciphertext_analyzer
+        def top_grams(counts, order):
+            ranked = sorted((count, idx) for idx, count in enumerate(counts) if count)[::-1][:top]
+            grams = []
+            for count, idx in ranked:
+                cipher_gram = ''.join(string.ascii_lowercase[idx // 26 ** power % 26] for power in range(order - 1, -1, -1))
+                grams.append((cipher_gram, ''.join(self.current_key.get(ch, ch) for ch in cipher_gram), count))
+            return grams
+        return {'bigrams': top_grams(analyzer.bigram_counts, 2), 'trigrams': top_grams(analyzer.trigram_counts, 3),
+                'word_lengths': sorted(analyzer.token_length_counts.items())}
+
+    def set_instrumentation(self, enabled, reset=False):
+        """Turns the timing counters on or off (reset: start them from zero)."""
+        self.instrumentation.enabled = bool(enabled)
+        if reset: self.instrumentation.reset()
+    def get_instrumentation_stats(self):
+        """{component or method name: {'calls', 'seconds', 'items', 'mean_ms'}}, slowest first."""
+        return self.instrumentation.snapshot()
+
     def get_suggestions(self): return list(self.current_suggestions) # Return a copy
     def get_modified_set(self): return set(self.modified_from_identity) # Return a copy
     def get_last_changed_chars(self): return set(self.last_changed_chars) # Return a copy
+    def get_letter_positions(self, cipher_char): return self.char_indices.get(cipher_char, []) # Sorted offsets, read-only
     def can_undo(self): return bool(self.history)
+    def can_redo(self): return bool(self.redo_history)
     def check_suggestion_conflict(self, plain_char_suggestion):
-        for c_other, p_other in self.current_key.items():
-            if p_other == plain_char_suggestion and c_other in self.modified_from_identity:
-                return c_other
-        return None
\ No newline at end of file
+        return self.current_key.mapped_by_other(plain_char_suggestion, None)
\ No newline at end of file
@@ -1,10 +1,11 @@
 # main.py
 # -*- coding: utf-8 -*-
-import tkinter as tk
-import gui as gui # Import the new gui module
 import logic as logic # Import the new logic module
 import math
+import os
 import string # Needed if cipher.py isn't imported for string.ascii_lowercase
+from ngram_model import NgramModel
+from stream_text import MappedTextFile, scan_statistics
 
 # Standard English letter frequencies (sorted list of tuples) - Unchanged
 english_freq_sorted = [
@@ -38,6 +39,8 @@ english_digram_log_probs = {
 }
 
 # Common Trigrams (as a set for efficient lookup) - Unchanged
+# The digram and trigram tables above are only a fallback: when LANGUAGE_MODEL_FILE exists,
+# its full 26^2/26^3/26^4 tables are used instead.
 common_trigrams = {
     "the", "and", "ing", "her", "ere", "ent", "tha", "nth", "was", "eth",
     "for", "dth", "hat", "she", "ion", "tio", "ter", "est", "ers", "ati",
@@ -54,23 +57,92 @@ WORD_LIST_FILES = {
     'four': 'four_letters_words.txt'
 }
 
+# Optional large dictionary ('word' or 'word<TAB>count' per line, e.g. train_model.py --word-freq-output),
+# used by the word-pattern constraints. Without it only the word lists above are used.
+DICTIONARY_FILE = 'dictionary.txt'
+
+# --- N-gram Language Model ---
+# Compact binary model (see ngram_model.py), memory-mapped at startup.
+LANGUAGE_MODEL_FILE = 'english_ngrams.bin'
+
+
+def load_language_model(path=LANGUAGE_MODEL_FILE):
+    """Loads the binary n-gram model (built by train_model.py), or returns None if it is missing or invalid."""
+    if not os.path.exists(path): return None
+    try:
+        return NgramModel.load(path)
+    except Exception as e:
+        print(f"Warning: Could not load language model {path}: {e}. Using the built-in tables.")
+        return None
+
+
+def letter_frequencies_from_model(model):
+    """(sorted frequency list in %, probability dict, log-prob dict) from the unigram table of a trained model."""
+    probs = {letter: math.exp(model.unigrams[i]) for i, letter in enumerate(string.ascii_lowercase)}
+    total = sum(probs.values())
+    probs = {letter: prob / total for letter, prob in probs.items()}
+    freq_sorted = sorted(((letter, prob * 100.0) for letter, prob in probs.items()), key=lambda item: item[1], reverse=True)
+    log_probs = {letter: math.log(prob) if prob > 0 else default_log_prob for letter, prob in probs.items()}
+    return freq_sorted, probs, log_probs
+
+
+def language_resources(model_path=LANGUAGE_MODEL_FILE):
+    """
+    Language keyword arguments of DecryptionLogic: the trained model with its own letter frequencies if
+    model_path can be loaded, otherwise the built-in tables above.
+    """
+    freq_sorted, freq_dict, mono_log_probs = english_freq_sorted, english_freq_dict, english_mono_log_probs
+    language_model = load_language_model(model_path)
+    if language_model is not None: # Letter frequencies come from the same corpus as the model
+        freq_sorted, freq_dict, mono_log_probs = letter_frequencies_from_model(language_model)
+    else:
+        language_model = NgramModel.from_tables(english_mono_log_probs, english_digram_log_probs,
+                                                common_trigrams, default_log_prob)
+    return dict(standard_freq_sorted=freq_sorted, standard_freq_dict=freq_dict, standard_mono_log_probs=mono_log_probs,
+                standard_digram_log_probs=english_digram_log_probs, common_trigrams_set=common_trigrams,
+                language_model=language_model)
+
+
+# --- Suggestion Scoring Engine ---
+# 'numpy': batched vectorized scorer (much faster on long texts, needs NumPy)
+# 'python': original per-candidate scorer. Both return the same suggestions.
+SCORING_ENGINE = 'numpy'
+
+# --- Parallel Suggestion Scoring ---
+# Number of worker processes scoring the suggestions of texts of 200k+ characters (0: off; can be
+# switched on in the GUI as well). Only used with SCORING_ENGINE = 'python' (the NumPy engine scores
+# every pair in one pass) and only worth it on multi-core machines with large ciphertexts.
+PARALLEL_SCORING_WORKERS = 0
+
+# --- Large Ciphertext Files ---
+# Files above this size are streamed: statistics are counted chunk by chunk from a memory map and
+# only the first STREAMING_WINDOW_CHARS characters are loaded into the tool.
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+STREAMING_WINDOW_CHARS = 1024 * 1024
+
 
 if __name__ == "__main__":
+    import tkinter as tk # Only the GUI needs Tk, so batch_solve.py can import this module headless
+    import gui as gui # Import the new gui module
+
     ciphertext_file = 'ciphertext.txt'
     ciphertext = ""
-    # --- File Reading (Identical to original main.py) ---
+    text_statistics = None
+    # --- File Reading: memory-mapped, encoding detected from samples (UTF-8, otherwise GBK) ---
     try:
         try:
-            with open(ciphertext_file, 'r', encoding='utf-8') as file:
-                ciphertext = file.read()
-        except UnicodeDecodeError:
-            print("UTF-8 读取失败, 尝试 GBK 编码...")
-            try:
-                 with open(ciphertext_file, 'r', encoding='gbk') as file:
-                     ciphertext = file.read()
-            except Exception as e_inner:
-                 print(f"使用 GBK 读取密文文件时出错: {e_inner}")
-                 exit()
+            with MappedTextFile(ciphertext_file) as mapped_file:
+                if mapped_file.encoding != 'utf-8': print(f"密文文件编码识别为 {mapped_file.encoding}")
+                if mapped_file.size > STREAMING_THRESHOLD_BYTES:
+                    print(f"密文文件较大 ({mapped_file.size / 2**20:.0f} MB), 按块统计整个文件...")
+                    text_statistics = scan_statistics(mapped_file)
+                    ciphertext = mapped_file.read_window(STREAMING_WINDOW_CHARS)
+                else:
+                    try:
+                        ciphertext = mapped_file.read_text()
+                    except UnicodeDecodeError as e_inner:
+                        print(f"使用 {mapped_file.encoding} 解码密文文件时出错: {e_inner}, 无法解码的字符将被替换")
+                        ciphertext = mapped_file.read_text(errors='replace')
         except FileNotFoundError:
              print(f"错误: 文件未找到 '{ciphertext_file}'")
              print("请创建该文件并将密文放入其中。")
@@ -91,20 +163,24 @@ if __name__ == "__main__":
     # --- End File Reading ---
 
 
+    # --- Language Model: trained tables if available, otherwise the built-in ones ---
+    resources = language_resources()
+
     # --- Instantiate Logic and GUI ---
     root = tk.Tk()
 
     # 1. Create the logic instance with all necessary data, including word lists
     decryption_logic = logic.DecryptionLogic(
         ciphertext=ciphertext,
-        standard_freq_sorted=english_freq_sorted,
-        standard_freq_dict=english_freq_dict,
-        standard_mono_log_probs=english_mono_log_probs,
-        standard_digram_log_probs=english_digram_log_probs,
-        common_trigrams_set=common_trigrams,
-        word_list_files=WORD_LIST_FILES # Pass the dictionary of file paths
+        word_list_files=WORD_LIST_FILES, # Pass the dictionary of file paths
+        scoring_engine=SCORING_ENGINE,
+        **resources,
+        dictionary_file=DICTIONARY_FILE if os.path.exists(DICTIONARY_FILE) else None,
+        text_statistics=text_statistics
     )
 
+    if PARALLEL_SCORING_WORKERS: decryption_logic.set_parallel_scoring(PARALLEL_SCORING_WORKERS)
+
     # 2. Create the GUI instance, passing the logic instance to it
     app_gui = gui.DecryptionAppGUI(root, decryption_logic)
 
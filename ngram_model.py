@@ -0,0 +1,109 @@
+# ngram_model.py
+# -*- coding: utf-8 -*-
+import mmap
+import struct
+import sys
+from array import array
+
+# Binary model layout (little-endian):
+#   header: magic b'NGLM', uint16 version, uint16 max_order, float32 default_log_prob, uint32 reserved (16 bytes)
+#   body:   float32 log-probability tables for orders 1..max_order, 26**order entries each,
+#           indexed by the base-26 code of the n-gram (e.g. 'th' -> 19*26 + 7)
+MAGIC = b'NGLM'
+VERSION = 1
+MAX_ORDER = 4
+HEADER = struct.Struct('<4sHHfI')
+
+
+def ngram_index(ngram):
+    """Base-26 table index of an a-z n-gram string."""
+    idx = 0
+    for ch in ngram: idx = idx * 26 + (ord(ch) - 97)
+    return idx
+
+
+class NgramModel:
+    """
+    Letter n-gram language model with full 26, 26², 26³ and 26⁴ log-probability tables.
+    Tables are flat float32 sequences looked up by integer index, e.g. model.digrams[a * 26 + b].
+    load() memory-maps the binary file, so opening a model costs milliseconds and no table is copied.
+    """
+    def __init__(self, tables, default_log_prob=-15.0):
+        self.tables = tables # {order: sequence of 26**order floats}
+        self.default_log_prob = default_log_prob
+        self.max_order = max(tables) if tables else 0
+        self._mmap = None
+
+    @property
+    def unigrams(self): return self.tables[1]
+    @property
+    def digrams(self): return self.tables[2]
+    @property
+    def trigrams(self): return self.tables[3]
+    @property
+    def quadgrams(self): return self.tables.get(4)
+
+    def log_prob(self, ngram):
+        """Log-probability of an a-z n-gram (slow path for strings; scoring code should index the tables)."""
+        table = self.tables.get(len(ngram))
+        if table is None or not all('a' <= ch <= 'z' for ch in ngram): return self.default_log_prob
+        return table[ngram_index(ngram)]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, max_order, default_log_prob, _ = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC: mapped.close(); raise ValueError(f"{path} is not an n-gram model file.")
+        if version != VERSION: mapped.close(); raise ValueError(f"Unsupported n-gram model version {version} in {path}.")
+        expected_size = HEADER.size + 4 * sum(26 ** order for order in range(1, max_order + 1))
+        if len(mapped) < expected_size: mapped.close(); raise ValueError(f"N-gram model file {path} is truncated.")
+
+        tables = {}; offset = HEADER.size
+        if sys.byteorder == 'little':
+            view = memoryview(mapped)
+            for order in range(1, max_order + 1):
+                size = 26 ** order
+                tables[order] = view[offset:offset + 4 * size].cast('f') # Zero-copy view on the mapped file
+                offset += 4 * size
+        else: # Big-endian hosts read a byte-swapped copy instead
+            for order in range(1, max_order + 1):
+                size = 26 ** order
+                table = array('f'); table.frombytes(mapped[offset:offset + 4 * size]); table.byteswap()
+                tables[order] = table; offset += 4 * size
+        model = cls(tables, default_log_prob)
+        model._mmap = mapped if sys.byteorder == 'little' else None
+        if model._mmap is None: mapped.close()
+        return model
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.max_order, self.default_log_prob, 0))
+            for order in range(1, self.max_order + 1):
+                table = array('f', self.tables[order])
+                if sys.byteorder != 'little': table.byteswap()
+                table.tofile(f)
+
+    def close(self):
+        """Releases the memory map of a loaded model (the tables cannot be used afterwards)."""
+        if self._mmap is None: return
+        for table in self.tables.values():
+            if isinstance(table, memoryview): table.release()
+        self._mmap.close(); self._mmap = None
+
+    @classmethod
+    def from_tables(cls, mono_log_probs, digram_log_probs, common_trigrams_set, default_log_prob=-15.0,
+                    common_trigram_log_prob=-5.0):
+        """
+        Builds a model from the small hard-coded tables in main.py: listed letters/digrams keep their log-probs,
+        common trigrams get common_trigram_log_prob and every other n-gram gets default_log_prob.
+        """
+        tables = {order: array('f', [default_log_prob]) * (26 ** order) for order in range(1, MAX_ORDER + 1)}
+        for letter, log_prob in mono_log_probs.items():
+            if len(letter) == 1 and 'a' <= letter <= 'z': tables[1][ngram_index(letter)] = log_prob
+        for digram, log_prob in digram_log_probs.items():
+            if len(digram) == 2 and all('a' <= ch <= 'z' for ch in digram): tables[2][ngram_index(digram)] = log_prob
+        for trigram in common_trigrams_set:
+            if len(trigram) == 3 and all('a' <= ch <= 'z' for ch in trigram):
+                tables[3][ngram_index(trigram)] = common_trigram_log_prob
+        return cls(tables, default_log_prob)
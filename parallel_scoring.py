@@ -0,0 +1,145 @@
+# parallel_scoring.py
+# -*- coding: utf-8 -*-
+import heapq
+import multiprocessing
+import os
+import string
+import weakref
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+# DecryptionLogic attributes copied into the workers' copies: scoring weights, language flags, partial-word options
+SHARED_SETTINGS = ('default_log_prob', 'invalid_word_penalty', 'valid_word_reward_base', 'single_letter_ia_reward',
+                   'single_letter_other_penalty', 'apostrophe_s_common_letter_reward', 'common_apostrophe_s_letters',
+                   'initial_e_mapping_priority_bonus', 'common_digram_flags', 'common_trigram_flags',
+                   'ciphertext_freq_dict', 'partial_word_min_length', 'partial_word_min_known',
+                   'partial_word_max_tokens', 'partial_word_dead_end_penalty', 'partial_word_match_reward')
+# Constructor arguments of the workers' copies (the language model itself is not needed: its flags are copied)
+SHARED_RESOURCES = ('standard_freq_sorted', 'standard_freq_dict', 'standard_mono_log_probs',
+                    'standard_digram_log_probs', 'common_trigrams_set', 'word_sets', 'dictionary_file')
+
+_worker = {} # Per-process state filled by _init_worker
+
+
+def _init_worker(shared_name, size, resources, settings):
+    from logic import DecryptionLogic # Not at module level: logic imports this module
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try: ciphertext = bytes(shared.buf[:size]).decode('utf-8', errors='surrogatepass')
+    finally: shared.close()
+    # A worker only scores the candidates it is sent: nothing is scored before the settings are copied
+    logic = DecryptionLogic(ciphertext, word_list_files={}, defer_suggestions=True, **resources)
+    for name, value in settings.items(): setattr(logic, name, value)
+    _worker['logic'] = logic
+
+
+def _ready(): return os.getpid()
+
+
+def _sync_worker(logic, key_plain, partial_word_scoring):
+    # Brings the worker's copy to the main process's key; cached scores of unaffected letters stay valid
+    if key_plain != logic.current_key.plain:
+        changes = {c: new for c, old, new in zip(string.ascii_lowercase, logic.current_key.plain, key_plain) if old != new}
+        logic.current_key = logic.current_key.with_changes(changes)
+        logic._update_modified_set()
+        logic._invalidate_score_cache(set(changes))
+    if logic.use_partial_word_scoring != partial_word_scoring: logic.set_partial_word_scoring(partial_word_scoring)
+
+
+def _score_slice(key_plain, partial_word_scoring, indexed_candidates, num_suggestions):
+    """
+    Scores (index, cipher_char, target_plain_char, e bonus) candidates in a worker. Returns the local top-k
+    as (score, -index) and the scores and partial-word bonuses of the slice's pairs now cached in the worker.
+    """
+    logic = _worker['logic']
+    _sync_worker(logic, key_plain, partial_word_scoring)
+    indices = [entry[0] for entry in indexed_candidates]
+    top = logic._top_candidates([entry[1:] for entry in indexed_candidates], num_suggestions, indices=indices)
+    pairs = [(c, t) for _, c, t, _ in indexed_candidates]
+    scores = [(pair, logic.score_cache[pair]) for pair in pairs if pair in logic.score_cache]
+    bonuses = [(pair, logic.partial_word_cache[pair]) for pair in pairs if pair in logic.partial_word_cache]
+    return top, scores, bonuses
+
+
+def _split_letters(letter_weights, parts):
+    # Longest job first onto the least loaded slice
+    slices = [[] for _ in range(parts)]; loads = [0] * parts
+    for letter, weight in sorted(letter_weights.items(), key=lambda item: -item[1]):
+        i = loads.index(min(loads)); slices[i].append(letter); loads[i] += weight
+    return [letters for letters in slices if letters]
+
+
+def _release(pool, shared):
+    # Waits for the workers to exit before unlinking: one still in _init_worker attaches the block by name
+    pool.shutdown(wait=True, cancel_futures=True)
+    shared.close(); shared.unlink()
+
+
+class ParallelScorer:
+    """
+    Persistent process pool scoring the suggestion candidates of one DecryptionLogic.
+    The ciphertext reaches the workers once, through a shared memory block; the word sets and scoring
+    settings once per worker, in the pool initializer. Every worker builds its own scoring copy of the logic.
+    A refresh sends only the current key and a slice of cipher letters (balanced by occurrences) to each
+    worker, which ranks them with the same branch and bound and returns its local top-k; merging those
+    gives the exact top-k. Letters whose candidates are all cached here are ranked in this process meanwhile.
+    Workers keep their score caches between refreshes and the scores they compute are cached here too.
+    """
+    def __init__(self, logic, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.failed = False
+        data = logic.ciphertext.encode('utf-8', errors='surrogatepass')
+        self.shared = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        self.shared.buf[:len(data)] = data
+        resources = {name: getattr(logic, name) for name in SHARED_RESOURCES}
+        settings = {name: getattr(logic, name) for name in SHARED_SETTINGS}
+        # Spawned, not forked: the GUI process runs Tk and worker threads
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(self.shared.name, len(data), resources, settings))
+        self._finalizer = weakref.finalize(self, _release, self.pool, self.shared)
+        for _ in range(self.workers): self.pool.submit(_ready) # Workers start building their copies right away
+
+    def close(self):
+        """Stops the workers, waiting for slices already running, and frees the shared memory."""
+        self._finalizer()
+
+    def top_candidates(self, logic, candidates, num_suggestions, is_cancelled=None):
+        """Same result as logic._top_candidates(candidates, num_suggestions, is_cancelled), scored in the pool."""
+        if self.failed: return logic._top_candidates(candidates, num_suggestions, is_cancelled)
+        partial = logic.use_partial_word_scoring
+        letter_indices = {}; letter_weights = {}
+        for idx, (c, t, _) in enumerate(candidates):
+            letter_indices.setdefault(c, []).append(idx)
+            score = logic.score_cache.get((c, t))
+            if score is None or (partial and score > -float('inf') and (c, t) not in logic.partial_word_cache):
+                letter_weights[c] = letter_weights.get(c, 0) + len(logic.char_indices.get(c, ())) + 1
+        local_indices = sorted(idx for c, indices in letter_indices.items() if c not in letter_weights for idx in indices)
+        futures = []
+        try:
+            for letters in _split_letters(letter_weights, self.workers):
+                indexed = [(idx,) + candidates[idx] for idx in sorted(idx for c in letters for idx in letter_indices[c])]
+                futures.append(self.pool.submit(_score_slice, logic.current_key.plain, partial, indexed, num_suggestions))
+        except Exception as e: # e.g. a broken pool
+            print(f"Warning: Parallel scoring failed ({e}). Scoring in this process.")
+            self.failed = True
+            return logic._top_candidates(candidates, num_suggestions, is_cancelled)
+        top = logic._top_candidates([candidates[idx] for idx in local_indices], num_suggestions, is_cancelled, local_indices)
+        pending = set(futures)
+        while pending and top is not None:
+            if is_cancelled is not None and is_cancelled(): top = None; break
+            _, pending = wait(pending, timeout=0.05)
+        if top is None:
+            for future in futures: future.cancel()
+            return None
+        results = []
+        for future in futures:
+            try: results.append(future.result())
+            except Exception as e:
+                print(f"Warning: Parallel scoring failed ({e}). Scoring in this process.")
+                self.failed = True
+                return logic._top_candidates(candidates, num_suggestions, is_cancelled)
+        for worker_top, scores, bonuses in results:
+            logic.score_cache.update(scores); logic.partial_word_cache.update(bonuses)
+            for entry in worker_top:
+                if len(top) < num_suggestions: heapq.heappush(top, entry)
+                elif entry > top[0]: heapq.heapreplace(top, entry)
+        return top
@@ -0,0 +1,310 @@
+# posterior.py
+# -*- coding: utf-8 -*-
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+try:
+    import numpy as np
+except ImportError: # Optional: without NumPy every chain is advanced by a Python loop
+    np = None
+
+
+class _Chains:
+    # Metropolis-Hastings chains over the permutations of the free plain letters among the free cipher letters,
+    # one proposed swap per chain per step; swaps are a symmetric proposal, accepted with min(1, likelihood ratio).
+    # Parallel tempering: every start key runs as one replica per temperature rung (chain r * replicas + i is
+    # replica i at rung r) and neighbouring rungs exchange keys. Only rung 0, the target temperature, is recorded.
+    def __init__(self, fitness, keys, free, seed, temperatures, thin):
+        self.fitness = fitness
+        self.replicas = len(keys)
+        self.keys = [list(key) for _ in temperatures for key in keys]
+        self.temperatures = [temperature for temperature in temperatures for _ in keys]
+        self.free = free
+        self.random = random.Random(seed)
+        self.thin = thin
+        self.scores = [fitness.score(key) for key in self.keys]
+        self.reset()
+
+    def reset(self):
+        # Forgets the samples and counts so far (of the burn-in), the chains keep their keys
+        self.samples = [[] for _ in range(self.replicas)] # Per chain, bytes(key) every thin proposals
+        self.log_likelihoods = [[] for _ in range(self.replicas)]
+        self.proposals = 0; self.accepted = 0
+
+    def run(self, steps):
+        fitness = self.fitness; free = self.free; rnd = self.random
+        for _ in range(steps):
+            self.proposals += 1
+            for chain, key in enumerate(self.keys):
+                i, j = rnd.sample(free, 2)
+                delta = fitness.swap_delta(key, i, j)
+                if delta >= 0 or rnd.random() < math.exp(delta / self.temperatures[chain]):
+                    key[i], key[j] = key[j], key[i]
+                    self.scores[chain] += delta
+                    if chain < self.replicas: self.accepted += 1
+        if self.proposals % self.thin == 0:
+            for chain in range(self.replicas):
+                self.samples[chain].append(bytes(self.keys[chain])); self.log_likelihoods[chain].append(self.scores[chain])
+
+    def exchange(self):
+        # Proposes to swap the keys of every replica's neighbouring rungs, from the coldest pair up
+        for a in range(len(self.keys) - self.replicas):
+            b = a + self.replicas
+            log_ratio = (1.0 / self.temperatures[a] - 1.0 / self.temperatures[b]) * (self.scores[b] - self.scores[a])
+            if log_ratio >= 0 or self.random.random() < math.exp(log_ratio):
+                self.keys[a], self.keys[b] = self.keys[b], self.keys[a]
+                self.scores[a], self.scores[b] = self.scores[b], self.scores[a]
+
+    def results(self):
+        # (samples, log-likelihoods, proposals, accepted) per recorded chain; accepted is their average
+        return [(self.samples[chain], self.log_likelihoods[chain], self.proposals, self.accepted / self.replicas)
+                for chain in range(self.replicas)]
+
+
+class _VectorChains(_Chains):
+    # The same chains advanced together with NumPy: every step scores one proposed key per chain in one pass
+    def __init__(self, fitness, keys, free, seed, temperatures, thin):
+        self.rng = np.random.default_rng(seed)
+        # Unigram and non-zero bigram cells in one table: a cell (a, b, weight a, weight b, offset, count) reads
+        # log_probs[plain a * weight a + plain b * weight b + offset], the digram table followed by the unigram one
+        cells = [(a, b, 26, 1, 0, count) for a, b, count in fitness._bigram_cells]
+        cells += [(a, a, 1, 0, 676, count) for a, count in enumerate(fitness.unigram_counts) if count]
+        columns = list(zip(*cells)) if cells else [()] * 6
+        self.cell_first, self.cell_second, self.first_weight, self.second_weight, self.cell_offset = (
+            np.array(column, dtype=np.intp) for column in columns[:5])
+        self.cell_counts = np.array(columns[5], dtype=np.float64)
+        self.log_probs = np.array(list(fitness.digram_log_probs) + list(fitness.mono_log_probs), dtype=np.float64)
+        self.replicas = len(keys)
+        self.keys = np.array([key for _ in temperatures for key in keys], dtype=np.intp)
+        self.temperatures = np.repeat(np.array(temperatures, dtype=np.float64), len(keys))
+        self.free = np.array(free, dtype=np.intp)
+        self.thin = thin
+        self.scores = self._score(self.keys)
+        self.reset()
+
+    def reset(self):
+        self.recorded = [] # (keys, scores) of the recorded chains every thin proposals
+        self.proposals = 0; self.accepted = 0
+
+    def _score(self, keys):
+        # BigramFitness.score of every row
+        index = keys[:, self.cell_first] * self.first_weight + keys[:, self.cell_second] * self.second_weight + self.cell_offset
+        return self.log_probs[index] @ self.cell_counts
+
+    def run(self, steps):
+        chains = len(self.keys); rows = np.arange(chains); free_count = len(self.free)
+        # Random numbers of all steps at once: the proposed positions and the acceptance thresholds (as logs)
+        firsts = self.rng.integers(0, free_count, (steps, chains))
+        seconds = self.rng.integers(0, free_count - 1, (steps, chains)); seconds += seconds >= firsts # Distinct positions
+        firsts = self.free[firsts]; seconds = self.free[seconds]
+        log_thresholds = np.log(self.rng.random((steps, chains))) * self.temperatures
+        for step in range(steps):
+            i = firsts[step]; j = seconds[step]
+            proposed = self.keys.copy()
+            proposed[rows, i] = self.keys[rows, j]; proposed[rows, j] = self.keys[rows, i]
+            new_scores = self._score(proposed)
+            accept = new_scores - self.scores >= log_thresholds[step]
+            self.keys[accept] = proposed[accept]; self.scores[accept] = new_scores[accept]
+            self.accepted += int(accept[:self.replicas].sum())
+        self.proposals += steps
+        if self.proposals % self.thin == 0:
+            self.recorded.append((self.keys[:self.replicas].astype(np.uint8), self.scores[:self.replicas].copy()))
+
+    def exchange(self):
+        replicas = self.replicas
+        for a in range(0, len(self.keys) - replicas, replicas):
+            first = np.arange(a, a + replicas); second = first + replicas
+            log_ratio = (1.0 / self.temperatures[first] - 1.0 / self.temperatures[second]) * (self.scores[second] - self.scores[first])
+            swap = np.log(self.rng.random(replicas)) < log_ratio
+            both = np.concatenate((first[swap], second[swap])); other = np.concatenate((second[swap], first[swap]))
+            self.keys[both] = self.keys[other]; self.scores[both] = self.scores[other]
+
+    def results(self):
+        return [([keys[chain].tobytes() for keys, _ in self.recorded], [float(scores[chain]) for _, scores in self.recorded],
+                 self.proposals, self.accepted / self.replicas) for chain in range(self.replicas)]
+
+
+def temperature_ladder(fitness, temperature, rungs):
+    """
+    Geometric temperatures from temperature up to a hot rung scaled per 100 letter pairs like AutoSolver's
+    start temperature, so the ladder spans score differences of the same size on short and long texts.
+    """
+    hot = max(temperature, 0.2 * fitness.total_bigrams / 100.0)
+    if rungs < 2: return [temperature]
+    return [temperature * (hot / temperature) ** (rung / (rungs - 1)) for rung in range(rungs)]
+
+
+def _run_chains(fitness, keys, free, seed, temperatures, thin, seconds, is_cancelled=None):
+    """
+    Runs the chains (one replica of every key per temperature) for seconds, exchanging neighbouring rungs
+    every thin proposals; the results of the rung 0 chains, or None if is_cancelled() turns true.
+    The first half is the burn-in, not recorded; the second half gives at least 4 samples per chain.
+    """
+    chains = (_VectorChains if np is not None else _Chains)(fitness, keys, free, seed, temperatures, thin)
+    start = time.perf_counter()
+    for phase_end, minimum in ((seconds / 2.0, 0), (seconds, 4 * thin)):
+        while time.perf_counter() - start < phase_end or chains.proposals < minimum:
+            if is_cancelled is not None and is_cancelled(): return None
+            chains.run(thin); chains.exchange()
+        if not minimum: chains.reset()
+    return chains.results()
+
+
+_worker = {} # Per-process state filled by _init_worker
+
+
+def _init_worker(stop):
+    _worker['stop'] = stop # multiprocessing Event set by the main process to cancel the run
+
+
+def _run_chains_until(deadline, fitness, keys, free, seed, temperatures, thin):
+    # _run_chains in a worker process: deadline is wall-clock time, so the time the pool took to start counts too
+    return _run_chains(fitness, keys, free, seed, temperatures, thin, max(0.0, deadline - time.time()), _worker['stop'].is_set)
+
+
+def _rhat(means, variances, n):
+    # Gelman-Rubin from the means and variances (ddof 1) of m sequences of length n
+    m = len(means)
+    if m < 2 or n < 2: return float('nan')
+    grand_mean = sum(means) / m
+    between = n / (m - 1) * sum((mean - grand_mean) ** 2 for mean in means)
+    within = sum(variances) / m
+    if within <= 0: return 1.0 if between <= 1e-12 else float('inf')
+    return math.sqrt(((n - 1) / n * within + between / n) / within)
+
+
+def gelman_rubin(sequences):
+    """Potential scale reduction factor R-hat of sequences cut to the shortest (1.0 when all are constant and equal)."""
+    n = min(len(sequence) for sequence in sequences) if sequences else 0
+    if n < 2: return float('nan')
+    means = [sum(sequence[:n]) / n for sequence in sequences]
+    variances = [sum((x - mean) ** 2 for x in sequence[:n]) / (n - 1) for sequence, mean in zip(sequences, means)]
+    return _rhat(means, variances, n)
+
+
+class PosteriorSampler:
+    """
+    Estimates how probable every (cipher letter, plain letter) mapping is, given the text and the mappings
+    the user confirmed, by sampling complete keys with several Metropolis-Hastings chains.
+    The likelihood is the key-level n-gram fitness of DecryptionLogic; dividing it by temperature > 1
+    flattens the posterior, which the bigram model makes overconfident on long texts.
+    Confirmed mappings stay fixed (the first of letters sharing a plain letter); the other cipher letters
+    take a permutation of the remaining plain letters. Chains start from the frequency ranking and from
+    random keys and run for time_budget seconds: vectorized with NumPy if available, split over `workers`
+    processes if workers > 1. Every chain is tempered over `rungs` temperatures (see temperature_ladder),
+    so it can leave the local optima of the key space through its hotter replicas. The first half of the
+    time is burn-in. Convergence is reported as the split R-hat of the log-likelihood and the largest split
+    R-hat of the mapping indicators.
+    """
+    def __init__(self, logic, chains=8, time_budget=1.0, temperature=1.0, seed=None, workers=1, thin=26, rungs=4):
+        if chains < 1: raise ValueError("At least one chain is needed.")
+        self.logic = logic
+        self.chains = chains
+        self.time_budget = time_budget
+        self.temperature = max(1e-9, temperature)
+        self.rungs = max(1, rungs)
+        self.random = random.Random(seed)
+        self.workers = workers
+        self.thin = thin # Proposed swaps per chain between recorded samples
+        self.fitness = logic.get_key_fitness()
+
+    def _fixed_mappings(self):
+        fixed = {}; used = set()
+        for cipher_char in sorted(self.logic.modified_from_identity):
+            plain_char = self.logic.current_key[cipher_char]
+            if len(plain_char) == 1 and 'a' <= plain_char <= 'z' and plain_char not in used:
+                fixed[ord(cipher_char) - 97] = ord(plain_char) - 97; used.add(plain_char)
+        return fixed
+
+    def _start_keys(self, fixed, free):
+        free_plains = [p for p in range(26) if p not in set(fixed.values())]
+        ranked_cipher = [ord(c) - 97 for c, _ in self.logic.ciphertext_freq_sorted_stable]
+        ranked_cipher += [c for c in range(26) if c not in ranked_cipher]
+        ranked_plain = [ord(p) - 97 for p, _ in self.logic.standard_freq_sorted]
+        ranked_plain += [p for p in range(26) if p not in ranked_plain]
+        base = [0] * 26
+        for c, p in fixed.items(): base[c] = p
+        frequency_key = list(base)
+        for c, p in zip([c for c in ranked_cipher if c in free], [p for p in ranked_plain if p in free_plains]):
+            frequency_key[c] = p
+        keys = [frequency_key]
+        while len(keys) < self.chains: # Overdispersed starts, so disagreeing chains show up in R-hat
+            shuffled = list(free_plains); self.random.shuffle(shuffled)
+            key = list(base)
+            for c, p in zip(free, shuffled): key[c] = p
+            keys.append(key)
+        return keys
+
+    def run(self, is_cancelled=None):
+        """
+        {'probabilities': {cipher_char: {plain_char: probability}}, 'rhat', 'max_mapping_rhat', 'converged',
+        'chains', 'samples_per_chain', 'acceptance', 'seconds'}, or None if is_cancelled() turns true.
+        """
+        start = time.perf_counter()
+        fixed = self._fixed_mappings()
+        free = [c for c in range(26) if c not in fixed]
+        keys = self._start_keys(fixed, free)
+        temperatures = temperature_ladder(self.fitness, self.temperature, self.rungs)
+        results = None
+        if len(free) < 2: # Nothing left to sample
+            results = [([bytes(key)] * 4, [self.fitness.score(key)] * 4, 0, 0) for key in keys]
+        elif self.workers > 1:
+            groups = [keys[worker::self.workers] for worker in range(min(self.workers, len(keys)))]
+            deadline = time.time() + self.time_budget - (time.perf_counter() - start)
+            context = multiprocessing.get_context('spawn')
+            stop = context.Event()
+            try:
+                with ProcessPoolExecutor(max_workers=len(groups), mp_context=context, initializer=_init_worker, initargs=(stop,)) as pool:
+                    futures = [pool.submit(_run_chains_until, deadline, self.fitness, group, free, self.random.randrange(2 ** 32),
+                                           temperatures, self.thin) for group in groups]
+                    pending = set(futures)
+                    while pending: # Polled, so is_cancelled() can stop the workers (they check stop every thin proposals)
+                        if is_cancelled is not None and is_cancelled():
+                            stop.set(); return None
+                        _, pending = wait(pending, timeout=0.05)
+                    results = [result for future in futures for result in future.result()]
+                    if any(result is None for result in results): return None
+            except Exception as e: # e.g. a broken pool
+                print(f"Warning: Sampling in processes failed ({e}). Sampling in this process.")
+        if results is None:
+            results = _run_chains(self.fitness, keys, free, self.random.randrange(2 ** 32), temperatures, self.thin,
+                                  max(0.0, self.time_budget - (time.perf_counter() - start)), is_cancelled)
+            if results is None: return None
+        return self._summarize(results, time.perf_counter() - start)
+
+    def _summarize(self, results, seconds):
+        # Every chain (after the burn-in) cut in two halves for the split R-hat
+        half = min(len(samples) for samples, _, _, _ in results) // 2
+        parts = [] # (samples, log-likelihoods) of 2 * chains sequences of half samples each
+        for samples, log_likelihoods, _, _ in results:
+            for start in (len(samples) - 2 * half, len(samples) - half):
+                parts.append((samples[start:start + half], log_likelihoods[start:start + half]))
+        part_counts = [] # Per part, counts[c][p] of samples mapping c to p
+        for samples, _ in parts:
+            counts = [[0] * 26 for _ in range(26)]
+            for sample in samples:
+                for c, p in enumerate(sample): counts[c][p] += 1
+            part_counts.append(counts)
+        total = half * len(parts)
+        probabilities = {chr(97 + c): {chr(97 + p): sum(counts[c][p] for counts in part_counts) / total
+                                       for p in range(26) if any(counts[c][p] for counts in part_counts)}
+                         for c in range(26)} if total else {}
+        rhat = gelman_rubin([log_likelihoods for _, log_likelihoods in parts])
+        max_mapping_rhat = 1.0
+        if half >= 2:
+            for c in range(26):
+                for p in range(26):
+                    ones = [counts[c][p] for counts in part_counts]
+                    if not 0 < sum(ones) < total: continue
+                    # Indicator sequences: mean k/n, variance k(n-k)/(n(n-1))
+                    value = _rhat([k / half for k in ones], [k * (half - k) / (half * (half - 1)) for k in ones], half)
+                    if not math.isnan(value): max_mapping_rhat = max(max_mapping_rhat, value)
+        proposals = sum(result[2] for result in results)
+        return {'probabilities': probabilities, 'rhat': rhat, 'max_mapping_rhat': max_mapping_rhat,
+                'converged': (math.isnan(rhat) or rhat < 1.1) and max_mapping_rhat < 1.1,
+                'chains': len(results), 'samples_per_chain': 2 * half,
+                'acceptance': sum(result[3] for result in results) / proposals if proposals else 0.0,
+                'seconds': round(seconds, 3)}
@@ -0,0 +1,216 @@
+# quality_benchmark.py
+# -*- coding: utf-8 -*-
+"""
+Solver quality over time: how fast the suggestions (or AutoSolver) reach the correct key.
+
+    python quality_benchmark.py -o quality.json
+    python quality_benchmark.py --modes suggestions annealing --sizes 500 2000 8000 --seeds 10 --compare old_quality.json
+    python quality_benchmark.py --ciphertext ciphertext.txt --table table.txt   # the pair written by 加密测试.py
+
+Every job is one seeded plaintext/key pair (generated like benchmark.py) run through one mode:
+  suggestions    the top suggestion is applied repeatedly, as an analyst pressing "应用最佳建议"
+  annealing, hill_climbing
+                 AutoSolver, run once per time checkpoint with the same seed
+After every step (or checkpoint) the key accuracy (share of the cipher letters present in the text that
+are mapped correctly) and the letter accuracy (share of the text's letters decrypted correctly) are recorded
+with the elapsed time. Jobs run in a process pool. The JSON output holds every curve plus per mode and size
+averages by step and by time, which --compare sets against an earlier output (e.g. other scoring weights).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import main
+from batch_solve import load_resources
+from benchmark import generate_ciphertext
+from logic import DecryptionLogic
+from solver import AutoSolver
+from substitution_key import SubstitutionKey
+
+DEFAULT_SIZES = (300, 1000, 3000, 10000)
+DEFAULT_MODES = ('suggestions', 'annealing')
+DEFAULT_CHECKPOINTS = (0.1, 0.25, 0.5, 1.0, 2.0) # Seconds of AutoSolver search
+TIME_BUCKETS = (0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0) # Seconds at which the averaged curves are read
+
+_worker = {} # Per-process state filled by _init_worker
+
+
+def _init_worker(model):
+    _worker['resources'] = load_resources(model)
+
+
+def read_table(path):
+    """True key {cipher_char: plain_char} from a table.txt of 加密测试.py (line i: cipher index of plain letter i)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        table = [int(float(line)) for line in f if line.strip()]
+    if sorted(table) != list(range(26)): raise ValueError(f"{path} 不是26个字母的置换表")
+    return SubstitutionKey.from_encryption_table(table)
+
+
+def accuracy(logic, true_key):
+    """(key accuracy, letter accuracy) of the logic's current key against true_key."""
+    letter_counts = logic.compact_text.letter_counts()
+    present = [(chr(97 + i), count) for i, count in enumerate(letter_counts) if count]
+    if not present: return 0.0, 0.0
+    correct = [(c, count) for c, count in present if logic.current_key.get(c) == true_key.get(c)]
+    return len(correct) / len(present), sum(count for _, count in correct) / sum(count for _, count in present)
+
+
+def _point(step, seconds, logic, true_key):
+    key_accuracy, letter_accuracy = accuracy(logic, true_key)
+    return {'step': step, 'seconds': round(seconds, 4), 'key_accuracy': round(key_accuracy, 4),
+            'letter_accuracy': round(letter_accuracy, 4)}
+
+
+def run_suggestions(logic, true_key, max_steps=40):
+    """Applies the top suggestion until there is none (or max_steps); one curve point per step."""
+    start = time.perf_counter()
+    curve = [_point(0, 0.0, logic, true_key)]
+    for step in range(1, max_steps + 1):
+        suggestions = logic.get_suggestions()
+        if not suggestions: break
+        cipher_char, plain_char, _ = suggestions[0]
+        logic.apply_key_changes({cipher_char: plain_char}) # Also computes the next suggestions
+        curve.append(_point(step, time.perf_counter() - start, logic, true_key))
+    return curve
+
+
+def run_solver(logic, true_key, method, checkpoints, seed):
+    """One AutoSolver run per time checkpoint (same seed); the step of a point is the solver's iteration count."""
+    curve = [_point(0, 0.0, logic, true_key)]
+    for time_limit in checkpoints:
+        start = time.perf_counter()
+        solver = AutoSolver(logic, method=method, time_limit=time_limit, seed=seed)
+        key_map, _ = solver.solve()
+        logic.load_key_from_file(key_map)
+        curve.append(_point(solver.iterations, time.perf_counter() - start, logic, true_key))
+        logic.undo_last_change() # Every checkpoint starts from the same state
+    return curve
+
+
+def run_job(job):
+    """Runs one job in a worker and returns it with its curve (or its error)."""
+    try:
+        if job.get('ciphertext_file'):
+            with open(job['ciphertext_file'], 'r', encoding='utf-8', errors='replace') as f: ciphertext = f.read()
+            true_key = read_table(job['table_file'])
+        else: ciphertext, true_key = generate_ciphertext(job['size'], job['seed'])
+        start = time.perf_counter()
+        logic = DecryptionLogic(ciphertext, **_worker['resources'])
+        init_seconds = time.perf_counter() - start
+        if job['mode'] == 'suggestions': curve = run_suggestions(logic, true_key, job['max_steps'])
+        else: curve = run_solver(logic, true_key, job['mode'], job['checkpoints'], job['seed'])
+        return dict(job, init_seconds=round(init_seconds, 4), curve=curve)
+    except Exception as e:
+        return dict(job, error=f"{type(e).__name__}: {e}")
+
+
+def _value_at(curve, field, limit, axis):
+    # Accuracy reached by the time axis value limit (the last point at or before it)
+    value = curve[0][field]
+    for point in curve:
+        if point[axis] > limit: break
+        value = point[field]
+    return value
+
+
+def summarize(jobs):
+    """{mode: {size: {'jobs', 'final_*', 'by_step', 'by_time'}}} of the curves averaged over seeds."""
+    groups = {}
+    for job in jobs:
+        if 'curve' in job: groups.setdefault(job['mode'], {}).setdefault(str(job['size']), []).append(job['curve'])
+    summary = {}
+    for mode, sizes in groups.items():
+        summary[mode] = {}
+        for size, curves in sizes.items():
+            mean = lambda values: round(statistics.mean(values), 4)
+            entry = {'jobs': len(curves),
+                     'final_key_accuracy': mean([curve[-1]['key_accuracy'] for curve in curves]),
+                     'final_letter_accuracy': mean([curve[-1]['letter_accuracy'] for curve in curves]),
+                     'by_time': [{'seconds': limit,
+                                  'key_accuracy': mean([_value_at(curve, 'key_accuracy', limit, 'seconds') for curve in curves]),
+                                  'letter_accuracy': mean([_value_at(curve, 'letter_accuracy', limit, 'seconds') for curve in curves])}
+                                 for limit in TIME_BUCKETS]}
+            if mode == 'suggestions': # Steps of the solvers are iteration counts, not comparable between runs
+                max_step = max(curve[-1]['step'] for curve in curves)
+                entry['by_step'] = [{'step': step,
+                                     'key_accuracy': mean([_value_at(curve, 'key_accuracy', step, 'step') for curve in curves]),
+                                     'letter_accuracy': mean([_value_at(curve, 'letter_accuracy', step, 'step') for curve in curves])}
+                                    for step in range(max_step + 1)]
+            summary[mode][size] = entry
+    return summary
+
+
+def compare_summaries(summary, other):
+    """Lines of final letter/key accuracy differences between two summaries, for the modes and sizes in both."""
+    lines = []
+    for mode, sizes in summary.items():
+        for size, entry in sizes.items():
+            reference = other.get(mode, {}).get(size)
+            if reference is None: continue
+            lines.append(f"{mode:<13} {size:>7} 字符: 字母准确率 {reference['final_letter_accuracy']:.3f} -> {entry['final_letter_accuracy']:.3f}"
+                         f" ({entry['final_letter_accuracy'] - reference['final_letter_accuracy']:+.3f}),"
+                         f" 密钥准确率 {reference['final_key_accuracy']:.3f} -> {entry['final_key_accuracy']:.3f}")
+    return lines
+
+
+def run_quality(jobs, workers=None, model=main.LANGUAGE_MODEL_FILE, progress=True):
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker, initargs=(model,)) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if progress: print(f"\r已完成 {len(results)}/{len(jobs)} 个任务...", end='', file=sys.stderr)
+    if progress: print(file=sys.stderr)
+    results.sort(key=lambda job: (job['mode'], job.get('size') or 0, job.get('seed') or 0))
+    return results
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="建议/自动破解的准确率-时间曲线测试")
+    parser.add_argument('--modes', nargs='+', choices=('suggestions', 'annealing', 'hill_climbing'), default=list(DEFAULT_MODES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="明文长度 (字符数)")
+    parser.add_argument('--seeds', type=int, default=5, help="每种长度的明文/密钥对数量")
+    parser.add_argument('--first-seed', type=int, default=1)
+    parser.add_argument('--max-steps', type=int, default=40, help="suggestions 模式最多应用的建议数")
+    parser.add_argument('--checkpoints', type=float, nargs='+', default=list(DEFAULT_CHECKPOINTS), help="自动破解的时间检查点 (秒)")
+    parser.add_argument('--ciphertext', default=None, help="改为测试此密文文件 (需同时给出 --table)")
+    parser.add_argument('--table', default=None, help="加密测试.py 写出的 table.txt")
+    parser.add_argument('--workers', type=int, default=None, help="进程数 (默认: CPU核数)")
+    parser.add_argument('--model', default=main.LANGUAGE_MODEL_FILE, help="n-gram语言模型文件")
+    parser.add_argument('-o', '--output', default='quality.json', help="输出的JSON文件")
+    parser.add_argument('--compare', default=None, help="与之比较的早先输出")
+    args = parser.parse_args(argv)
+
+    common = {'max_steps': args.max_steps, 'checkpoints': sorted(args.checkpoints)}
+    if args.ciphertext:
+        if not args.table: parser.error("--ciphertext 需要同时给出 --table")
+        jobs = [dict(common, mode=mode, size=os.path.getsize(args.ciphertext), seed=0,
+                     ciphertext_file=args.ciphertext, table_file=args.table) for mode in args.modes]
+    else:
+        jobs = [dict(common, mode=mode, size=size, seed=seed) for mode in args.modes for size in args.sizes
+                for seed in range(args.first_seed, args.first_seed + args.seeds)]
+    results = run_quality(jobs, args.workers, args.model)
+    report = {'meta': {'python': platform.python_version(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'modes': args.modes, 'checkpoints': common['checkpoints']},
+              'summary': summarize(results), 'jobs': results}
+    with open(args.output, 'w', encoding='utf-8') as f: json.dump(report, f, ensure_ascii=False, indent=1)
+    for job in results:
+        if 'error' in job: print(f"任务失败 ({job['mode']}, {job.get('size')}, {job.get('seed')}): {job['error']}", file=sys.stderr)
+    for mode, sizes in report['summary'].items():
+        for size, entry in sizes.items():
+            print(f"{mode:<13} {size:>7} 字符: 字母准确率 {entry['final_letter_accuracy']:.3f}, 密钥准确率 {entry['final_key_accuracy']:.3f} ({entry['jobs']} 个任务)")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f: other = json.load(f)
+        for line in compare_summaries(report['summary'], other.get('summary', {})): print(f"对比: {line}")
+    print(f"结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
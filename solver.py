@@ -0,0 +1,136 @@
+# solver.py
+# -*- coding: utf-8 -*-
+import math
+import random
+import string
+import time
+
+
+class AutoSolver:
+    """
+    Automatic solver ("自动破解") that searches over complete 26-letter keys.
+    Works on the ciphertext and language tables of a DecryptionLogic instance and returns a key map
+    that can be handed to DecryptionLogic.load_key_from_file for further manual refinement.
+
+    method: 'annealing' (simulated annealing) or 'hill_climbing' (hill climbing with random restarts).
+    The search stops when time_limit seconds or max_iterations key evaluations are used up. The returned key
+    is the best one seen, polished by a final hill climb; annealing starts from the hill-climbed frequency
+    start key, so it never ends below it.
+    """
+    def __init__(self, logic, method='annealing', time_limit=5.0, max_iterations=None, seed=None,
+                 start_acceptance=0.3, cooling_rate=0.9995):
+        if method not in ('annealing', 'hill_climbing'): raise ValueError(f"Unknown solver method: {method}")
+        if time_limit is None and max_iterations is None: raise ValueError("Either time_limit or max_iterations must be set.")
+        self.logic = logic
+        self.method = method
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.random = random.Random(seed)
+        self.start_acceptance = start_acceptance # Share of typical worsening swaps accepted at the start temperature
+        self.cooling_rate = cooling_rate
+        self.iterations = 0
+        self.is_cancelled = None # Set by solve(); checked every 1024 evaluations
+        self.cancelled = False
+        # Bigram-matrix fitness: every swap is evaluated in O(26), whatever the text length
+        self.key_fitness = logic.get_key_fitness()
+
+    def fitness(self, plain_of):
+        """N-gram log-likelihood of the text decrypted with plain_of (list: cipher index -> plain index)."""
+        return self.key_fitness.score(plain_of)
+
+    def _frequency_start_key(self):
+        # Most frequent cipher letter -> most frequent English letter, and so on down both rankings
+        plain_of = [0] * 26
+        cipher_ranked = [char for char, _ in self.logic.ciphertext_freq_sorted_stable]
+        cipher_ranked += [char for char in string.ascii_lowercase if char not in cipher_ranked]
+        plain_ranked = [char for char, _ in self.logic.standard_freq_sorted]
+        plain_ranked += [char for char in string.ascii_lowercase if char not in plain_ranked]
+        for cipher_char, plain_char in zip(cipher_ranked, plain_ranked):
+            plain_of[ord(cipher_char) - 97] = ord(plain_char) - 97
+        return plain_of
+
+    def _budget_left(self, deadline):
+        if self.cancelled: return False
+        if self.max_iterations is not None and self.iterations >= self.max_iterations: return False
+        if self.is_cancelled is not None and self.iterations % 1024 == 0 and self.is_cancelled():
+            self.cancelled = True; return False
+        return time.perf_counter() < deadline
+
+    def _swap_delta(self, plain_of, i, j):
+        self.iterations += 1
+        return self.key_fitness.swap_delta(plain_of, i, j)
+
+    def _hill_climb(self, deadline):
+        best_key = self._frequency_start_key(); best_score = self.fitness(best_key)
+        current_key = list(best_key)
+        while self._budget_left(deadline):
+            current_score = self.fitness(current_key)
+            improved = True
+            while improved and self._budget_left(deadline):
+                improved = False
+                for i in range(25):
+                    for j in range(i + 1, 26):
+                        delta = self._swap_delta(current_key, i, j)
+                        if delta > 1e-9:
+                            current_key[i], current_key[j] = current_key[j], current_key[i]
+                            current_score += delta; improved = True
+                        if not self._budget_left(deadline): break
+                    if not self._budget_left(deadline): break
+            if current_score > best_score: best_key, best_score = list(current_key), current_score
+            current_key = list(range(26)); self.random.shuffle(current_key) # Random restart
+        return best_key, self.fitness(best_key)
+
+    def _polish(self, plain_of):
+        # First-improvement swaps until none improves: the nearest local optimum (a few hundred deltas per pass)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(25):
+                for j in range(i + 1, 26):
+                    if self._swap_delta(plain_of, i, j) > 1e-9:
+                        plain_of[i], plain_of[j] = plain_of[j], plain_of[i]; improved = True
+        return plain_of
+
+    def _start_temperature(self, plain_of, samples=200):
+        # Temperature accepting a median worsening swap from plain_of with probability start_acceptance: the size
+        # of score differences depends on the language tables as much as on the amount of text
+        probe = list(plain_of); worsening = []
+        for _ in range(samples):
+            i, j = self.random.sample(range(26), 2)
+            delta = self.key_fitness.swap_delta(probe, i, j)
+            if delta < 0: worsening.append(-delta)
+        if not worsening: return 1.0
+        worsening.sort()
+        return worsening[len(worsening) // 2] / math.log(1.0 / self.start_acceptance)
+
+    def _anneal(self, deadline):
+        # From the local optimum of the frequency start, so the search never ends below what one climb reaches
+        current_key = self._polish(self._frequency_start_key()); current_score = self.fitness(current_key)
+        best_key, best_score = list(current_key), current_score
+        start_temperature = self._start_temperature(current_key)
+        temperature = start_temperature
+        while self._budget_left(deadline):
+            if temperature < start_temperature * 1e-3: # Frozen: reheat from the best key rather than idle in a local optimum
+                current_key, current_score, temperature = list(best_key), best_score, start_temperature
+            i, j = self.random.sample(range(26), 2)
+            delta = self._swap_delta(current_key, i, j)
+            if delta >= 0 or self.random.random() < math.exp(delta / max(temperature, 1e-9)):
+                current_key[i], current_key[j] = current_key[j], current_key[i]
+                current_score += delta
+                if current_score > best_score: best_key, best_score = list(current_key), current_score
+            temperature *= self.cooling_rate
+        best_key = self._polish(best_key)
+        return best_key, self.fitness(best_key)
+
+    def solve(self, is_cancelled=None):
+        """
+        Runs the search and returns (key_map, score), key_map being {cipher_char: plain_char} for a-z,
+        or None if is_cancelled() turns true midway (e.g. from another thread).
+        """
+        self.iterations = 0; self.is_cancelled = is_cancelled; self.cancelled = False
+        deadline = time.perf_counter() + (self.time_limit if self.time_limit is not None else float('inf'))
+        if self.method == 'annealing': plain_of, score = self._anneal(deadline)
+        else: plain_of, score = self._hill_climb(deadline)
+        if self.cancelled: return None
+        key_map = {chr(97 + i): chr(97 + plain_of[i]) for i in range(26)}
+        return key_map, score
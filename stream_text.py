@@ -0,0 +1,126 @@
+# stream_text.py
+# -*- coding: utf-8 -*-
+import codecs
+import mmap
+import os
+from collections import Counter
+
+from compact_text import CompactText
+
+SAMPLE_BYTES = 64 * 1024
+FALLBACK_ENCODING = 'gbk'
+_BOMS = ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'), (codecs.BOM_UTF8, 'utf-8-sig'),
+         (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def _decodes(sample, encoding):
+    # A sample may end inside a multi-byte character, so it is decoded as an unfinished stream
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_encoding(data, sample_bytes=SAMPLE_BYTES):
+    """
+    Guesses the encoding of data (bytes or mmap) from a byte-order mark or from samples of its start,
+    middle and end: UTF-8 if they all decode as UTF-8, otherwise GBK (the order main.py always tried).
+    """
+    for bom, encoding in _BOMS:
+        if data[:len(bom)] == bom: return encoding
+    size = len(data)
+    for start in sorted({0, max(0, size // 2 - sample_bytes // 2), max(0, size - sample_bytes)}):
+        sample = data[start:start + sample_bytes]
+        if start: sample = sample.lstrip(bytes(range(0x80, 0xc0))) # Skip a character cut at the sample start
+        if not _decodes(sample, 'utf-8'):
+            return FALLBACK_ENCODING if _decodes(data[:sample_bytes], FALLBACK_ENCODING) else 'latin-1'
+    return 'utf-8'
+
+
+class MappedTextFile:
+    """
+    Read-only memory map of a text file. The file is decoded only when asked: whole (read_text),
+    as a stream of chunks (iter_chunks) or as a window of its first characters (read_window),
+    so a capture larger than RAM can be scanned without ever holding its text.
+    """
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.encoding = encoding or (detect_encoding(self._mmap) if self._mmap is not None else 'utf-8')
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def close(self):
+        if self._mmap is not None: self._mmap.close(); self._mmap = None
+
+    def read_text(self, errors='strict'):
+        if self._mmap is None: return ''
+        return str(self._mmap, self.encoding, errors) # Decodes straight from the mapped pages
+
+    def iter_chunks(self, chunk_bytes=8 * 1024 * 1024, errors='replace'):
+        """Yields the decoded text in pieces of about chunk_bytes; characters are never split between pieces."""
+        if self._mmap is None: return
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors)
+        for start in range(0, self.size, chunk_bytes):
+            text = decoder.decode(self._mmap[start:start + chunk_bytes], final=start + chunk_bytes >= self.size)
+            if text: yield text
+
+    def read_window(self, max_chars, errors='replace'):
+        """The first max_chars characters of the file."""
+        pieces = []; remaining = max_chars
+        for text in self.iter_chunks(chunk_bytes=max(4096, min(max_chars * 4, 8 * 1024 * 1024)), errors=errors):
+            pieces.append(text[:remaining]); remaining -= len(pieces[-1])
+            if remaining <= 0: break
+        return ''.join(pieces)
+
+
+class TextStatistics:
+    """Letter, bigram and token counts of a whole text, accumulated chunk by chunk."""
+    def __init__(self):
+        self.total_chars = 0
+        self.letter_counts = [0] * 26
+        self.bigram_counts = [0] * 676
+        self.token_counts = Counter()
+        self.attached_token_counts = Counter() # Occurrences of tokens touching non a-z letters (not standalone)
+
+    def add_text(self, text, follows_text=False):
+        """
+        Counts one piece of the text. Pieces must be cut right after a non-letter (see scan_statistics);
+        follows_text tells that the piece is not the start of the text.
+        """
+        self.total_chars += len(text)
+        # A leading space stands for the non-letter the previous piece ended with
+        compact = CompactText(' ' + text if follows_text else text, index_positions=False)
+        for idx, count in enumerate(compact.letter_counts()): self.letter_counts[idx] += count
+        for idx, count in enumerate(compact.bigram_counts()):
+            if count: self.bigram_counts[idx] += count
+        token_counts, attached_token_counts = compact.token_counts()
+        self.token_counts.update(token_counts); self.attached_token_counts.update(attached_token_counts)
+
+    @property
+    def total_letters(self): return sum(self.letter_counts)
+
+    def letter_frequencies(self):
+        """{letter: share of all letters}, 0.0 for a text without letters."""
+        total = self.total_letters
+        return {chr(97 + idx): count / total if total else 0.0 for idx, count in enumerate(self.letter_counts)}
+
+
+def scan_statistics(mapped_file, chunk_bytes=8 * 1024 * 1024):
+    """Counts a MappedTextFile chunk by chunk; memory use is bounded by the chunk size and the vocabulary."""
+    statistics = TextStatistics(); carry = ''; counted_any = False
+    for block in mapped_file.iter_chunks(chunk_bytes):
+        text = carry + block
+        cut = len(text)
+        while cut > 0 and text[cut - 1].isalpha(): cut -= 1 # Words and their letter neighbours stay in one piece
+        if cut == 0:
+            if len(text) < max(chunk_bytes, 1 << 20): carry = text; continue
+            cut = len(text) # A single huge "word": count it as it is
+        carry = text[cut:]
+        statistics.add_text(text[:cut], follows_text=counted_any); counted_any = True
+    if carry: statistics.add_text(carry, follows_text=counted_any)
+    return statistics
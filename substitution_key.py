@@ -0,0 +1,114 @@
+# substitution_key.py
+# -*- coding: utf-8 -*-
+import string
+from collections.abc import Mapping
+
+_LETTER_INDEX = {c: i for i, c in enumerate(string.ascii_lowercase)}
+
+
+class SubstitutionKey(Mapping):
+    """
+    Immutable key {cipher letter a-z: plain letter}, stored as arrays instead of a dict:
+      plain       26 plain letters, one per cipher letter (other letters than a-z may be entered in the GUI)
+      plain_idx   26 plain letter indices, -1 where the plain letter is not a-z
+      inverse     26 bitmasks, bit c of inverse[p] set when cipher letter c maps to plain letter p
+    The inverse is a mask, not a single letter: the tool lets several cipher letters share a plain letter
+    (and reports it as a conflict), so the key is only a bijection once the analyst resolves them.
+    Lookups in both directions are O(1). A key is never changed after it is built, so it can be handed
+    out as a snapshot without copying; with_changes() returns a new key.
+    """
+    __slots__ = ('plain', 'plain_idx', 'inverse')
+
+    def __init__(self, mapping=None):
+        plain = list(string.ascii_lowercase)
+        if mapping is not None:
+            for cipher_char, plain_char in mapping.items():
+                idx = _LETTER_INDEX.get(cipher_char)
+                if idx is None: raise KeyError(f"不是密文字母 a-z: {cipher_char!r}")
+                plain[idx] = plain_char
+        self._build(tuple(plain))
+
+    def _build(self, plain):
+        self.plain = plain
+        self.plain_idx = tuple(_LETTER_INDEX.get(p, -1) for p in plain)
+        inverse = [0] * 26
+        for c, p in enumerate(self.plain_idx):
+            if p >= 0: inverse[p] |= 1 << c
+        self.inverse = tuple(inverse)
+
+    @classmethod
+    def from_encryption_table(cls, table):
+        """Decryption key of a cipher.cipher table (table[i] is the cipher index of plain letter i)."""
+        return cls({chr(97 + table[i]): chr(97 + i) for i in range(26)})
+
+    # Mapping interface: existing code reading key.get(c, c) / key.items() works unchanged
+    def __getitem__(self, cipher_char):
+        idx = _LETTER_INDEX.get(cipher_char)
+        if idx is None: raise KeyError(cipher_char)
+        return self.plain[idx]
+
+    def get(self, cipher_char, default=None):
+        idx = _LETTER_INDEX.get(cipher_char)
+        return default if idx is None else self.plain[idx]
+
+    def __iter__(self): return iter(string.ascii_lowercase)
+    def __len__(self): return 26
+    def __contains__(self, cipher_char): return cipher_char in _LETTER_INDEX
+
+    def __eq__(self, other):
+        if isinstance(other, SubstitutionKey): return self.plain == other.plain
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self): return hash(self.plain)
+    def __repr__(self): return f"SubstitutionKey({''.join(self.plain)!r})"
+    def __reduce__(self): return (SubstitutionKey, (self.to_dict(),)) # __slots__ without __dict__
+
+    def to_dict(self): return dict(zip(string.ascii_lowercase, self.plain))
+    def translation_table(self):
+        """str.translate table decrypting a-z and A-Z; upper case letters decrypt to upper case."""
+        table = {}
+        for cipher_char, plain_char in zip(string.ascii_lowercase, self.plain):
+            table[ord(cipher_char)] = plain_char; table[ord(cipher_char.upper())] = plain_char.upper()
+        return table
+
+    def with_changes(self, changes):
+        """New key with the {cipher letter: plain letter} changes applied; self is unchanged."""
+        if not changes: return self
+        plain = list(self.plain)
+        for cipher_char, plain_char in changes.items():
+            idx = _LETTER_INDEX.get(cipher_char)
+            if idx is None: raise KeyError(f"不是密文字母 a-z: {cipher_char!r}")
+            plain[idx] = plain_char
+        key = SubstitutionKey.__new__(SubstitutionKey)
+        key._build(tuple(plain))
+        return key
+
+    def cipher_mask(self, plain_char, exclude_identity=False):
+        """Bitmask of the cipher letters mapped to plain_char (optionally without plain_char's own identity mapping)."""
+        p = _LETTER_INDEX.get(plain_char)
+        if p is None: # Plain letters outside a-z are not indexed
+            return sum(1 << c for c, mapped in enumerate(self.plain) if mapped == plain_char)
+        return self.inverse[p] & ~(1 << p) if exclude_identity else self.inverse[p]
+
+    def mapped_by_other(self, plain_char, cipher_char):
+        """First cipher letter (alphabetically) other than cipher_char with a non-identity mapping to plain_char, or None."""
+        mask = self.cipher_mask(plain_char, exclude_identity=True)
+        c = _LETTER_INDEX.get(cipher_char)
+        if c is not None: mask &= ~(1 << c)
+        return chr(97 + (mask & -mask).bit_length() - 1) if mask else None
+
+    def modified_letters(self):
+        """Set of the cipher letters not mapped to themselves."""
+        return {c for c, p in zip(string.ascii_lowercase, self.plain) if p != c}
+
+    def conflicts(self):
+        """
+        ((first cipher letter, p), (cipher letter, p)) for every further cipher letter sharing a plain letter p
+        a-z with an earlier one; identity mappings never conflict. Ordered by the later cipher letter.
+        """
+        conflicts_found = []
+        for c, p in enumerate(self.plain_idx):
+            if p < 0 or p == c: continue
+            earlier = self.inverse[p] & ~(1 << p) & ((1 << c) - 1)
+            if earlier: conflicts_found.append(((chr(97 + (earlier & -earlier).bit_length() - 1), self.plain[c]), (chr(97 + c), self.plain[c])))
+        return conflicts_found
@@ -0,0 +1,57 @@
+# test_deferred_suggestions.py
+# -*- coding: utf-8 -*-
+"""
+Deferred suggestions (python -m pytest -q): a state change made on the calling thread while a worker thread
+runs compute_pending_suggestions under suggestion_lock returns promptly, and the stale computation stops.
+"""
+import threading
+import time
+
+import pytest
+
+from logic import DecryptionLogic
+
+MAX_WAIT = 0.25 # Seconds a state change may wait for the worker to notice it is stale and release the lock
+
+
+@pytest.fixture(scope='module')
+def busy_text(resources, sample_ciphertext):
+    # Dictionary words only, so pattern propagation has many constrained words to work through
+    words = [word for words in DecryptionLogic.load_word_sets(resources['word_list_files']).values() for word in words]
+    return sample_ciphertext(200000, seed=824, words=words)
+
+
+def wait_until_held(lock, timeout=5.0):
+    """Waits until another thread holds lock (an RLock)."""
+    deadline = time.perf_counter() + timeout
+    while lock.acquire(blocking=False):
+        lock.release()
+        if time.perf_counter() > deadline: pytest.fail("The worker never took the lock")
+        time.sleep(0.001)
+
+
+@pytest.mark.parametrize('change, delay', [('apply_key_changes', 0.01), ('undo', 0.3), ('set_lookahead', 0.8)])
+def test_state_change_does_not_wait_for_stale_worker(resources, busy_text, change, delay):
+    ciphertext, true_key = busy_text
+    logic = DecryptionLogic(ciphertext, **resources)
+    logic.defer_suggestions = True
+    logic.set_pattern_constraints(True); logic.set_partial_word_scoring(True)
+    logic.set_lookahead(True, time_budget=3.0); logic.set_mapping_confidence(True, time_budget=3.0)
+    frequent = max(logic.char_indices, key=lambda c: len(logic.char_indices[c]))
+    logic.apply_key_changes({frequent: true_key[frequent]})
+
+    worker = threading.Thread(target=logic.compute_pending_suggestions, args=(logic.suggestion_generation,))
+    worker.start()
+    try:
+        wait_until_held(logic.suggestion_lock)
+        time.sleep(delay) # Pattern propagation, the lookahead or the mapping confidence
+        assert worker.is_alive()
+        start = time.perf_counter()
+        if change == 'apply_key_changes': logic.apply_key_changes({'q': 'z'} if frequent != 'q' else {'x': 'z'})
+        elif change == 'undo': logic.undo_last_change()
+        else: logic.set_lookahead(False)
+        waited = time.perf_counter() - start
+        worker.join(MAX_WAIT)
+        assert not worker.is_alive(), "The stale computation kept running"
+    finally: worker.join()
+    assert waited < MAX_WAIT, f"{change} waited {waited:.2f} s for the stale computation"
@@ -0,0 +1,81 @@
+# test_suggestions.py
+# -*- coding: utf-8 -*-
+"""
+Equivalence checks of the suggestion scoring (python -m pytest -q):
+  - the branch and bound of _top_candidates returns the same top-k as scoring every candidate
+  - the NumPy engine scores every (cipher, plain) pair like calculate_local_swap_score
+on seeded sample texts (conftest.py), at the start and after a few confirmed mappings.
+"""
+import string
+
+import pytest
+
+import vector_engine as ve
+from logic import DecryptionLogic
+
+ENGINES = ['python', pytest.param('numpy', marks=pytest.mark.skipif(not ve.numpy_available(), reason="NumPy is not installed"))]
+SIZES = (1500, 20000)
+CONFIRMED = 4 # Correct mappings applied (most frequent cipher letters first) for the second state
+
+
+def make_logic(resources, sample_ciphertext, size, engine, partial_word_scoring=False):
+    ciphertext, true_key = sample_ciphertext(size, seed=824)
+    logic = DecryptionLogic(ciphertext, **dict(resources, scoring_engine=engine))
+    if partial_word_scoring: logic.set_partial_word_scoring(True)
+    return logic, true_key
+
+
+def states(logic, true_key):
+    """Yields after the initial state and after CONFIRMED correct mappings."""
+    yield 'initial'
+    frequent = sorted((c for c in string.ascii_lowercase if logic.char_indices.get(c)), key=lambda c: -len(logic.char_indices[c]))
+    logic.apply_key_changes({c: true_key[c] for c in frequent[:CONFIRMED] if true_key[c] != c})
+    yield 'confirmed'
+
+
+def exhaustive_suggestions(logic, num_suggestions=5):
+    # Every bound +inf: _top_candidates scores all candidates in their original order, nothing is pruned
+    original = logic._candidate_score_bounds
+    logic._candidate_score_bounds = lambda candidates: [float('inf')] * len(candidates)
+    try: return logic.suggest_best_swaps(num_suggestions)
+    finally: logic._candidate_score_bounds = original
+
+
+def assert_same_suggestions(actual, expected):
+    assert [(c, p) for c, p, _ in actual] == [(c, p) for c, p, _ in expected]
+    assert [score for _, _, score in actual] == pytest.approx([score for _, _, score in expected], rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('partial_word_scoring', (False, True))
+def test_pruned_top_k_matches_exhaustive(resources, sample_ciphertext, engine, size, partial_word_scoring):
+    logic, true_key = make_logic(resources, sample_ciphertext, size, engine, partial_word_scoring)
+    for state in states(logic, true_key):
+        logic.score_cache = {}; logic.partial_word_cache = {}
+        pruned = logic.suggest_best_swaps(5)
+        logic.score_cache = {}; logic.partial_word_cache = {}
+        exhaustive = exhaustive_suggestions(logic)
+        assert pruned, state
+        assert_same_suggestions(pruned, exhaustive)
+        # Again with the caches the exhaustive pass filled: cached scores make the bounds exact
+        assert_same_suggestions(logic.suggest_best_swaps(5), exhaustive)
+
+
+@pytest.mark.skipif(not ve.numpy_available(), reason="NumPy is not installed")
+@pytest.mark.parametrize('size', SIZES)
+def test_numpy_engine_matches_python_engine(resources, sample_ciphertext, size):
+    python_logic, true_key = make_logic(resources, sample_ciphertext, size, 'python')
+    numpy_logic, _ = make_logic(resources, sample_ciphertext, size, 'numpy')
+    for _ in zip(states(python_logic, true_key), states(numpy_logic, true_key)):
+        numpy_logic.score_cache = {}
+        assert numpy_logic._fill_score_cache_from_matrix() is not None
+        for cipher_char in string.ascii_lowercase:
+            if cipher_char in python_logic.modified_from_identity: continue
+            for target_plain_char in string.ascii_lowercase:
+                if target_plain_char == cipher_char: continue
+                expected = python_logic.calculate_local_swap_score(cipher_char, target_plain_char)
+                assert numpy_logic.score_cache[(cipher_char, target_plain_char)] == pytest.approx(expected, rel=1e-9, abs=1e-9), \
+                    (cipher_char, target_plain_char)
+        python_logic.score_cache = {}; numpy_logic.score_cache = {}
+        assert_same_suggestions(numpy_logic.suggest_best_swaps(5), python_logic.suggest_best_swaps(5))
@@ -0,0 +1,172 @@
+# train_model.py
+# -*- coding: utf-8 -*-
+"""
+Builds the n-gram language model and the word lists from plaintext corpora.
+
+    python train_model.py corpus1.txt corpus2.txt -o english_ngrams.bin --words-dir .
+
+The corpus is streamed in chunks that are counted in a process pool, so memory use is bounded by
+the chunk size, the number of chunks in flight and the (fixed-size) count tables, not by the corpus size.
+N-grams are counted inside letter runs only, the same way DecryptionLogic reads the ciphertext.
+"""
+import argparse
+import math
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from ngram_model import NgramModel, MAX_ORDER
+
+WORD_LIST_NAMES = {2: 'two_letters_words.txt', 3: 'three_letters_words.txt', 4: 'four_letters_words.txt'}
+# Every character that is not a-z becomes a separator (non-ASCII characters are first replaced by '?')
+_SEPARATE_NON_LETTERS_TABLE = str.maketrans({chr(code): ' ' for code in range(128) if not (97 <= code <= 122)})
+
+
+def _letters_only(text):
+    return text.lower().encode('ascii', errors='replace').decode('ascii').translate(_SEPARATE_NON_LETTERS_TABLE)
+
+
+def count_chunk(text, max_word_length=4):
+    """
+    Counts one chunk of text. Returns ({order: {index: count}}, {length: Counter(words)}).
+    The sparse dicts stay small however large the chunk is (at most 26**order keys).
+    """
+    text = _letters_only(text)
+    words = text.split()
+    joined = ' '.join(words) # One separator between words, so no n-gram spans two words
+    shifted = [joined[offset:] for offset in range(MAX_ORDER)]
+    ngram_counts = {}
+    for order in range(1, MAX_ORDER + 1):
+        counts = {}
+        for gram, count in Counter(zip(*shifted[:order])).items():
+            if ' ' in gram: continue
+            idx = 0
+            for ch in gram: idx = idx * 26 + (ord(ch) - 97)
+            counts[idx] = count
+        ngram_counts[order] = counts
+    word_counts = {length: Counter() for length in range(1, max_word_length + 1)}
+    for word, count in Counter(words).items():
+        if len(word) <= max_word_length: word_counts[len(word)][word] += count
+    return ngram_counts, word_counts
+
+
+def iter_chunks(paths, chunk_chars, encoding):
+    """Yields text chunks of about chunk_chars characters; a word cut at a chunk end is moved to the next chunk."""
+    for path in paths:
+        carry = ''
+        with open(path, 'r', encoding=encoding, errors='replace') as f:
+            while True:
+                block = f.read(chunk_chars)
+                if not block: break
+                text = carry + block
+                cut = len(text)
+                while cut > 0 and text[cut - 1].isascii() and text[cut - 1].isalpha(): cut -= 1
+                if cut == 0: cut = len(text) # A single huge "word": count it as it is
+                carry = text[cut:]
+                yield text[:cut]
+        if carry: yield carry
+
+
+class CorpusCounts:
+    """Running totals merged from the per-chunk partial counts."""
+    def __init__(self, max_word_length=4, max_vocabulary=200000):
+        self.ngram_totals = {order: [0] * (26 ** order) for order in range(1, MAX_ORDER + 1)}
+        self.word_totals = {length: Counter() for length in range(1, max_word_length + 1)}
+        self.max_vocabulary = max_vocabulary
+
+    def merge(self, partial):
+        ngram_counts, word_counts = partial
+        for order, counts in ngram_counts.items():
+            totals = self.ngram_totals[order]
+            for idx, count in counts.items(): totals[idx] += count
+        for length, counts in word_counts.items():
+            totals = self.word_totals[length]
+            totals.update(counts)
+            if len(totals) > self.max_vocabulary: # Keep memory bounded for long word lengths
+                self.word_totals[length] = Counter(dict(totals.most_common(self.max_vocabulary // 2)))
+
+    def to_model(self, smoothing=0.01, default_log_prob=-15.0):
+        """Natural-log probabilities; unseen n-grams get log(smoothing / total)."""
+        tables = {}
+        for order, totals in self.ngram_totals.items():
+            grand_total = sum(totals)
+            if grand_total == 0:
+                tables[order] = [default_log_prob] * len(totals); continue
+            floor = math.log(smoothing / grand_total)
+            log_total = math.log(grand_total)
+            tables[order] = [math.log(count) - log_total if count else floor for count in totals]
+        return NgramModel(tables, default_log_prob)
+
+    def write_word_frequencies(self, path, min_count):
+        """Writes 'word<TAB>count' lines for every counted word length, most frequent first."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for length in sorted(self.word_totals):
+                for word, count in self.word_totals[length].most_common():
+                    if count < min_count: break
+                    f.write(f"{word}\t{count}\n")
+
+    def write_word_lists(self, directory, top_words, min_count):
+        os.makedirs(directory, exist_ok=True) # A new --words-dir must not fail after the whole corpus pass
+        written = []
+        for length, file_name in WORD_LIST_NAMES.items():
+            counts = self.word_totals.get(length)
+            if counts is None: continue
+            words = [word for word, count in counts.most_common(top_words.get(length)) if count >= min_count]
+            path = os.path.join(directory, file_name)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(sorted(words)) + '\n')
+            written.append((path, len(words)))
+        return written
+
+
+def train(paths, workers=None, chunk_chars=8 * 1024 * 1024, encoding='utf-8', max_word_length=4, progress=True):
+    counts = CorpusCounts(max_word_length=max_word_length)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2 # Bounds the number of chunks held in memory at once
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set(); done_chunks = 0
+        for chunk in iter_chunks(paths, chunk_chars, encoding):
+            pending.add(pool.submit(count_chunk, chunk, max_word_length))
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished: counts.merge(future.result()); done_chunks += 1
+                if progress: print(f"\r已处理 {done_chunks} 个文本块...", end='', file=sys.stderr)
+        for future in pending: counts.merge(future.result()); done_chunks += 1
+    if progress: print(f"\r已处理 {done_chunks} 个文本块。", file=sys.stderr)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从明文语料训练n-gram语言模型和单词表")
+    parser.add_argument('corpus', nargs='+', help="语料文件 (纯文本)")
+    parser.add_argument('-o', '--output', default='english_ngrams.bin', help="输出的二进制模型文件")
+    parser.add_argument('--words-dir', default=None, help="若指定, 在该目录写出 two/three/four_letters_words.txt")
+    parser.add_argument('--top-words', type=int, nargs=3, default=[40, 300, 1200], metavar=('TWO', 'THREE', 'FOUR'),
+                        help="每种长度保留的最常见单词数")
+    parser.add_argument('--min-word-count', type=int, default=2)
+    parser.add_argument('--max-word-length', type=int, default=4, help="统计词频的最大单词长度")
+    parser.add_argument('--word-freq-output', default=None, help="若指定, 写出 '单词<TAB>次数' 格式的词频表")
+    parser.add_argument('--workers', type=int, default=None, help="进程数 (默认: CPU核数)")
+    parser.add_argument('--chunk-mb', type=float, default=8.0, help="每个文本块的大小 (百万字符)")
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--smoothing', type=float, default=0.01, help="未出现n-gram的伪计数")
+    args = parser.parse_args(argv)
+
+    counts = train(args.corpus, workers=args.workers, chunk_chars=max(1024, int(args.chunk_mb * 1024 * 1024)),
+                   encoding=args.encoding, max_word_length=max(4, args.max_word_length))
+    model = counts.to_model(smoothing=args.smoothing)
+    model.save(args.output)
+    letter_total = sum(counts.ngram_totals[1])
+    print(f"模型已写入 {args.output} (字母总数 {letter_total})")
+    if args.words_dir:
+        top_words = dict(zip((2, 3, 4), args.top_words))
+        for path, word_count in counts.write_word_lists(args.words_dir, top_words, args.min_word_count):
+            print(f"单词表已写入 {path} ({word_count} 个单词)")
+    if args.word_freq_output:
+        counts.write_word_frequencies(args.word_freq_output, args.min_word_count)
+        print(f"词频表已写入 {args.word_freq_output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# vector_engine.py
+# -*- coding: utf-8 -*-
+import math
+import string
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, DecryptionLogic falls back to the pure Python scorer
+    np = None
+
+WORD_LENGTHS = (2, 3, 4)
+
+
+def numpy_available():
+    return np is not None
+
+
+class VectorizedScorer:
+    """
+    NumPy implementation of DecryptionLogic.calculate_local_swap_score.
+    The ciphertext's cached n-gram and token counts are reshaped into neighbour/token arrays;
+    score_matrix() then scores all 26x26 (cipher letter, target letter) candidates in one batched pass.
+    """
+    def __init__(self, logic):
+        if np is None:
+            raise ImportError("NumPy is required for the vectorized scoring engine.")
+        self.logic = logic
+        self.default_log_prob = logic.default_log_prob
+        self._build_context_counts()
+        self._build_base_scores()
+        self._build_language_tables()
+        self._build_token_entries()
+
+    def _build_context_counts(self):
+        # Reshaped from the n-gram counts cached by the ciphertext's cipher.stat, so the text is not scanned again
+        analyzer = self.logic.ciphertext_analyzer
+        bigrams = np.array(analyzer.bigram_counts, dtype=np.float64).reshape(26, 26) # [first, second]
+        trigrams = np.array(analyzer.trigram_counts, dtype=np.float64).reshape(26, 26, 26) # [first, second, third]
+        self.prev_counts = np.ascontiguousarray(bigrams.T) # [c, p]: occurrences of c preceded by letter p
+        self.next_counts = bigrams # [c, n]: occurrences of c followed by letter n
+        self.triple_counts = np.ascontiguousarray(trigrams.transpose(1, 0, 2)) # [c, p, n]: letter p before c and n after
+        # Occurrences of c right after "'" and not followed by another letter
+        self.apostrophe_counts = np.array(analyzer.apostrophe_counts, dtype=np.float64)
+        self.letter_counts = np.array(self.logic.compact_text.letter_counts(), dtype=np.int64)
+
+    def _build_base_scores(self):
+        # The frequency terms do not depend on the key, so they are computed once with the same formula as the Python scorer
+        logic = self.logic
+        cipher_weight = 4.0; delta_weight = 2.0
+        base = np.empty((26, 26), dtype=np.float64)
+        for ci_idx, cipher_char in enumerate(string.ascii_lowercase):
+            cipher_freq = logic.ciphertext_freq_dict.get(cipher_char, 0.0)
+            log_cipher_freq = math.log(cipher_freq) if cipher_freq > 0 else self.default_log_prob
+            for t_idx, target_plain_char in enumerate(string.ascii_lowercase):
+                target_freq = logic.standard_freq_dict.get(target_plain_char, 0.0)
+                delta_freq = max(0.01, abs(cipher_freq - target_freq))
+                base[ci_idx, t_idx] = cipher_weight * log_cipher_freq - delta_weight * math.log(delta_freq)
+        self.base_scores = base
+
+    def _build_language_tables(self):
+        logic = self.logic
+        self.good_digrams = np.frombuffer(bytes(logic.common_digram_flags), dtype=np.uint8).reshape(26, 26).astype(np.float64)
+        self.good_trigrams = np.frombuffer(bytes(logic.common_trigram_flags), dtype=np.uint8).reshape(26, 26, 26).astype(np.float64)
+        # One flat lookup table for all word lengths: offset[length] + base-26 word code
+        self.word_offsets = {}; offset = 0
+        for length in WORD_LENGTHS:
+            self.word_offsets[length] = offset; offset += 26 ** length
+        self.word_lookup = np.zeros(offset, dtype=bool)
+        for length in WORD_LENGTHS:
+            words = logic.word_sets.get(length)
+            if not words: continue
+            for word in words:
+                if all('a' <= ch <= 'z' for ch in word):
+                    self.word_lookup[self.word_offsets[length] + self._word_code(word)] = True
+
+    @staticmethod
+    def _word_code(word):
+        code = 0
+        for ch in word: code = code * 26 + (ord(ch) - 97)
+        return code
+
+    def _build_token_entries(self):
+        # Built from DecryptionLogic.letter_token_index, so each distinct token is scored once per refresh
+        logic = self.logic
+        standalone_singles = np.zeros(26, dtype=np.float64)
+        entry_cipher = []; entry_count = []; entry_weight = []; entry_others = []
+        entry_offset = []; entry_letters = []; entry_powers = []
+        for cipher_idx, cipher_char in enumerate(string.ascii_lowercase):
+            for token_str, count, standalone_count in logic.letter_token_index.get(cipher_char, ()):
+                token_len = len(token_str)
+                if token_len == 1:
+                    standalone_singles[cipher_idx] += standalone_count
+                    continue
+                if logic.word_sets.get(token_len) is None: continue
+                letters = [ord(ch) - 97 for ch in token_str]
+                powers = [26 ** (token_len - 1 - pos) for pos in range(token_len)]
+                entry_cipher.append(cipher_idx); entry_count.append(count)
+                entry_weight.append(sum(p for l, p in zip(letters, powers) if l == cipher_idx))
+                entry_others.append(sum(1 << l for l in set(letters) if l != cipher_idx))
+                entry_offset.append(self.word_offsets[token_len])
+                # Positions of the swapped letter (and padding) contribute nothing to the fixed part of the code
+                entry_letters.append(letters + [0] * (4 - token_len))
+                entry_powers.append([0 if l == cipher_idx else p for l, p in zip(letters, powers)] + [0] * (4 - token_len))
+        self.standalone_singles = standalone_singles
+        self.entry_cipher = np.array(entry_cipher, dtype=np.int64)
+        self.entry_count = np.array(entry_count, dtype=np.float64)
+        self.entry_weight = np.array(entry_weight, dtype=np.int64)
+        self.entry_others = np.array(entry_others, dtype=np.int64)
+        self.entry_offset = np.array(entry_offset, dtype=np.int64)
+        self.entry_letters = np.array(entry_letters, dtype=np.int64).reshape(-1, 4)
+        self.entry_powers = np.array(entry_powers, dtype=np.int64).reshape(-1, 4)
+
+    def score_matrix(self, current_key, modified_from_identity):
+        """
+        Returns a 26x26 array of calculate_local_swap_score values (without the initial 'e' bonus),
+        rows indexed by cipher letter and columns by target letter. Cipher letters absent from the text get -inf.
+        Returns None if the key maps to something other than a-z, which only the Python scorer handles.
+        """
+        key_idx = np.empty(26, dtype=np.int64)
+        for ci_idx, cipher_char in enumerate(string.ascii_lowercase):
+            plain_char = current_key.get(cipher_char, cipher_char)
+            if not (len(plain_char) == 1 and 'a' <= plain_char <= 'z'): return None
+            key_idx[ci_idx] = ord(plain_char) - 97
+        modified = np.array([c in modified_from_identity for c in string.ascii_lowercase], dtype=np.float64)
+        modified_bits = sum(1 << (ord(c) - 97) for c in modified_from_identity if 'a' <= c <= 'z')
+        digram_bonus = 0.5; trigram_bonus = 0.8
+
+        # Context: digrams with confirmed neighbours on each side, trigrams with both neighbours confirmed
+        good_prev = self.good_digrams[key_idx, :] # [p, t]: key[p] + t is a common digram
+        good_next = self.good_digrams[:, key_idx].T # [n, t]: t + key[n] is a common digram
+        digram_hits = (self.prev_counts * modified) @ good_prev + (self.next_counts * modified) @ good_next
+        confirmed_triples = self.triple_counts * modified[None, :, None] * modified[None, None, :]
+        good_triples = self.good_trigrams[key_idx][:, :, key_idx] # [p, t, n]
+        trigram_hits = np.einsum('cpn,ptn->ct', confirmed_triples, good_triples)
+        context_bonus = digram_bonus * digram_hits + trigram_bonus * trigram_hits
+
+        # Words: code of the decrypted token for every target letter = fixed part + weight * target
+        word_penalty = np.zeros(676, dtype=np.float64)
+        word_reward = np.zeros((26, 26), dtype=np.float64)
+        if len(self.entry_cipher):
+            fixed_codes = (key_idx[self.entry_letters] * self.entry_powers).sum(axis=1)
+            lookup_idx = (self.entry_offset + fixed_codes)[:, None] + self.entry_weight[:, None] * np.arange(26)[None, :]
+            is_valid = self.word_lookup[lookup_idx]
+            eligible = (self.entry_others & ~modified_bits) == 0
+            pair_idx = self.entry_cipher[:, None] * 26 + np.arange(26)[None, :]
+            invalid_weight = (eligible[:, None] & ~is_valid) * self.entry_count[:, None]
+            word_penalty = np.bincount(pair_idx.ravel(), weights=invalid_weight.ravel(), minlength=676)
+            rewarded = eligible[:, None] & is_valid
+            if rewarded.any():
+                unique_words = np.unique(pair_idx[rewarded] * self.word_lookup.size + lookup_idx[rewarded])
+                unique_counts = np.bincount(unique_words // self.word_lookup.size, minlength=676).reshape(26, 26)
+                word_reward = np.where(unique_counts >= 2, unique_counts * self.logic.valid_word_reward_base, 0.0)
+        word_penalty = (self.logic.invalid_word_penalty * word_penalty).reshape(26, 26)
+
+        ia_mask = np.array([ch in ('a', 'i') for ch in string.ascii_lowercase])
+        single_letter_bonus = self.standalone_singles[:, None] * np.where(
+            ia_mask, self.logic.single_letter_ia_reward, self.logic.single_letter_other_penalty)[None, :]
+        apostrophe_mask = np.array([ch in self.logic.common_apostrophe_s_letters for ch in string.ascii_lowercase])
+        apostrophe_s_bonus = self.apostrophe_counts[:, None] * np.where(
+            apostrophe_mask, self.logic.apostrophe_s_common_letter_reward, 0.0)[None, :]
+
+        scores = (self.base_scores + context_bonus + word_penalty +
+                  word_reward + single_letter_bonus + apostrophe_s_bonus)
+        scores[self.letter_counts == 0, :] = -np.inf
+        return scores
@@ -0,0 +1,136 @@
+# word_patterns.py
+# -*- coding: utf-8 -*-
+import string
+
+FULL_MASK = (1 << 26) - 1
+
+
+def word_pattern(word):
+    """Letter pattern of a word: 'that' -> 'ABCA', 'book' -> 'ABBC'. Equal patterns are necessary for a match."""
+    seen = {}
+    return ''.join(seen.setdefault(ch, string.ascii_uppercase[len(seen)]) for ch in word)
+
+
+class PatternIndex:
+    """Index from letter pattern to the dictionary words having that pattern."""
+    def __init__(self, words=()):
+        self.patterns = {}
+        self.add_words(words)
+
+    def add_words(self, words):
+        for word in words:
+            word = word.strip().lower()
+            if len(word) < 2 or not all('a' <= ch <= 'z' for ch in word): continue
+            entries = self.patterns.setdefault(word_pattern(word), set())
+            entries.add(word)
+
+    def words_for(self, pattern):
+        return self.patterns.get(pattern, ())
+
+    @classmethod
+    def from_word_sets(cls, word_sets, extra_words=()):
+        """Builds the index from DecryptionLogic.word_sets ({length: set or None}) plus any extra dictionary words."""
+        index = cls()
+        for words in word_sets.values():
+            if words: index.add_words(words)
+        index.add_words(extra_words)
+        return index
+
+    @staticmethod
+    def read_word_file(path):
+        """Reads a dictionary file with one 'word' or 'word<TAB>count' per line (e.g. from train_model.py)."""
+        words = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                word = line.split('\t', 1)[0].strip()
+                if word: words.append(word)
+        return words
+
+
+class ConstraintSolver:
+    """
+    Narrows the possible plain letters of every cipher letter using all ciphertext words at once.
+    A cipher word may only decrypt to dictionary words with the same pattern, so each position restricts
+    its cipher letter; restrictions from one word rule out options in the others until nothing changes.
+    Candidate sets are 26-bit masks. Words left without any consistent dictionary word are assumed to be
+    outside the dictionary (names, rare words) and stop constraining.
+    """
+    def __init__(self, word_counts, pattern_index, min_occurrences=1):
+        """word_counts: {cipher word: occurrences}, e.g. cipher.stat's token Counter."""
+        self.words = [] # (cipher letter indices, [plain letter index tuples], plain letter mask per position)
+        by_pattern = {} # The dictionary words of a pattern are converted once and shared by its cipher words
+        for cipher_word, count in word_counts.items():
+            if count < min_occurrences: continue # Rare words are more often names or words missing from the dictionary
+            if len(cipher_word) < 2 or not all('a' <= ch <= 'z' for ch in cipher_word): continue
+            pattern = word_pattern(cipher_word)
+            if pattern not in by_pattern:
+                entries = [tuple(ord(ch) - 97 for ch in word) for word in pattern_index.words_for(pattern)]
+                by_pattern[pattern] = (entries, _position_masks(entries, len(pattern)))
+            entries, masks = by_pattern[pattern]
+            if entries: self.words.append((tuple(ord(ch) - 97 for ch in cipher_word), entries, masks))
+
+    def propagate(self, fixed_mappings, is_cancelled=None):
+        """
+        fixed_mappings: {cipher_char: plain_char} already confirmed by the user.
+        Returns {cipher_char: set of consistent plain chars}; letters no word constrains are left out.
+        Returns None if is_cancelled() turns true midway (it is checked every 64 words).
+        """
+        candidates = [FULL_MASK] * 26
+        used = 0
+        for cipher_char, plain_char in fixed_mappings.items():
+            if 'a' <= plain_char <= 'z': candidates[ord(cipher_char) - 97] = 1 << (ord(plain_char) - 97); used |= 1 << (ord(plain_char) - 97)
+        fixed_idx = {ord(c) - 97 for c in fixed_mappings}
+        for cipher_idx in range(26):
+            if cipher_idx not in fixed_idx: candidates[cipher_idx] &= ~used
+
+        # (letters, matches, plain letter mask per position of the matches, letter masks the matches were checked
+        # against or None): a word whose letters kept their masks since its last check cannot change anything
+        active = [(letters, entries, allowed, None) for letters, entries, allowed in self.words]
+        constrained = set(); singletons_done = set(fixed_idx)
+        changed = True
+        while changed:
+            changed = False
+            still_active = []
+            for number, (letters, matches, allowed, checked) in enumerate(active):
+                if is_cancelled is not None and number % 64 == 0 and is_cancelled(): return None
+                current = tuple(candidates[c] for c in letters)
+                if current != checked:
+                    # Masks only shrink, so the matches need testing at the positions that lost letters only
+                    narrowed = [(pos, mask) for pos, mask in enumerate(current) if mask != (FULL_MASK if checked is None else checked[pos])]
+                    if narrowed:
+                        for pos, mask in narrowed: # One position at a time: each pass scans only the survivors
+                            matches = [entry for entry in matches if mask >> entry[pos] & 1]
+                        if not matches: continue # Not a dictionary word under the current constraints
+                        allowed = _position_masks(matches, len(letters))
+                    for pos, cipher_idx in enumerate(letters):
+                        constrained.add(cipher_idx)
+                        if candidates[cipher_idx] & ~allowed[pos]:
+                            candidates[cipher_idx] &= allowed[pos]; changed = True
+                    checked = tuple(candidates[c] for c in letters)
+                still_active.append((letters, matches, allowed, checked))
+            active = still_active
+            # A cipher letter left with one option takes that plain letter away from all others
+            for cipher_idx in range(26):
+                mask = candidates[cipher_idx]
+                if cipher_idx in singletons_done or mask == 0 or mask & (mask - 1): continue
+                singletons_done.add(cipher_idx)
+                for other_idx in range(26):
+                    if other_idx != cipher_idx and candidates[other_idx] & mask:
+                        candidates[other_idx] &= ~mask; changed = True
+
+        result = {}
+        for cipher_idx in constrained - fixed_idx:
+            mask = candidates[cipher_idx]
+            if mask: # An empty set means the constraints contradict each other: no information
+                result[chr(97 + cipher_idx)] = {chr(97 + p) for p in range(26) if mask >> p & 1}
+        return result
+
+
+def _position_masks(entries, length):
+    """Mask of the plain letters at each position of the (plain letter index tuple) entries."""
+    masks = []
+    for pos in range(length):
+        mask = 0
+        for plain_idx in {entry[pos] for entry in entries}: mask |= 1 << plain_idx
+        masks.append(mask)
+    return tuple(masks)
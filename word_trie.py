@@ -0,0 +1,75 @@
+# word_trie.py
+# -*- coding: utf-8 -*-
+
+FULL_MASK = (1 << 26) - 1
+
+
+class WordTrie:
+    """
+    Trie over a dictionary, one tree per word length, for wildcard queries on partially decrypted words.
+    Nodes are dicts {letter index: child}; a query walks only the branches its known letters allow,
+    so a match count costs far less than scanning the word list.
+
+    Query templates are tuples with one item per position:
+      0-25  a known plain letter (index)
+      < 0   an unknown letter; equal negative ids must be the same letter, different ids different letters
+            (the way one unmapped cipher letter always decrypts to one plain letter)
+    """
+    def __init__(self, words=(), max_cache_size=100000):
+        self.roots = {} # word length -> root node
+        self.word_count = 0
+        self._cache = {}
+        self.max_cache_size = max_cache_size
+        self.add_words(words)
+
+    def add_words(self, words):
+        for word in words:
+            word = word.strip().lower()
+            if not word or not all('a' <= ch <= 'z' for ch in word): continue
+            node = self.roots.setdefault(len(word), {})
+            for ch in word: node = node.setdefault(ord(ch) - 97, {})
+            if not node.get('end'): node['end'] = True; self.word_count += 1
+        self._cache.clear()
+
+    def __len__(self): return self.word_count
+
+    def count_matches(self, template, available_mask=FULL_MASK, limit=None):
+        """
+        Number of dictionary words matching template, unknown letters being taken from available_mask
+        (26-bit mask of plain letters still free). Stops counting at limit if given.
+        """
+        cache_key = (template, available_mask, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None: return cached
+        root = self.roots.get(len(template))
+        count = 0 if root is None else self._count(root, template, 0, {}, 0, available_mask, limit)
+        if len(self._cache) >= self.max_cache_size: self._cache.clear()
+        self._cache[cache_key] = count
+        return count
+
+    def _count(self, node, template, pos, assigned, assigned_mask, available_mask, limit):
+        if pos == len(template): return 1 if node.get('end') else 0
+        item = template[pos]
+        if item >= 0 or item in assigned:
+            child = node.get(item if item >= 0 else assigned[item])
+            return self._count(child, template, pos + 1, assigned, assigned_mask, available_mask, limit) if child else 0
+        total = 0
+        for letter, child in node.items():
+            if letter == 'end' or not (available_mask >> letter & 1) or assigned_mask >> letter & 1: continue
+            assigned[item] = letter
+            total += self._count(child, template, pos + 1, assigned, assigned_mask | (1 << letter), available_mask, limit)
+            del assigned[item]
+            if limit is not None and total >= limit: break
+        return total
+
+    def has_match(self, template, available_mask=FULL_MASK):
+        return self.count_matches(template, available_mask, limit=1) > 0
+
+    def count_pattern(self, pattern, available=None):
+        """
+        String form of count_matches: count_pattern('t?e?e', 'abcdfgh') counts words like 'there' whose '?'
+        positions use letters from available (all letters if None). Each '?' stands for a different letter.
+        """
+        template = tuple(-(pos + 1) if ch == '?' else ord(ch) - 97 for pos, ch in enumerate(pattern.lower()))
+        available_mask = FULL_MASK if available is None else sum(1 << (ord(ch) - 97) for ch in set(available) if 'a' <= ch <= 'z')
+        return self.count_matches(template, available_mask)